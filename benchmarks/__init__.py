@@ -0,0 +1,11 @@
+"""Micro-benchmarks for the pipeline's hot functions, with baseline regression checks.
+
+Not collected by pytest. Run from the repo root:
+
+    python -m benchmarks                  # compare against benchmarks/baseline.json
+    python -m benchmarks --save           # record a new baseline on this machine
+    python -m benchmarks -k shopee -k predictor --threshold 0.1 --case-threshold etl=0.5
+
+Exits 1 when a case's median is slower than its baseline by more than the
+threshold. See `harness` for the case API and `cases` for what is measured.
+"""
@@ -0,0 +1,178 @@
+"""Benchmark cases for the pipeline's hot functions.
+
+Sizes follow production defaults: 5 MiB upload parts, 720x1280 banners,
+a 100k-file publish_metrics directory (`BENCH_ETL_FILES` to change).
+"""
+import io
+import os
+import json
+import contextlib
+
+from .harness import Skip, bench
+
+ETL_FILES = int(os.getenv("BENCH_ETL_FILES", "100000"))
+UPLOAD_BYTES = 64 * 1024 * 1024
+UPLOAD_PART_SIZE = 5 * 1024 * 1024
+
+_PARAMS = {"partner_id": "123456", "q": "หูฟังบลูทูธ", "limit": 20, "offset": 40, "sort": "sales"}
+_CAPTION = "ลดแรง! หูฟังบลูทูธ เสียงดี แบตอึด ราคาพิเศษ 299 บาท กดลิงก์เลย #หูฟัง #โปรแรง"
+
+
+def _sign_case(mode: str):
+    def case(workdir):
+        from src.shopee_client import ShopeeClient
+
+        client = ShopeeClient(partner_id="123456", partner_key="bench-partner-key", base="http://bench.invalid")
+        client.sign_mode = mode
+        yield lambda: (client._sign("/items/search", _PARAMS, method="GET"),
+                       client._sign("/items/generate_affiliate", _PARAMS, method="POST"))
+    return case
+
+
+for _mode in ("A", "B", "C"):
+    bench(f"shopee.sign.{_mode}", number=5000)(_sign_case(_mode))
+
+
+def _banner(workdir: str, name: str = "banner.png") -> str:
+    from src.media_creator import make_banner
+
+    thumb = os.path.join(workdir, "thumb.png")
+    if not os.path.exists(thumb):
+        from PIL import Image
+
+        Image.effect_noise((660, 600), 64).convert("RGB").save(thumb)
+    return make_banner("หูฟังบลูทูธไร้สาย เสียงดี แบตอึด รุ่นใหม่ล่าสุด", 299, os.path.join(workdir, name), image_path=thumb)
+
+
+@bench("predictor.score_variant", number=20)
+def _score_variant(workdir):
+    from src import predictor
+
+    path = _banner(workdir)
+    yield lambda: predictor.score_variant(_CAPTION, path)
+
+
+@bench("predictor.contrast_score", number=20)
+def _contrast_score(workdir):
+    from src import predictor
+
+    path = _banner(workdir)
+    yield lambda: predictor._contrast_score(path)
+
+
+@bench("predictor.caption_fallback", number=200)
+def _caption_fallback(workdir):
+    from src import predictor
+
+    def no_client():
+        raise RuntimeError("benchmark: heuristic captions only")
+
+    original = predictor.OpenAIClient
+    predictor.OpenAIClient = no_client
+    try:
+        yield lambda: predictor.generate_caption_variants("หูฟังบลูทูธไร้สาย", 299, "https://s.shopee.test/1", n=3)
+    finally:
+        predictor.OpenAIClient = original
+
+
+@bench("media.make_banner", number=5)
+def _make_banner(workdir):
+    yield lambda: _banner(workdir, "out.png")
+
+
+@bench("media.make_video", number=1, repeat=3)
+def _make_video(workdir):
+    from src import media_creator
+
+    if not media_creator.MOVIEPY_AVAILABLE:
+        raise Skip("moviepy not installed")
+    frames = [_banner(workdir, f"frame-{i}.png") for i in range(3)]
+    out = os.path.join(workdir, "out.mp4")
+    yield lambda: media_creator.make_video_from_images(frames, out, duration_per_image=1)
+
+
+def _split_hash_case(workers):
+    def case(workdir):
+        from src import upload_hashing
+        from src.poster_tiktok_api import split_parts
+
+        buf = os.urandom(UPLOAD_BYTES)
+
+        def run():
+            parts = split_parts(len(buf), UPLOAD_PART_SIZE)
+            md5s = upload_hashing.hash_parts(buf, parts, workers=workers)
+            return upload_hashing.file_digest(UPLOAD_PART_SIZE, md5s)
+        yield run
+    return case
+
+
+bench("upload.split_hash", number=1)(_split_hash_case(None))
+bench("upload.split_hash.serial", number=1)(_split_hash_case(1))
+
+
+def synthetic_metrics_dir(root: str, files: int, prefix: str = "u") -> str:
+    """An OUTPUT_DIR with `files` publish metrics: commit, summary and upload_metrics files plus journals."""
+    pm = os.path.join(root, "publish_metrics")
+    journals = os.path.join(root, "upload_journals")
+    os.makedirs(pm, exist_ok=True)
+    os.makedirs(journals, exist_ok=True)
+    uploads = files // 3
+    ts = 1_700_000_000
+    for i in range(uploads):
+        uid = f"{prefix}{i:07d}"
+        with open(os.path.join(pm, f"commit_{uid}_{ts + i}.json"), "w", encoding="utf-8") as fh:
+            json.dump({"upload_id": uid, "timestamp": ts + i, "video_id": f"v{i}", "status": "ok",
+                       "message": None, "provider_raw": {"status": "ok"}}, fh)
+        with open(os.path.join(pm, f"summary_{uid}_{ts + i}.json"), "w", encoding="utf-8") as fh:
+            json.dump({"upload_id": uid, "parts_uploaded": 3, "part_size": UPLOAD_PART_SIZE, "timestamp": ts + i}, fh)
+        if i % 4:
+            attempts = {str(p): [{"attempt": 1, "duration": 0.25 + p / 10, "timestamp": ts + i}] for p in range(1, 4)}
+            with open(os.path.join(pm, f"upload_metrics_{uid}.json"), "w", encoding="utf-8") as fh:
+                json.dump(attempts, fh)
+        else:
+            with open(os.path.join(journals, f"{uid}.jsonl"), "w", encoding="utf-8") as fh:
+                for p in range(1, 4):
+                    fh.write(json.dumps({"ev": "part", "part": p, "md5": "0" * 32, "attempt": 1,
+                                         "duration": 0.25 + p / 10, "ts": ts + i}) + "\n")
+    return root
+
+
+@bench("etl.aggregate.full", number=1, repeat=3)
+def _etl_full(workdir):
+    from tools.metrics_etl import aggregate
+
+    root = synthetic_metrics_dir(workdir, ETL_FILES)
+    out = os.path.join(workdir, "metrics_aggregated.csv")
+
+    def run():
+        with contextlib.redirect_stdout(io.StringIO()):
+            return aggregate(root, out, full=True)
+    yield run
+
+
+@bench("etl.aggregate.incremental", number=1, repeat=3)
+def _etl_incremental(workdir):
+    """Steady state: the state is current and 1% of the directory is new since the last run."""
+    from tools.metrics_etl import aggregate
+
+    root = synthetic_metrics_dir(workdir, ETL_FILES)
+    out = os.path.join(workdir, "metrics_aggregated.csv")
+    with contextlib.redirect_stdout(io.StringIO()):
+        aggregate(root, out, full=True)
+    fresh = os.path.join(workdir, "fresh")
+    synthetic_metrics_dir(fresh, max(3, ETL_FILES // 100), prefix="n")
+    batch = [os.path.join(sub, name) for sub in ("publish_metrics", "upload_journals")
+             for name in os.listdir(os.path.join(fresh, sub))]
+    tick = [0]
+
+    def run():
+        # the same batch moves in with a new mtime each round, so every round parses it once
+        tick[0] += 1
+        for rel in batch:
+            os.utime(os.path.join(fresh, rel), ns=(tick[0] * 10**9, tick[0] * 10**9))
+            os.rename(os.path.join(fresh, rel), os.path.join(root, rel))
+        with contextlib.redirect_stdout(io.StringIO()):
+            aggregate(root, out)
+        for rel in batch:
+            os.rename(os.path.join(root, rel), os.path.join(fresh, rel))
+    yield run
@@ -0,0 +1,240 @@
+"""Timing harness, baseline files and regression checks for the benchmark cases.
+
+A case is a generator registered with `@bench(name, number=...)`: it does its
+setup, yields the zero-argument callable to time, and cleans up after the
+yield. Each case runs `number` calls per round (doubled until a round lasts
+`--min-round` seconds; the calibration rounds double as warm-up) for
+`repeat` rounds with the GC off, and is summarised by the per-call median,
+min and stdev across rounds. Raise `Skip` during setup when an optional
+dependency is missing.
+
+The baseline JSON (`benchmarks/baseline.json` unless `--baseline`) maps case
+names to those stats plus the machine they were taken on. A case regresses
+when its median exceeds the baseline median by more than its threshold:
+`--threshold` (default `BENCH_THRESHOLD`, 0.25 = 25% slower) or a
+`--case-threshold NAME=FRACTION` rule for a name or name prefix.
+"""
+import gc
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import tempfile
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+_CASES: Dict[str, "Case"] = {}
+
+
+class Skip(Exception):
+    """Raised by a case's setup when it cannot run here (e.g. an optional dependency is missing)."""
+
+
+class Case:
+    def __init__(self, name: str, fn: Callable, number: int, repeat: Optional[int]):
+        self.name = name
+        self.fn = contextmanager(fn)
+        self.number = number
+        self.repeat = repeat
+
+
+def bench(name: str, number: int = 1, repeat: Optional[int] = None):
+    """Register a benchmark case (see module docstring)."""
+    def deco(fn):
+        _CASES[name] = Case(name, fn, number, repeat)
+        return fn
+    return deco
+
+
+def select(patterns: Optional[List[str]] = None) -> List[Case]:
+    return [c for name, c in sorted(_CASES.items()) if not patterns or any(name.startswith(p) for p in patterns)]
+
+
+def machine() -> dict:
+    return {"python": platform.python_version(), "platform": platform.platform(),
+            "processor": platform.processor() or platform.machine(), "cpus": os.cpu_count()}
+
+
+def run_case(case: Case, workdir: str, repeat: int = 5, min_round: float = 0.0) -> dict:
+    """Time one case; returns its stats (seconds per call) or {"skipped": reason}.
+
+    `number` grows (by doubling) until a round takes at least `min_round`
+    seconds, so microsecond cases are not dominated by timer and scheduler noise.
+    """
+    try:
+        with case.fn(workdir) as fn:
+            number = case.number
+            while True:
+                # warm-up and calibration: imports, caches, lazily built state
+                t0 = time.perf_counter()
+                for _ in range(number):
+                    fn()
+                if time.perf_counter() - t0 >= min_round:
+                    break
+                number *= 2
+            rounds = []
+            gc_was_enabled = gc.isenabled()
+            gc.disable()
+            try:
+                for _ in range(case.repeat or repeat):
+                    t0 = time.perf_counter()
+                    for _ in range(number):
+                        fn()
+                    rounds.append((time.perf_counter() - t0) / number)
+            finally:
+                if gc_was_enabled:
+                    gc.enable()
+    except Skip as e:
+        return {"skipped": str(e)}
+    return {
+        "median": statistics.median(rounds),
+        "min": min(rounds),
+        "mean": statistics.fmean(rounds),
+        "stdev": statistics.stdev(rounds) if len(rounds) > 1 else 0.0,
+        "rounds": len(rounds),
+        "number": number,
+    }
+
+
+def threshold_for(name: str, default: float, rules: Dict[str, float]) -> float:
+    """Most specific `rules` entry for a dotted case name, else `default`."""
+    parts = name.split(".")
+    for i in range(len(parts), 0, -1):
+        key = ".".join(parts[:i])
+        if key in rules:
+            return rules[key]
+    return default
+
+
+def compare(results: Dict[str, dict], baseline: Dict[str, dict], threshold: float,
+            rules: Optional[Dict[str, float]] = None) -> Dict[str, dict]:
+    """Per case: baseline median, relative change and status (ok, faster, regressed, new, skipped)."""
+    out = {}
+    for name, res in results.items():
+        base = baseline.get(name) or {}
+        if "skipped" in res:
+            out[name] = {"status": "skipped"}
+            continue
+        if "median" not in base:
+            out[name] = {"status": "new"}
+            continue
+        limit = threshold_for(name, threshold, rules or {})
+        change = res["median"] / base["median"] - 1.0 if base["median"] else 0.0
+        status = "regressed" if change > limit else "faster" if change < -limit else "ok"
+        out[name] = {"status": status, "baseline": base["median"], "change": change, "threshold": limit}
+    return out
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def save_baseline(path: str, results: Dict[str, dict], previous: Optional[dict] = None):
+    """Write `results` as the baseline, keeping entries of cases that were not run this time."""
+    merged = dict((previous or {}).get("results", {}))
+    merged.update({k: v for k, v in results.items() if "skipped" not in v})
+    doc = {"created": int(time.time()), "machine": machine(), "results": merged}
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(doc, fh, indent=2, sort_keys=True)
+        fh.write("\n")
+    os.replace(tmp, path)
+
+
+def _fmt(seconds: float) -> str:
+    for unit, scale in (("s", 1.0), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f}{unit}"
+    return f"{seconds / 1e-9:.0f}ns"
+
+
+def format_table(results: Dict[str, dict], verdicts: Dict[str, dict]) -> str:
+    w = max([len(n) for n in results] + [4]) + 2
+    lines = [f"{'case':<{w}}{'median':>12}{'min':>12}{'stdev':>12}{'baseline':>12}{'change':>9}  status"]
+    for name, res in results.items():
+        v = verdicts.get(name, {})
+        if "skipped" in res:
+            lines.append(f"{name:<{w}}{'':>57}  skipped ({res['skipped']})")
+            continue
+        base = _fmt(v["baseline"]) if "baseline" in v else "-"
+        change = f"{100 * v['change']:+.1f}%" if "change" in v else "-"
+        lines.append(f"{name:<{w}}{_fmt(res['median']):>12}{_fmt(res['min']):>12}{_fmt(res['stdev']):>12}"
+                     f"{base:>12}{change:>9}  {v.get('status', '')}")
+    return "\n".join(lines)
+
+
+def _rules(pairs) -> Dict[str, float]:
+    out = {}
+    for pair in pairs or ():
+        name, sep, value = pair.partition("=")
+        if not sep:
+            raise SystemExit(f"expected NAME=FRACTION, got {pair!r}")
+        out[name] = float(value)
+    return out
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m benchmarks")
+    p.add_argument("-k", "--only", action="append", default=[], metavar="PREFIX", help="run cases whose name starts with PREFIX")
+    p.add_argument("--list", action="store_true", help="list cases and exit")
+    p.add_argument("--repeat", type=int, default=int(os.getenv("BENCH_REPEAT", "5")), help="timed rounds per case")
+    p.add_argument("--min-round", type=float, default=float(os.getenv("BENCH_MIN_ROUND", "0.2")),
+                   help="minimum seconds per timed round; fast cases repeat their call until they reach it")
+    p.add_argument("--baseline", default=os.getenv("BENCH_BASELINE", DEFAULT_BASELINE))
+    p.add_argument("--save", action="store_true", help="write this run's results as the new baseline")
+    p.add_argument("--threshold", type=float, default=float(os.getenv("BENCH_THRESHOLD", "0.25")),
+                   help="allowed median slowdown vs. baseline as a fraction (0.25 = 25%%)")
+    p.add_argument("--case-threshold", action="append", default=[], metavar="NAME=FRACTION",
+                   help="threshold for a case name or prefix, e.g. etl=0.5")
+    p.add_argument("--json", default=None, help="also write this run's results and verdicts to a file")
+    args = p.parse_args(argv)
+
+    # spans would be written for every timed call; cases opt in if they need them
+    os.environ.setdefault("TRACING", "0")
+    from . import cases  # noqa: F401  registers the cases
+
+    selected = select(args.only)
+    if args.list:
+        print("\n".join(c.name for c in selected))
+        return 0
+    if not selected:
+        print("no benchmark cases match", args.only)
+        return 2
+
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="bench-") as workdir:
+        for case in selected:
+            print(f"running {case.name} ...", file=sys.stderr, flush=True)
+            case_dir = os.path.join(workdir, case.name)
+            os.makedirs(case_dir)
+            results[case.name] = run_case(case, case_dir, args.repeat, args.min_round)
+
+    previous = load_baseline(args.baseline)
+    verdicts = compare(results, previous.get("results", {}), args.threshold, _rules(args.case_threshold))
+    print(format_table(results, verdicts))
+    if previous and previous.get("machine") != machine():
+        print(f"\nnote: baseline was taken on {previous.get('machine')}; timings may not be comparable")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump({"machine": machine(), "results": results, "verdicts": verdicts}, fh, indent=2)
+    if args.save:
+        save_baseline(args.baseline, results, previous)
+        print(f"\nsaved baseline to {args.baseline}")
+        return 0
+
+    regressed = [n for n, v in verdicts.items() if v["status"] == "regressed"]
+    if regressed:
+        print(f"\n{len(regressed)} regression(s): {', '.join(regressed)}")
+        return 1
+    if not previous:
+        print(f"\nno baseline at {args.baseline}; run with --save to create one")
+    return 0
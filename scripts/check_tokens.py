@@ -2,11 +2,25 @@
 
 Usage:
   python scripts/check_tokens.py
+  python scripts/check_tokens.py --accounts   (per-account rows in the token DB)
 """
+import sys
 import json
+import time
 from src import token_store
 
 def main():
+    if "--accounts" in sys.argv:
+        try:
+            store = token_store.AccountTokenStore()
+            for platform in ("tiktok", "instagram"):
+                for account in store.accounts(platform):
+                    exp = store.load(platform, account).get("expires_at")
+                    left = f"{int(exp - time.time())}s" if exp else "unknown"
+                    print(f"{platform}\t{account}\texpires in {left}")
+        except Exception as e:
+            print("Failed to read token DB:", str(e))
+        return
     try:
         t = token_store.load_tokens()
         print(json.dumps(t, ensure_ascii=False, indent=2))
@@ -7,7 +7,7 @@ Usage:
 import os
 import argparse
 from src.poster_tiktok_api import get_authorize_url
-from src.pkce import generate_code_verifier, code_challenge_from_verifier
+from src.pkce import generate_code_verifier, code_challenge_from_verifier, state_path
 import json
 import uuid
 
@@ -29,8 +29,7 @@ code_challenge = code_challenge_from_verifier(code_verifier)
 
 # persist mapping to OUTPUT_DIR so callback can find code_verifier
 outdir = os.getenv("OUTPUT_DIR") or os.path.join(os.getcwd(), "output")
-os.makedirs(outdir, exist_ok=True)
-path = os.path.join(outdir, f"pkce_state_{state}.json")
+path = state_path(outdir, state)
 with open(path, "w", encoding="utf-8") as fh:
     json.dump({"state": state, "code_verifier": code_verifier}, fh)
 
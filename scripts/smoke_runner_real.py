@@ -20,7 +20,7 @@ if proc.returncode != 0:
 
 out = Path(os.environ.get("OUTPUT_DIR", ROOT / "output"))
 print("Checking output dir:", out)
-exists = any(out.rglob("*.png")) or any(out.rglob("*.mp4")) or any(out.rglob("dry_runs/tiktok_api/*.json"))
+exists = any(out.rglob("*.png")) or any(out.rglob("*.mp4")) or any(out.rglob("dry_runs/tiktok_api/**/*.json"))
 if not exists:
     print("Smoke test failed: no output artifacts found in OUTPUT_DIR")
     raise SystemExit(2)
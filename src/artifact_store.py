@@ -0,0 +1,95 @@
+"""Content-addressed store for rendered artifacts (banners, videos).
+
+Artifacts are keyed by a hash of their render inputs (template, title, price,
+variant params, encoder settings), so rendering identical content twice turns
+into a lookup. Files live in a two-level sharded layout
+(`<root>/ab/cd/<key><ext>`) to keep directory listings small, and every write
+goes through a temp file + `os.replace` so readers never see partial files.
+"""
+import os
+import json
+import hashlib
+import logging
+import tempfile
+from typing import Callable, Optional
+
+from .config import Config
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+ARTIFACT_LOOKUPS = metrics.counter("artifact_cache_lookups_total", "Artifact store lookups (banners .png, videos .mp4)", ["ext", "result"])
+
+
+def artifact_key(kind: str, **params) -> str:
+    """Return a stable hex key for an artifact of `kind` rendered from `params`.
+
+    Params are canonicalized as sorted JSON; non-JSON values are stringified.
+    """
+    payload = json.dumps({"kind": kind, "params": params}, sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def default_root(output_dir: Optional[str] = None) -> str:
+    """`ARTIFACT_DIR` if set, else `<output_dir>/artifacts` (output_dir defaults to Config.OUTPUT_DIR)."""
+    return os.getenv("ARTIFACT_DIR") or os.path.join(output_dir or Config.OUTPUT_DIR, "artifacts")
+
+
+class ArtifactStore:
+    def __init__(self, root: Optional[str] = None):
+        # resolved at construction so tests can patch Config
+        self.root = root or default_root()
+
+    def path_for(self, key: str, ext: str = "") -> str:
+        return os.path.join(self.root, key[:2], key[2:4], f"{key}{ext}")
+
+    def get(self, key: str, ext: str = "") -> Optional[str]:
+        """Return the stored path for `key` or None. Touches mtime so GC can treat it as recently used."""
+        path = self.path_for(key, ext)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    def put(self, key: str, ext: str, src_path: str) -> str:
+        """Atomically move an already-rendered file into the store and return its path."""
+        path = self.path_for(key, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(src_path, path)
+        return path
+
+    def get_or_create(self, key: str, ext: str, render: Callable[[str], Optional[str]]) -> str:
+        """Return the artifact for `key`, calling `render(tmp_path)` only on a miss.
+
+        `render` must write its output to the given temp path (which carries `ext`
+        so Pillow/moviepy infer the format). If it returns a different path (e.g.
+        a fallback that produced nothing), that path is returned and nothing is stored.
+        """
+        hit = self.get(key, ext)
+        if hit:
+            logger.debug("Artifact hit %s%s", key, ext)
+            ARTIFACT_LOOKUPS.labels(ext, "hit").inc()
+            return hit
+        ARTIFACT_LOOKUPS.labels(ext, "miss").inc()
+
+        path = self.path_for(key, ext)
+        shard = os.path.dirname(path)
+        os.makedirs(shard, exist_ok=True)
+        fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=ext, dir=shard)
+        os.close(fd)
+        try:
+            out = render(tmp)
+            if out and os.path.abspath(out) != os.path.abspath(tmp):
+                os.unlink(tmp)
+                return out
+            os.replace(tmp, path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
+        return path
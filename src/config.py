@@ -10,6 +10,8 @@ class Config:
 
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
     OPENAI_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    # opt in to real OpenAI captions in the generator; off = deterministic local captions
+    OPENAI_CAPTIONS = os.getenv("OPENAI_CAPTIONS", "0") == "1"
 
     OUTPUT_DIR = os.getenv("OUTPUT_DIR", "./output")
     MAX_PRODUCTS = int(os.getenv("MAX_PRODUCTS", 5))
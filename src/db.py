@@ -1,12 +1,17 @@
+import os
 import sqlite3
+import threading
 from pathlib import Path
 
-DB_PATH = Path(__file__).resolve().parent.parent / "data.db"
+# DB_PATH overrides the checked-in database, e.g. for load runs against fake services
+DB_PATH = Path(os.getenv("DB_PATH") or Path(__file__).resolve().parent.parent / "data.db")
 
 class DB:
     def __init__(self, path=DB_PATH):
         self.path = path
-        self.conn = sqlite3.connect(str(self.path))
+        # shared by the service's job workers; calls are serialized by the lock
+        self.conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._lock = threading.Lock()
         self._init()
 
     def _init(self):
@@ -22,18 +27,20 @@ class DB:
         self.conn.commit()
 
     def is_posted(self, item_id):
-        cur = self.conn.cursor()
-        cur.execute("SELECT 1 FROM posted_items WHERE item_id = ?", (item_id,))
-        return cur.fetchone() is not None
+        with self._lock:
+            cur = self.conn.cursor()
+            cur.execute("SELECT 1 FROM posted_items WHERE item_id = ?", (item_id,))
+            return cur.fetchone() is not None
 
     def mark_posted(self, item_id, shop_id=None):
-        cur = self.conn.cursor()
-        try:
-            cur.execute("INSERT INTO posted_items (item_id, shop_id) VALUES (?, ?)", (item_id, shop_id))
-            self.conn.commit()
-            return True
-        except sqlite3.IntegrityError:
-            return False
+        with self._lock:
+            cur = self.conn.cursor()
+            try:
+                cur.execute("INSERT INTO posted_items (item_id, shop_id) VALUES (?, ?)", (item_id, shop_id))
+                self.conn.commit()
+                return True
+            except sqlite3.IntegrityError:
+                return False
 
     def close(self):
         self.conn.close()
@@ -2,8 +2,12 @@ from .shopee_client import ShopeeClient
 from .openai_client import OpenAIClient
 from .config import Config
 from .db import DB
+from .image_fetcher import image_urls
+from .retention import dated_dir
+from . import tracing
 import os
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
@@ -11,22 +15,81 @@ shopee = None
 openai_client = None
 # instantiate DB lazily so tests can patch Config.OUTPUT_DIR / DB easily
 db = None
+# job-worker threads call _clients() concurrently; build each client once
+_clients_lock = threading.Lock()
 
 
-
-def run_once():
+def _clients():
     # ensure output dir exists (Config may be updated by tests before calling)
     os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
 
     global db, shopee, openai_client
-    if db is None:
-        db = DB()
+    with _clients_lock:
+        if db is None:
+            db = DB()
+
+        # lazy init clients so tests that patch the client classes work
+        if shopee is None:
+            shopee = ShopeeClient()
+        if openai_client is None:
+            if Config.OPENAI_CAPTIONS:
+                openai_client = OpenAIClient(api_key=Config.OPENAI_API_KEY, model=Config.OPENAI_MODEL)
+            else:
+                openai_client = OpenAIClient()
+        return db, shopee, openai_client
+
+
+def build_item(it, skip_posted=True):
+    """Affiliate link + caption for one raw Shopee item; None if skipped or failed.
+
+    Writes the caption file and marks the item posted, like a batch run. With
+    `skip_posted=False` an already-posted item is built again (reposts).
+    """
+    with tracing.item(it.get("itemid") or it.get("item_id"), stage="generate"):
+        return _build_item(it, skip_posted)
+
 
-    # lazy init clients so tests that patch the client classes work
-    if shopee is None:
-        shopee = ShopeeClient()
-    if openai_client is None:
-        openai_client = OpenAIClient()
+def _build_item(it, skip_posted):
+    db, shopee, openai_client = _clients()
+    itemid = it.get("itemid") or it.get("item_id")
+    shopid = it.get("shopid") or it.get("shop_id")
+    # Skip if already posted
+    if skip_posted and db.is_posted(str(itemid)):
+        return None
+    name = it.get("name")
+    price = (it.get("price") or 0) / 100000
+
+    try:
+        aff = shopee.generate_affiliate_link(itemid, shopid)
+        aff_link = aff.get("affiliate_link") or aff.get("url")
+
+        caption = openai_client.generate_caption(name, price, aff_link)
+    except Exception as e:
+        logger.exception("Failed to process item %s: %s", itemid, e)
+        return None
+
+    out = {
+        "itemid": itemid,
+        "shopid": shopid,
+        "name": name,
+        "price": price,
+        "affiliate_link": aff_link,
+        "caption": caption,
+        "images": image_urls(it),
+    }
+
+    # บันทึกออกไฟล์ (json/text)
+    slug = name.replace(" ", "_")[:40]
+    out["caption_file"] = os.path.join(dated_dir(os.path.join(Config.OUTPUT_DIR, "captions")), f"{slug}.txt")
+    with open(out["caption_file"], "w", encoding="utf-8") as f:
+        f.write(caption + "\n\n" + aff_link)
+    # Mark as posted in DB
+    db.mark_posted(str(itemid), str(shopid))
+    return out
+
+
+def run_once():
+    db, shopee, openai_client = _clients()
 
     items = shopee.search_popular_items(limit=Config.MAX_PRODUCTS)
     # Developer/testing: force a sample item when Shopee returns empty and env flag is set
@@ -35,37 +98,9 @@ def run_once():
     # สมมติ response มี items list
     results = []
     for it in items.get("items", [])[: Config.MAX_PRODUCTS]:
-        itemid = it.get("itemid") or it.get("item_id")
-        shopid = it.get("shopid") or it.get("shop_id")
-        # Skip if already posted
-        if db.is_posted(str(itemid)):
-            continue
-        name = it.get("name")
-        price = (it.get("price") or 0) / 100000
-
-        try:
-            aff = shopee.generate_affiliate_link(itemid, shopid)
-            aff_link = aff.get("affiliate_link") or aff.get("url")
-
-            caption = openai_client.generate_caption(name, price, aff_link)
-        except Exception as e:
-            logger.exception("Failed to process item %s: %s", itemid, e)
-            continue
-
-        out = {
-            "name": name,
-            "price": price,
-            "affiliate_link": aff_link,
-            "caption": caption,
-        }
-        results.append(out)
-
-        # บันทึกออกไฟล์ (json/text)
-        slug = name.replace(" ", "_")[:40]
-        with open(os.path.join(Config.OUTPUT_DIR, f"{slug}.txt"), "w", encoding="utf-8") as f:
-            f.write(caption + "\n\n" + aff_link)
-        # Mark as posted in DB
-        db.mark_posted(str(itemid), str(shopid))
+        out = build_item(it)
+        if out is not None:
+            results.append(out)
 
     return results
 
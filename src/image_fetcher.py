@@ -0,0 +1,149 @@
+"""Concurrent product-image fetcher with an on-disk HTTP cache.
+
+Images referenced by Shopee item payloads are downloaded through one pooled
+`requests.Session` with bounded parallelism and cached under
+`OUTPUT_DIR/image_cache` (sharded by URL hash). A cached image is reused
+without any request while it is fresh (`IMAGE_CACHE_TTL` seconds, or the
+server's Cache-Control max-age); after that it is revalidated with
+If-None-Match / If-Modified-Since so a 304 costs no body transfer.
+Decoded, pre-resized thumbnails are cached next to the original.
+"""
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import tempfile
+import concurrent.futures
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from PIL import Image
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def image_urls(item: dict) -> List[str]:
+    """Return absolute image URLs from a Shopee item payload (`images` list or single `image`).
+
+    Bare image ids are expanded with `SHOPEE_IMAGE_URL_TEMPLATE` ({image} placeholder).
+    """
+    tpl = os.getenv("SHOPEE_IMAGE_URL_TEMPLATE", "https://cf.shopee.co.th/file/{image}")
+    raw = item.get("images") or ([item["image"]] if item.get("image") else [])
+    urls = []
+    for img in raw:
+        if not img:
+            continue
+        img = str(img)
+        urls.append(img if img.startswith(("http://", "https://")) else tpl.replace("{image}", img))
+    return urls
+
+
+def _atomic_write(path: str, data: bytes):
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(path))
+    try:
+        with os.fdopen(fd, "wb") as fh:
+            fh.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+class ImageFetcher:
+    def __init__(self, cache_dir: Optional[str] = None, max_workers: Optional[int] = None,
+                 ttl: Optional[float] = None, session: Optional[requests.Session] = None, timeout: float = 15):
+        self.cache_dir = cache_dir or os.path.join(Config.OUTPUT_DIR, "image_cache")
+        self.max_workers = max_workers or int(os.getenv("IMAGE_FETCH_WORKERS", "8"))
+        self.ttl = ttl if ttl is not None else float(os.getenv("IMAGE_CACHE_TTL", "86400"))
+        self.timeout = timeout
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=self.max_workers, pool_maxsize=self.max_workers)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+        self.session = session
+
+    def _paths(self, url: str) -> Tuple[str, str]:
+        h = hashlib.sha256(url.encode("utf-8")).hexdigest()
+        d = os.path.join(self.cache_dir, h[:2])
+        return os.path.join(d, h), os.path.join(d, f"{h}.json")
+
+    def _fresh(self, meta: dict) -> bool:
+        max_age = meta.get("max_age")
+        ttl = self.ttl if max_age is None else min(self.ttl, max_age)
+        return time.time() - meta.get("fetched_at", 0) < ttl
+
+    def fetch(self, url: str) -> str:
+        """Return the local path of the original image for `url`, downloading only when needed."""
+        body_path, meta_path = self._paths(url)
+        meta = {}
+        if os.path.exists(body_path) and os.path.exists(meta_path):
+            try:
+                with open(meta_path, "r", encoding="utf-8") as fh:
+                    meta = json.load(fh)
+            except Exception:
+                meta = {}
+            if meta and self._fresh(meta):
+                return body_path
+
+        headers = {}
+        if meta.get("etag"):
+            headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            headers["If-Modified-Since"] = meta["last_modified"]
+
+        resp = self.session.get(url, headers=headers, timeout=self.timeout)
+        os.makedirs(os.path.dirname(body_path), exist_ok=True)
+        if resp.status_code == 304 and meta:
+            logger.debug("Image not modified: %s", url)
+        else:
+            resp.raise_for_status()
+            _atomic_write(body_path, resp.content)
+            meta = {"url": url, "etag": resp.headers.get("ETag"), "last_modified": resp.headers.get("Last-Modified")}
+        m = re.search(r"max-age=(\d+)", resp.headers.get("Cache-Control", ""))
+        meta["max_age"] = int(m.group(1)) if m else None
+        meta["fetched_at"] = time.time()
+        _atomic_write(meta_path, json.dumps(meta).encode("utf-8"))
+        return body_path
+
+    def thumbnail(self, url: str, size: Tuple[int, int]) -> str:
+        """Return a cached thumbnail (aspect-preserving, at most `size`) for `url`."""
+        src = self.fetch(url)
+        thumb = f"{src}_{size[0]}x{size[1]}.png"
+        if os.path.exists(thumb) and os.path.getmtime(thumb) >= os.path.getmtime(src):
+            return thumb
+        with Image.open(src) as im:
+            im = im.convert("RGBA") if im.mode in ("P", "LA", "RGBA") else im.convert("RGB")
+            im.thumbnail(size)
+            fd, tmp = tempfile.mkstemp(prefix=".tmp-", suffix=".png", dir=os.path.dirname(src))
+            os.close(fd)
+            im.save(tmp)
+        os.replace(tmp, thumb)
+        return thumb
+
+    def fetch_many(self, urls: Iterable[str], size: Optional[Tuple[int, int]] = None) -> Dict[str, Optional[str]]:
+        """Fetch (and optionally thumbnail) many URLs concurrently; failures map to None."""
+        unique = list(dict.fromkeys(u for u in urls if u))
+        out = {}
+
+        def work(u):
+            return self.thumbnail(u, size) if size else self.fetch(u)
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as exe:
+            futures = {exe.submit(work, u): u for u in unique}
+            for fut in concurrent.futures.as_completed(futures):
+                u = futures[fut]
+                try:
+                    out[u] = fut.result()
+                except Exception as e:
+                    logger.warning("Failed to fetch image %s: %s", u, e)
+                    out[u] = None
+        return out
@@ -0,0 +1,333 @@
+"""Persistent job queue and in-process worker pool for targeted runs.
+
+`POST /jobs` on the service stores a job spec in the `jobs` table of the jobs
+DB (`JOBS_DB_PATH`, default OUTPUT_DIR/jobs.db) and wakes the pool; a worker
+claims it and runs the runner's per-item pipeline for just those items, so
+regenerating or reposting one product takes seconds instead of a batch cycle.
+
+A spec names the items in one of three ways:
+
+    {"item_ids": ["123", "456"], "shop_id": "9"}   fetched with ShopeeClient.get_items
+    {"query": "หูฟัง", "limit": 5}                  ShopeeClient.search_items
+    {"items": [{"itemid": ..., "name": ..., ...}]}  raw Shopee item payloads
+
+plus optional `run` (real upload instead of a dry run, default `JOBS_RUN`),
+`account` (token DB account) and `skip_posted` (default: only for queries,
+explicitly named items are built again). When the pool starts, dry-run jobs
+a previous process left `running` are queued again; real-upload jobs are
+marked `interrupted` instead, since re-running one could post a video that
+was already committed (check GET /publish/items/{id} before resubmitting).
+"""
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from typing import Optional, Tuple
+
+from .config import Config
+from . import generator
+from . import phash
+from . import media_creator
+from . import runner
+from . import metrics
+from .image_fetcher import ImageFetcher
+from .upload_scheduler import UploadScheduler
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = metrics.gauge("jobs_queued", "Jobs waiting for a worker")
+JOB_SECONDS = metrics.histogram("job_seconds", "Job run time by outcome", ["outcome"], buckets=(1, 2.5, 5, 10, 30, 60, 120, 300, 600))
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+INTERRUPTED = "interrupted"
+
+_COLUMNS = ("id", "spec", "status", "result", "error", "attempts", "created_at", "updated_at", "started_at", "finished_at")
+
+
+def jobs_db_path() -> str:
+    return os.getenv("JOBS_DB_PATH") or os.path.join(Config.OUTPUT_DIR, "jobs.db")
+
+
+def parse_spec(payload) -> dict:
+    """Validate a POST /jobs body; raises ValueError with a client-facing message."""
+    if not isinstance(payload, dict):
+        raise ValueError("job must be a JSON object")
+    sources = [k for k in ("item_ids", "query", "items") if payload.get(k)]
+    if len(sources) != 1:
+        raise ValueError("give exactly one of item_ids, query or items")
+    spec = {}
+    if "item_ids" in sources:
+        ids = payload["item_ids"]
+        if not isinstance(ids, list):
+            ids = [ids]
+        spec["item_ids"] = [str(i) for i in ids]
+        if payload.get("shop_id"):
+            spec["shop_id"] = str(payload["shop_id"])
+    elif "query" in sources:
+        spec["query"] = str(payload["query"])
+        spec["limit"] = int(payload.get("limit") or Config.MAX_PRODUCTS)
+    else:
+        items = payload["items"]
+        if not isinstance(items, list) or not all(isinstance(it, dict) for it in items):
+            raise ValueError("items must be a list of item objects")
+        spec["items"] = items
+    run = payload.get("run")
+    spec["run"] = bool(run) if run is not None else os.getenv("JOBS_RUN", "0") == "1"
+    spec["account"] = payload.get("account")
+    skip = payload.get("skip_posted")
+    spec["skip_posted"] = bool(skip) if skip is not None else "query" in spec
+    return spec
+
+
+def init_db(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS jobs (
+        id TEXT PRIMARY KEY,
+        spec TEXT NOT NULL,
+        status TEXT NOT NULL,
+        result TEXT,
+        error TEXT,
+        attempts INTEGER NOT NULL DEFAULT 0,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        started_at REAL,
+        finished_at REAL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, created_at)")
+    conn.commit()
+
+
+class JobQueue:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or jobs_db_path()
+        self._local = threading.local()
+        init_db(self._conn())
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def submit(self, spec: dict) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        self._conn().execute(
+            "INSERT INTO jobs (id, spec, status, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+            (job_id, json.dumps(spec, ensure_ascii=False), QUEUED, now, now),
+        )
+        return job_id
+
+    def claim(self) -> Optional[tuple]:
+        """Atomically move the oldest queued job to running; returns (id, spec) or None."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT id, spec FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)).fetchone()
+            if row is not None:
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, updated_at = ? WHERE id = ?",
+                    (RUNNING, now, now, row[0]),
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return (row[0], json.loads(row[1])) if row else None
+
+    def _finish(self, job_id: str, status: str, result=None, error=None):
+        now = time.time()
+        self._conn().execute(
+            "UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, updated_at = ? WHERE id = ?",
+            (status, None if result is None else json.dumps(result, ensure_ascii=False, default=str), error, now, now, job_id),
+        )
+
+    def complete(self, job_id: str, result: dict):
+        self._finish(job_id, DONE, result=result)
+
+    def fail(self, job_id: str, error: str):
+        self._finish(job_id, FAILED, error=error)
+
+    def recover_running(self) -> Tuple[int, int]:
+        """Settle jobs a previous process left running (it died or was stopped mid-job).
+
+        Dry runs are queued again. Real-upload jobs are marked interrupted: the
+        process may have died after a commit, and running them again would post
+        those videos twice. Returns (requeued, interrupted).
+        """
+        conn = self._conn()
+        now = time.time()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            interrupted = conn.execute(
+                "UPDATE jobs SET status = ?, error = ?, finished_at = ?, updated_at = ? "
+                "WHERE status = ? AND json_extract(spec, '$.run')",
+                (INTERRUPTED, "interrupted by a restart during a real upload; not retried automatically", now, now, RUNNING),
+            ).rowcount
+            requeued = conn.execute("UPDATE jobs SET status = ?, updated_at = ? WHERE status = ?", (QUEUED, now, RUNNING)).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return requeued, interrupted
+
+    def get(self, job_id: str) -> Optional[dict]:
+        row = self._conn().execute(f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = dict(zip(_COLUMNS, row))
+        job["spec"] = json.loads(job["spec"])
+        if job["result"] is not None:
+            job["result"] = json.loads(job["result"])
+        return job
+
+    def depth(self) -> int:
+        return self._conn().execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (QUEUED,)).fetchone()[0]
+
+
+def resolve_items(spec: dict) -> list:
+    """Raw Shopee item payloads for a job spec."""
+    if "items" in spec:
+        return spec["items"]
+    _, shopee, _ = generator._clients()
+    if "item_ids" in spec:
+        resp = shopee.get_items(spec["item_ids"], shop_id=spec.get("shop_id"))
+    else:
+        resp = shopee.search_items(spec["query"], limit=spec["limit"])
+    return (resp or {}).get("items", [])
+
+
+def run_job(spec: dict, scheduler: Optional[UploadScheduler] = None) -> dict:
+    """Generate and post the spec's items; returns a per-item outcome list."""
+    raw = resolve_items(spec)
+    outcomes, built = [], []
+    for it in raw:
+        item = generator.build_item(it, skip_posted=spec.get("skip_posted", False))
+        if item is None:
+            outcomes.append({"item_id": str(it.get("itemid") or it.get("item_id")), "status": "skipped"})
+        else:
+            built.append(item)
+
+    thumbs = ImageFetcher().fetch_many([(it.get("images") or [None])[0] for it in built], size=media_creator.PRODUCT_THUMB_SIZE)
+    posted_index = phash.PHashIndex()
+    # queue every upload before waiting on any, so the shared scheduler interleaves them by score
+    queued = []
+    for idx, item in enumerate(built):
+        thumb = thumbs.get((item.get("images") or [None])[0])
+        queued.append(runner.process_item(item, idx, thumb, posted_index,
+                                          scheduler=scheduler if spec.get("run") else None, account=spec.get("account")))
+    for outcome in queued:
+        fut = outcome.pop("future", None)
+        if fut is not None:
+            try:
+                outcome["result"] = fut.result()
+                outcome["status"] = "committed"
+                if outcome["thumb_hash"] is not None:
+                    posted_index.commit(outcome["item_id"], outcome["thumb_hash"])
+            except Exception as e:
+                logger.exception("Failed to post item %s", outcome["title"])
+                outcome.update(status="failed", error=str(e))
+                if outcome["thumb_hash"] is not None:
+                    posted_index.release(outcome["item_id"], outcome["thumb_hash"])
+        outcome.pop("thumb_hash", None)
+        outcomes.append(outcome)
+    return {"requested": len(raw), "items": outcomes}
+
+
+class JobWorkers:
+    """Worker threads draining a JobQueue; real uploads share one UploadScheduler."""
+
+    def __init__(self, queue: Optional[JobQueue] = None, workers: Optional[int] = None,
+                 poll: Optional[float] = None, run_job=run_job):
+        self._queue = queue
+        self.workers = workers or int(os.getenv("JOBS_WORKERS", "2"))
+        self.poll = poll or float(os.getenv("JOBS_POLL_INTERVAL", "5"))
+        self.run_job = run_job
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._threads = []
+        self._scheduler = None
+        self._scheduler_lock = threading.Lock()
+
+    @property
+    def queue(self) -> JobQueue:
+        if self._queue is None:
+            self._queue = JobQueue()
+        return self._queue
+
+    def start(self):
+        QUEUE_DEPTH.set_function(self.queue.depth)
+        # clients are shared by all workers; build them once here rather than racing in _clients()
+        generator._clients()
+        requeued, interrupted = self.queue.recover_running()
+        if requeued:
+            logger.info("Requeued %s interrupted dry-run jobs", requeued)
+        if interrupted:
+            logger.warning("Marked %s upload jobs interrupted by a restart; resubmit them after checking publish status", interrupted)
+        for i in range(self.workers):
+            t = threading.Thread(target=self._loop, name=f"job-worker-{i}", daemon=True)
+            t.start()
+            self._threads.append(t)
+
+    def submit(self, spec: dict) -> str:
+        job_id = self.queue.submit(spec)
+        with self._cond:
+            self._cond.notify()
+        return job_id
+
+    def stop(self, timeout: Optional[float] = None):
+        """Stop claiming jobs and wait for running ones; unfinished ones are settled on the next start."""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout)
+        if self._scheduler is not None:
+            self._scheduler.shutdown()
+
+    def _upload_scheduler(self) -> UploadScheduler:
+        with self._scheduler_lock:
+            if self._scheduler is None:
+                self._scheduler = UploadScheduler()
+            return self._scheduler
+
+    def _loop(self):
+        while not self._stopped:
+            try:
+                job = self.queue.claim()
+            except Exception:
+                logger.exception("Failed to claim a job")
+                job = None
+            if job is None:
+                with self._cond:
+                    if not self._stopped:
+                        # other processes may queue jobs too, so poll as well as wait for submit()
+                        self._cond.wait(self.poll)
+                continue
+            self._execute(*job)
+
+    def _execute(self, job_id: str, spec: dict):
+        logger.info("Running job %s", job_id)
+        t0 = time.perf_counter()
+        try:
+            scheduler = self._upload_scheduler() if spec.get("run") else None
+            result = self.run_job(spec, scheduler=scheduler)
+        except Exception as e:
+            logger.exception("Job %s failed", job_id)
+            JOB_SECONDS.labels(FAILED).observe(time.perf_counter() - t0)
+            self.queue.fail(job_id, str(e))
+            return
+        JOB_SECONDS.labels(DONE).observe(time.perf_counter() - t0)
+        self.queue.complete(job_id, result)
+        logger.info("Job %s done", job_id)
@@ -1,7 +1,12 @@
 # ตัวอย่างง่าย ๆ: สร้างรูป Banner ด้วย Pillow
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw
 from .config import Config
+from .artifact_store import ArtifactStore, artifact_key
+from . import text_layout
+from . import metrics
+from . import tracing
 import os
+import hashlib
 from pathlib import Path
 try:
     from moviepy.editor import ImageClip, concatenate_videoclips
@@ -9,21 +14,55 @@ try:
 except Exception:
     MOVIEPY_AVAILABLE = False
 
+# bump when the banner drawing code changes so cached artifacts are re-rendered
+BANNER_TEMPLATE = "banner-v3"
+BANNER_SIZE = (720, 1280)
+BANNER_MARGIN = (30, 50)
+TITLE_BOX_HEIGHT = 420
+PRICE_BOX_HEIGHT = 90
+PRODUCT_IMAGE_TOP = 620
+# thumbnails are pre-resized to this box by image_fetcher so pasting needs no resampling
+PRODUCT_THUMB_SIZE = (660, 600)
+# colour schemes per banner variant: (background, title, price); "alt" is the high-contrast dark version
+BANNER_VARIANTS = {
+    "base": ((255, 255, 255), (0, 0, 0), (255, 0, 0)),
+    "alt": ((20, 20, 20), (255, 255, 255), (255, 210, 0)),
+}
+VIDEO_FPS = 24
+VIDEO_CODEC = "libx264"
 
-def make_banner(title, price, output_path):
-    img = Image.new("RGB", (720, 1280), color=(255,255,255))
+BANNER_SECONDS = metrics.histogram("banner_render_seconds", "make_banner duration")
+VIDEO_SECONDS = metrics.histogram("video_encode_seconds", "Video encode duration (moviepy)")
+
+
+@tracing.traced("media.make_banner")
+@BANNER_SECONDS.time()
+def make_banner(title, price, output_path, image_path=None, variant="base"):
+    background, title_fill, price_fill = BANNER_VARIANTS[variant]
+    img = Image.new("RGB", (BANNER_SIZE[0], BANNER_SIZE[1]), color=background)
     d = ImageDraw.Draw(img)
-    # ใส่ text (ปรับ font path ตามระบบ)
-    try:
-        font = ImageFont.truetype("arial.ttf", 40)
-    except:
-        font = ImageFont.load_default()
-    d.text((30, 50), title, font=font, fill=(0,0,0))
-    d.text((30, 120), f"ราคา {price} บาท", font=font, fill=(255,0,0))
+    # ชื่อสินค้าตัดบรรทัด/ปรับขนาดฟอนต์อัตโนมัติให้พอดีกรอบ (ฟอนต์ไทยตาม BANNER_FONTS)
+    left, top = BANNER_MARGIN
+    width = BANNER_SIZE[0] - 2 * left
+    title_layout = text_layout.fit_text(str(title), (width, TITLE_BOX_HEIGHT), max_size=72, min_size=28)
+    y = title_layout.draw(d, (left, top), fill=title_fill)
+    price_layout = text_layout.fit_text(f"ราคา {price} บาท", (width, PRICE_BOX_HEIGHT), max_size=56, min_size=28)
+    y = price_layout.draw(d, (left, y + 30), fill=price_fill)
+    if image_path:
+        # รูปสินค้า (thumbnail ที่ย่อไว้แล้ว) จัดกึ่งกลางในพื้นที่ด้านล่าง
+        with Image.open(image_path) as thumb:
+            thumb = thumb.convert("RGBA")
+            box_top = max(y + 30, PRODUCT_IMAGE_TOP)
+            box_h = BANNER_SIZE[1] - box_top - top
+            if thumb.width > width or thumb.height > box_h:
+                thumb.thumbnail((width, box_h))
+            x = (BANNER_SIZE[0] - thumb.width) // 2
+            img.paste(thumb, (x, box_top + (box_h - thumb.height) // 2), thumb)
     img.save(output_path)
     return output_path
 
 
+@tracing.traced("media.encode_video")
 def make_video_from_images(image_paths, output_path, duration_per_image=2):
     """Create a short MP4 from one or more images using moviepy.
 
@@ -39,6 +78,49 @@ def make_video_from_images(image_paths, output_path, duration_per_image=2):
         clip = ImageClip(img).set_duration(duration_per_image)
         clips.append(clip)
 
-    final = concatenate_videoclips(clips, method="compose")
-    final.write_videofile(output_path, fps=24, codec="libx264", audio=False, verbose=False, logger=None)
+    with VIDEO_SECONDS.time():
+        final = concatenate_videoclips(clips, method="compose")
+        final.write_videofile(output_path, fps=VIDEO_FPS, codec=VIDEO_CODEC, audio=False, verbose=False, logger=None)
     return output_path
+
+
+def _file_digest(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+@tracing.traced("media.render_banner")
+def render_banner(title, price, variant="base", image_path=None, store=None):
+    """Return a banner path from the artifact store, rendering it only on a miss."""
+    store = store or ArtifactStore()
+    key = artifact_key(
+        "banner",
+        template=BANNER_TEMPLATE,
+        fonts=text_layout.font_chain(),
+        title=title,
+        price=price,
+        variant=variant,
+        image=_file_digest(image_path) if image_path else None,
+    )
+    return store.get_or_create(key, ".png", lambda tmp: make_banner(title, price, tmp, image_path=image_path, variant=variant))
+
+
+@tracing.traced("media.render_video")
+def render_video(image_paths, duration_per_image=2, store=None):
+    """Return a video path from the artifact store, encoding it only on a miss.
+
+    The key covers the input image contents and the encoder settings. Without
+    moviepy the first image is returned and nothing is stored.
+    """
+    store = store or ArtifactStore()
+    key = artifact_key(
+        "video",
+        images=[_file_digest(p) for p in image_paths],
+        duration_per_image=duration_per_image,
+        fps=VIDEO_FPS,
+        codec=VIDEO_CODEC,
+    )
+    return store.get_or_create(key, ".mp4", lambda tmp: make_video_from_images(image_paths, tmp, duration_per_image))
@@ -0,0 +1,388 @@
+"""In-process metrics registry: counters, gauges and histograms in the
+Prometheus text format, served on the service's `/metrics`.
+
+Counters and histograms keep one small list per (series, thread); the owning
+thread updates it without taking a lock, and a scrape sums the shards.
+Shards of threads that have exited are folded into a per-series total, so
+short-lived pool threads don't pile up. Gauges are plain values (set or
+computed at scrape time from a callback, e.g. queue depths).
+
+Modules declare their metrics at import time:
+
+    PARTS = metrics.counter("upload_parts_total", "Parts uploaded", ["outcome"])
+    PARTS.labels("ok").inc()
+    with metrics.histogram("banner_render_seconds", "Banner render time").time():
+        ...
+
+A standalone process (the runner) pushes its registry in the same text
+format with `push(url, job)` -- to the service's `PUT /metrics/job/{job}` or
+to a Prometheus Pushgateway.
+"""
+import os
+import re
+import time
+import bisect
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# (sample name, labels, value)
+Sample = Tuple[str, Dict[str, str], float]
+
+
+class _Sharded:
+    """Per-thread vectors of floats, summed on read."""
+
+    __slots__ = ("_width", "_local", "_lock", "_shards", "_retired")
+
+    def __init__(self, width: int):
+        self._width = width
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []  # (thread, vector)
+        self._retired = [0.0] * width
+
+    def shard(self) -> List[float]:
+        try:
+            return self._local.v
+        except AttributeError:
+            v = self._local.v = [0.0] * self._width
+            with self._lock:
+                self._shards.append((threading.current_thread(), v))
+            return v
+
+    def total(self) -> List[float]:
+        with self._lock:
+            live = []
+            for thread, v in self._shards:
+                if thread.is_alive():
+                    live.append((thread, v))
+                else:
+                    self._retired = [a + b for a, b in zip(self._retired, v)]
+            self._shards = live
+            out = list(self._retired)
+        for _, v in live:
+            out = [a + b for a, b in zip(out, v)]
+        return out
+
+
+class _CounterChild:
+    __slots__ = ("_v",)
+
+    def __init__(self):
+        self._v = _Sharded(1)
+
+    def inc(self, amount: float = 1):
+        self._v.shard()[0] += amount
+
+    def value(self) -> float:
+        return self._v.total()[0]
+
+
+class _GaugeChild:
+    __slots__ = ("_value", "_fn", "_lock")
+
+    def __init__(self):
+        self._value = 0.0
+        self._fn = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float):
+        self._value = value
+
+    def inc(self, amount: float = 1):
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def set_function(self, fn: Optional[Callable[[], float]]):
+        """Compute the value at scrape time (None to go back to set())."""
+        self._fn = fn
+
+    def value(self) -> float:
+        if self._fn is not None:
+            try:
+                return float(self._fn())
+            except Exception:
+                logger.exception("Gauge callback failed")
+                return float("nan")
+        return self._value
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_v")
+
+    def __init__(self, bounds: Sequence[float]):
+        self._bounds = bounds
+        # one slot per bucket, one for +Inf, then the sum
+        self._v = _Sharded(len(bounds) + 2)
+
+    def observe(self, value: float):
+        v = self._v.shard()
+        v[bisect.bisect_left(self._bounds, value)] += 1
+        v[-1] += value
+
+    @contextmanager
+    def time(self):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - t0)
+
+    def snapshot(self) -> Tuple[List[float], float, float]:
+        """(cumulative bucket counts incl. +Inf, sum, count)."""
+        v = self._v.total()
+        cumulative, running = [], 0.0
+        for c in v[:-1]:
+            running += c
+            cumulative.append(running)
+        return cumulative, v[-1], running
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values, **kw):
+        if kw:
+            values = tuple(kw[n] for n in self.labelnames)
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _default(self):
+        return self.labels()
+
+    def _series(self):
+        return [(dict(zip(self.labelnames, key)), child) for key, child in list(self._children.items())]
+
+    def samples(self) -> List[Sample]:
+        return [(self.name, labels, child.value()) for labels, child in self._series()]
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float):
+        self._default().set(value)
+
+    def inc(self, amount: float = 1):
+        self._default().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._default().dec(amount)
+
+    def set_function(self, fn: Optional[Callable[[], float]]):
+        self._default().set_function(fn)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float):
+        self._default().observe(value)
+
+    def time(self):
+        return self._default().time()
+
+    def samples(self) -> List[Sample]:
+        out = []
+        for labels, child in self._series():
+            cumulative, total, count = child.snapshot()
+            for bound, c in zip(list(self.buckets) + [float("inf")], cumulative):
+                out.append((self.name + "_bucket", dict(labels, le=_num(bound)), c))
+            out.append((self.name + "_sum", labels, total))
+            out.append((self.name + "_count", labels, count))
+        return out
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, cls, name, help, labelnames, **kw):
+        with self._lock:
+            m = self._metrics.get(name)
+            if m is None:
+                m = self._metrics[name] = cls(name, help, labelnames, **kw)
+            elif not isinstance(m, cls):
+                raise ValueError(f"metric {name} already registered as a {m.kind}")
+            return m
+
+    def counter(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Counter:
+        return self._get(Counter, name, help, labelnames)
+
+    def gauge(self, name: str, help: str, labelnames: Iterable[str] = ()) -> Gauge:
+        return self._get(Gauge, name, help, labelnames)
+
+    def histogram(self, name: str, help: str, labelnames: Iterable[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._get(Histogram, name, help, labelnames, buckets=buckets)
+
+    def collect(self) -> List[tuple]:
+        """Families as (name, kind, help, samples)."""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return [(m.name, m.kind, m.help, m.samples()) for m in metrics]
+
+    def render(self, extra: Iterable[tuple] = ()) -> str:
+        return render(merge(self.collect(), extra))
+
+
+REGISTRY = Registry()
+counter = REGISTRY.counter
+gauge = REGISTRY.gauge
+histogram = REGISTRY.histogram
+
+
+def _num(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if v == float("-inf"):
+        return "-Inf"
+    if v != v:
+        return "NaN"
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _escape_help(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _unescape(v: str) -> str:
+    return re.sub(r"\\(.)", lambda m: "\n" if m.group(1) == "n" else m.group(1), v)
+
+
+def render(families: Iterable[tuple]) -> str:
+    lines = []
+    for name, kind, help, samples in families:
+        lines.append(f"# HELP {name} {_escape_help(help)}")
+        lines.append(f"# TYPE {name} {kind}")
+        for sample, labels, value in samples:
+            if labels:
+                body = ",".join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+                lines.append(f"{sample}{{{body}}} {_num(value)}")
+            else:
+                lines.append(f"{sample} {_num(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def merge(*groups: Iterable[tuple]) -> List[tuple]:
+    """Combine family lists; samples of families with the same name are concatenated."""
+    out: Dict[str, tuple] = {}
+    for group in groups:
+        for name, kind, help, samples in group:
+            if name in out:
+                out[name][3].extend(samples)
+            else:
+                out[name] = (name, kind, help, list(samples))
+    return list(out.values())
+
+
+_SAMPLE = re.compile(r'^([a-zA-Z_:][a-zA-Z0-9_:]*)(?:\{(.*)\})?\s+(\S+)(?:\s+\d+)?$')
+_LABEL = re.compile(r'([a-zA-Z_][a-zA-Z0-9_]*)="((?:[^"\\]|\\.)*)"')
+
+
+def parse(text: str) -> List[tuple]:
+    """Parse the Prometheus text format into (name, kind, help, samples) families."""
+    families: Dict[str, list] = {}
+    helps, kinds = {}, {}
+    current = None
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if line.startswith("#"):
+            parts = line.split(None, 3)
+            if len(parts) >= 3 and parts[1] in ("HELP", "TYPE"):
+                name = parts[2]
+                value = parts[3] if len(parts) > 3 else ""
+                if parts[1] == "HELP":
+                    helps[name] = _unescape(value)
+                else:
+                    kinds[name] = value
+                families.setdefault(name, [])
+                current = name
+            continue
+        m = _SAMPLE.match(line)
+        if not m:
+            raise ValueError(f"bad sample line: {line!r}")
+        sample, body, value = m.groups()
+        labels = {k: _unescape(v) for k, v in _LABEL.findall(body or "")}
+        family = current if current and sample.startswith(current) else sample
+        families.setdefault(family, []).append((sample, labels, float(value)))
+    return [(name, kinds.get(name, "untyped"), helps.get(name, ""), samples) for name, samples in families.items()]
+
+
+def with_labels(families: Iterable[tuple], **labels) -> List[tuple]:
+    """Copy of `families` with extra labels on every sample (e.g. job="runner")."""
+    return [(name, kind, help, [(s, dict(l, **labels), v) for s, l, v in samples])
+            for name, kind, help, samples in families]
+
+
+def push(url: str, job: str, registry: Registry = REGISTRY, timeout: float = 10) -> bool:
+    """PUT the registry to `{url}/metrics/job/{job}`; best-effort, returns success.
+
+    Sends SERVICE_API_KEY as X-API-Key when set (the service requires it).
+    """
+    headers = {"Content-Type": CONTENT_TYPE}
+    if os.getenv("SERVICE_API_KEY"):
+        headers["X-API-Key"] = os.environ["SERVICE_API_KEY"]
+    try:
+        resp = requests.put(f"{url.rstrip('/')}/metrics/job/{job}", data=registry.render().encode("utf-8"),
+                            headers=headers, timeout=timeout)
+        resp.raise_for_status()
+        return True
+    except Exception:
+        logger.exception("Failed to push metrics to %s", url)
+        return False
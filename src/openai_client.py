@@ -6,8 +6,14 @@ tests or when the package is not installed), the class still exists and
 generate_caption falls back to a deterministic local string so tests remain
 fast and offline.
 """
+import time
 from typing import Optional
 
+from . import metrics
+from . import tracing
+
+OPENAI_SECONDS = metrics.histogram("openai_request_seconds", "OpenAI chat completion latency", ["outcome"])
+
 
 class OpenAIClient:
     def __init__(self, api_key: Optional[str] = None, model: str = "gpt-4o-mini"):
@@ -40,22 +46,27 @@ class OpenAIClient:
 
         # Attempt a chat completion with the v1 client. Keep errors local so
         # caller can fall back as needed.
+        t0 = time.perf_counter()
         try:
-            resp = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {
-                        "role": "user",
-                        "content": (
-                            f"Create a short social-media caption for the product: {product_name} "
-                            f"priced at {price:.2f}. Include a call-to-action and a short set of hashtags."
-                        ),
-                    }
-                ],
-                max_tokens=64,
-            )
+            with tracing.span("openai.caption", model=self.model):
+                resp = self.client.chat.completions.create(
+                    model=self.model,
+                    messages=[
+                        {
+                            "role": "user",
+                            "content": (
+                                f"Create a short social-media caption for the product: {product_name} "
+                                f"priced at {price:.2f}. Include a call-to-action and a short set of hashtags."
+                            ),
+                        }
+                    ],
+                    max_tokens=64,
+                )
             # v1 response shape: resp.choices[0].message.content
-            return resp.choices[0].message.content
+            caption = resp.choices[0].message.content
+            OPENAI_SECONDS.labels("ok").observe(time.perf_counter() - t0)
+            return caption
         except Exception:
+            OPENAI_SECONDS.labels("error").observe(time.perf_counter() - t0)
             # On any error, return a fallback caption
             return f"{product_name} only {price:.2f}! Buy here: {affiliate_link}"
@@ -0,0 +1,156 @@
+"""Perceptual hashes (aHash/dHash via NumPy) for rendered thumbnails.
+
+Used to collapse near-duplicate variants before they are scored/encoded, and
+(through `PHashIndex`) to notice across runs that a thumbnail we are about to
+post looks the same as one already posted for a different item.
+"""
+import os
+import json
+import time
+import logging
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+MAX_DISTANCE = int(os.getenv("PHASH_MAX_DISTANCE", "6"))
+
+
+def _gray(image, size: Tuple[int, int]) -> np.ndarray:
+    if isinstance(image, str):
+        with Image.open(image) as im:
+            return np.asarray(im.convert("L").resize(size, Image.BILINEAR), dtype=np.int16)
+    return np.asarray(image.convert("L").resize(size, Image.BILINEAR), dtype=np.int16)
+
+
+def _pack(bits: np.ndarray) -> int:
+    return int.from_bytes(np.packbits(bits.ravel()).tobytes(), "big")
+
+
+def ahash(image, hash_size: int = 8) -> int:
+    """Average hash: one bit per pixel of a hash_size² thumbnail, set if above the mean."""
+    px = _gray(image, (hash_size, hash_size))
+    return _pack(px > px.mean())
+
+
+def dhash(image, hash_size: int = 8) -> int:
+    """Difference hash: one bit per horizontally adjacent pixel pair, set if brightness increases."""
+    px = _gray(image, (hash_size + 1, hash_size))
+    return _pack(px[:, 1:] > px[:, :-1])
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+@lru_cache(maxsize=4096)
+def _file_dhash(path: str, mtime_ns: int) -> int:
+    return dhash(path)
+
+
+def file_hash(path: str) -> int:
+    """dHash of an image file, memoized per (path, mtime)."""
+    return _file_dhash(path, os.stat(path).st_mtime_ns)
+
+
+def _popcount64(x: np.ndarray) -> np.ndarray:
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(x)
+    return np.unpackbits(x.view(np.uint8).reshape(-1, 8), axis=1).sum(axis=1)
+
+
+def dedupe_paths(paths: List[str], max_distance: int = MAX_DISTANCE) -> List[str]:
+    """Return `paths` with near-duplicates removed (first occurrence wins, order kept).
+
+    Identical paths collapse without hashing; unreadable images are kept.
+    """
+    kept: List[str] = []
+    hashes: List[int] = []
+    for p in dict.fromkeys(paths):
+        try:
+            h = file_hash(p)
+        except Exception:
+            kept.append(p)
+            continue
+        if any(hamming(h, other) <= max_distance for other in hashes):
+            logger.debug("Dropping near-duplicate variant %s", p)
+            continue
+        hashes.append(h)
+        kept.append(p)
+    return kept
+
+
+class PHashIndex:
+    """Persistent index of posted thumbnail hashes per item (append-only JSON lines).
+
+    Lookups are vectorized over all stored hashes, so checking one candidate
+    against tens of thousands of posted thumbnails is a single NumPy pass.
+    """
+
+    def __init__(self, path: Optional[str] = None, max_distance: int = MAX_DISTANCE):
+        self.path = path or os.path.join(Config.OUTPUT_DIR, "phash_index.jsonl")
+        self.max_distance = max_distance
+        self._hashes = np.zeros(0, dtype=np.uint64)
+        self._items: List[str] = []
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        hashes = []
+        with open(self.path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                    h, item_id = int(rec["hash"], 16), str(rec["item_id"])
+                except Exception:
+                    continue
+                hashes.append(h)
+                self._items.append(item_id)
+        self._hashes = np.array(hashes, dtype=np.uint64)
+
+    def __len__(self):
+        return len(self._items)
+
+    def find_duplicate(self, h: int, item_id) -> Optional[Tuple[str, int]]:
+        """Return (other_item_id, distance) of the closest posted match for a different item, or None."""
+        if not len(self._items):
+            return None
+        dist = _popcount64(self._hashes ^ np.uint64(h))
+        best = None
+        for idx in np.nonzero(dist <= self.max_distance)[0]:
+            other = self._items[idx]
+            if other != str(item_id) and (best is None or dist[idx] < best[1]):
+                best = (other, int(dist[idx]))
+        return best
+
+    def add(self, item_id, h: int):
+        self._write(item_id, h)
+        self.reserve(item_id, h)
+
+    def reserve(self, item_id, h: int):
+        """Hold a hash in memory while its upload is in flight; `commit` or `release` it later."""
+        self._hashes = np.append(self._hashes, np.uint64(h))
+        self._items.append(str(item_id))
+
+    def commit(self, item_id, h: int):
+        """Persist a reserved hash once its upload succeeded."""
+        self._write(item_id, h)
+
+    def release(self, item_id, h: int):
+        """Drop a reserved hash whose upload failed."""
+        for idx in range(len(self._items) - 1, -1, -1):
+            if self._items[idx] == str(item_id) and int(self._hashes[idx]) == h:
+                self._hashes = np.delete(self._hashes, idx)
+                del self._items[idx]
+                return
+
+    def _write(self, item_id, h: int):
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with open(self.path, "a", encoding="utf-8") as fh:
+            fh.write(json.dumps({"item_id": str(item_id), "hash": f"{h:016x}", "ts": int(time.time())}) + "\n")
@@ -1,5 +1,6 @@
 """Utilities for PKCE (code_verifier / code_challenge)"""
 import os
+import glob
 import hashlib
 import secrets
 
@@ -14,3 +15,15 @@ def code_challenge_from_verifier(verifier: str) -> str:
     # hex-encoded SHA256
     h = hashlib.sha256(verifier.encode('utf-8')).hexdigest()
     return h
+
+
+def state_path(outdir: str, state: str) -> str:
+    """Where the verifier for `state` is saved: `<outdir>/pkce/YYYY/MM/DD/pkce_state_<state>.json`."""
+    from .retention import dated_dir
+    return os.path.join(dated_dir(os.path.join(outdir, "pkce")), f"pkce_state_{state}.json")
+
+
+def find_state_files(outdir: str, state: str = None) -> list:
+    """Saved verifier files for `state` (any state if None), sharded and legacy flat ones."""
+    name = f"pkce_state_{glob.escape(state)}.json" if state else "pkce_state_*.json"
+    return sorted(glob.glob(os.path.join(outdir, "pkce", "*", "*", "*", name))) + sorted(glob.glob(os.path.join(outdir, name)))
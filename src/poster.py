@@ -6,7 +6,7 @@ from .config import Config
 def prepare_post(item):
     # item: dict จาก generator.run_once
     slug = item["name"].replace(" ", "_")[:40]
-    text_file = os.path.join(Config.OUTPUT_DIR, f"{slug}.txt")
+    text_file = item.get("caption_file") or os.path.join(Config.OUTPUT_DIR, f"{slug}.txt")
     banner_file = os.path.join(Config.OUTPUT_DIR, f"{slug}.png")
 
     # (สมมติ) media_creator.make_banner
@@ -1,9 +1,10 @@
 """Dry-run Instagram poster interface.
 
 Provides a simple upload(image_path, caption, dry_run=True) that writes a preview
-JSON file to `Config.OUTPUT_DIR/dry_runs/instagram` when dry_run is True.
+JSON file to `Config.OUTPUT_DIR/dry_runs/instagram/YYYY/MM/DD` when dry_run is True.
 """
 from .config import Config
+from .retention import dated_dir
 import os
 import json
 import time
@@ -18,8 +19,7 @@ def upload(image_path: str, caption: str, dry_run: bool = True) -> dict:
     post_id = str(uuid.uuid4())
 
     if dry_run:
-        out_dir = os.path.join(Config.OUTPUT_DIR, "dry_runs", "instagram")
-        os.makedirs(out_dir, exist_ok=True)
+        out_dir = dated_dir(os.path.join(Config.OUTPUT_DIR, "dry_runs", "instagram"))
         preview_path = os.path.join(out_dir, f"{post_id}.json")
         payload = {
             "id": post_id,
@@ -4,6 +4,8 @@ Provides a small helper for obtaining an access token (stub) and a `post_image`
 function that supports dry-run preview files.
 """
 from .config import Config
+from .retention import dated_dir
+from . import token_store
 import os
 import json
 import time
@@ -17,12 +19,29 @@ logger = logging.getLogger(__name__)
 _TOKEN_STORE = {}
 
 
-def obtain_access_token(client_id: str, client_secret: str) -> Optional[str]:
+def obtain_access_token(client_id: str, client_secret: str, account_id: Optional[str] = None) -> Optional[str]:
+    """Return a (stub) access token; with `account_id`, reuse/persist it in that account's token row."""
     if not client_id or not client_secret:
         return None
+    store = None
+    if account_id is not None:
+        try:
+            store = token_store.AccountTokenStore()
+            saved = store.load("instagram", account_id)
+            if saved.get('access_token') and saved.get('expires_at', 0) > time.time():
+                return saved['access_token']
+        except Exception:
+            logger.exception("Failed to read stored Instagram token for %s", account_id)
+            store = None
     token = f"fake-instagram-token-{uuid.uuid4()}"
-    _TOKEN_STORE['access_token'] = token
-    _TOKEN_STORE['expires_at'] = int(time.time()) + 3600
+    payload = {'access_token': token, 'expires_at': int(time.time()) + 3600}
+    if store is not None:
+        try:
+            store.save("instagram", account_id, payload)
+            return token
+        except Exception:
+            logger.exception("Failed to persist Instagram token for %s", account_id)
+    _TOKEN_STORE.update(payload)
     return token
 
 
@@ -31,8 +50,7 @@ def post_image(image_path: str, caption: str, access_token: Optional[str] = None
     post_id = str(uuid.uuid4())
 
     if dry_run:
-        out_dir = os.path.join(Config.OUTPUT_DIR, "dry_runs", "instagram_api")
-        os.makedirs(out_dir, exist_ok=True)
+        out_dir = dated_dir(os.path.join(Config.OUTPUT_DIR, "dry_runs", "instagram_api"))
         preview_path = os.path.join(out_dir, f"{post_id}.json")
         payload = {"id": post_id, "timestamp": ts, "caption": caption, "image_path": image_path, "status": "dry_run"}
         with open(preview_path, "w", encoding="utf-8") as f:
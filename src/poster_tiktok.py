@@ -1,10 +1,11 @@
 """Dry-run TikTok poster interface.
 
 Provides a simple upload(text, media_path, dry_run=True) function that writes a
-preview JSON file to `Config.OUTPUT_DIR/dry_runs/tiktok` when dry_run is True.
+preview JSON file to `Config.OUTPUT_DIR/dry_runs/tiktok/YYYY/MM/DD` when dry_run is True.
 Real upload is intentionally not implemented in this scaffold.
 """
 from .config import Config
+from .retention import dated_dir
 import os
 import json
 import time
@@ -23,8 +24,7 @@ def upload(text: str, media_path: str, dry_run: bool = True) -> dict:
     post_id = str(uuid.uuid4())
 
     if dry_run:
-        out_dir = os.path.join(Config.OUTPUT_DIR, "dry_runs", "tiktok")
-        os.makedirs(out_dir, exist_ok=True)
+        out_dir = dated_dir(os.path.join(Config.OUTPUT_DIR, "dry_runs", "tiktok"))
         preview_path = os.path.join(out_dir, f"{post_id}.json")
         payload = {
             "id": post_id,
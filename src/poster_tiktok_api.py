@@ -6,21 +6,40 @@ integration is left as a TODO since it requires app credentials and platform
 agreement.
 """
 from .config import Config
+from .retention import dated_dir
 import os
 import json
 import time
 import uuid
 import logging
 from typing import Optional
+import threading
 import requests
+from requests.adapters import HTTPAdapter
 from . import token_store
+from . import token_manager
+from . import upload_journal
+from . import upload_hashing
+from . import upload_sessions
+from . import publish_status
+from . import metrics
+from . import tracing
+from . import pkce
+from .upload_tuning import AdaptiveConcurrency, choose_part_size
 import hashlib
 import concurrent.futures
 import math
+import mmap
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+UPLOAD_PART_BYTES = metrics.counter("upload_part_bytes_total", "Bytes of acknowledged upload parts")
+UPLOAD_PART_SECONDS = metrics.histogram("upload_part_seconds", "Duration of a successful part upload")
+UPLOAD_PART_THROUGHPUT = metrics.histogram("upload_part_bytes_per_second", "Per-part upload throughput",
+                                           buckets=(64e3, 256e3, 1e6, 2.5e6, 5e6, 10e6, 25e6, 50e6, 100e6))
+UPLOAD_PART_RETRIES = metrics.counter("upload_part_retries_total", "Failed part upload attempts")
+
 
 # provider adapter helpers
 def _provider_field(resp: dict, *candidates, default=None):
@@ -35,6 +54,92 @@ def _provider_field(resp: dict, *candidates, default=None):
 _TOKEN_STORE = {}
 
 
+class TikTokTransport:
+    """Pooled HTTP transport for the TikTok token and upload endpoints.
+
+    All threads share one keep-alive connection pool (an `HTTPAdapter` sized
+    to the upload worker count). Each thread gets its own `requests.Session`
+    mounted on it, because Session objects are not thread-safe. Timeouts are
+    (connect, read) per operation and can be overridden with
+    `TIKTOK_TIMEOUT_<OP>=connect,read` (e.g. TIKTOK_TIMEOUT_PART=5,120).
+    """
+
+    DEFAULT_TIMEOUTS = {
+        "token": (5, 15),
+        "refresh": (5, 15),
+        "init": (5, 15),
+        "part": (5, 60),
+        "commit": (5, 15),
+    }
+
+    def __init__(self, pool_size: Optional[int] = None, timeouts: Optional[dict] = None, adapter: Optional[HTTPAdapter] = None):
+        if pool_size is None:
+            pool_size = max(int(os.getenv("TIKTOK_SCHEDULER_WORKERS", "16")), int(os.getenv("TIKTOK_UPLOAD_MAX_WORKERS", "8")))
+        self.adapter = adapter or HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.timeouts = self.timeouts_from_env()
+        self.timeouts.update(timeouts or {})
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._requests = {}
+
+    @classmethod
+    def timeouts_from_env(cls) -> dict:
+        timeouts = dict(cls.DEFAULT_TIMEOUTS)
+        for op in timeouts:
+            raw = os.getenv(f"TIKTOK_TIMEOUT_{op.upper()}")
+            if raw:
+                connect, _, read = raw.partition(",")
+                timeouts[op] = (float(connect), float(read or connect))
+        return timeouts
+
+    def session(self) -> requests.Session:
+        sess = getattr(self._local, "session", None)
+        if sess is None:
+            sess = requests.Session()
+            sess.mount("http://", self.adapter)
+            sess.mount("https://", self.adapter)
+            self._local.session = sess
+        return sess
+
+    def post(self, op: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeouts.get(op, (5, 60)))
+        with self._lock:
+            self._requests[op] = self._requests.get(op, 0) + 1
+        return self.session().post(url, **kwargs)
+
+    def stats(self) -> dict:
+        """Request counts per operation and connection reuse across the shared pool."""
+        opened = served = 0
+        pools = self.adapter.poolmanager.pools
+        for key in list(pools.keys()):
+            pool = pools.get(key)
+            if pool is not None:
+                opened += pool.num_connections
+                served += pool.num_requests
+        with self._lock:
+            by_op = dict(self._requests)
+        return {"requests": by_op, "connections_opened": opened, "connections_reused": max(0, served - opened)}
+
+
+_transport = None
+_transport_lock = threading.Lock()
+
+
+def get_transport() -> TikTokTransport:
+    global _transport
+    if _transport is None:
+        with _transport_lock:
+            if _transport is None:
+                _transport = TikTokTransport()
+    return _transport
+
+
+def set_transport(transport: Optional[TikTokTransport]):
+    """Inject a transport (tests, local stand-in servers); None restores the default on next use."""
+    global _transport
+    _transport = transport
+
+
 def get_authorize_url(client_key: str, redirect_uri: str, scope: str = "user.info.basic,video.upload", state: Optional[str] = None) -> str:
     """Return the TikTok authorization URL for redirecting users.
 
@@ -70,23 +175,14 @@ def exchange_code_for_token(client_key: str, client_secret: str, code: str, redi
     code_verifier = None
     try:
         outdir = os.getenv("OUTPUT_DIR") or "."
-        if state:
-            p = os.path.join(outdir, f"pkce_state_{state}.json")
-            if os.path.exists(p):
+        # without a state, fall back to the first saved verifier (legacy behavior)
+        for p in pkce.find_state_files(outdir, state):
+            try:
                 with open(p, 'r', encoding='utf-8') as fh:
-                    j = json.load(fh)
-                    code_verifier = j.get('code_verifier')
-        else:
-            # fallback: pick the first matching pkce_state file (legacy behavior)
-            import glob
-            for p in glob.glob(os.path.join(outdir, "pkce_state_*.json")):
-                try:
-                    with open(p, 'r', encoding='utf-8') as fh:
-                        j = json.load(fh)
-                        code_verifier = j.get('code_verifier')
-                        break
-                except Exception:
-                    continue
+                    code_verifier = json.load(fh).get('code_verifier')
+                    break
+            except Exception:
+                continue
     except Exception:
         code_verifier = None
 
@@ -100,7 +196,7 @@ def exchange_code_for_token(client_key: str, client_secret: str, code: str, redi
     if code_verifier:
         data["code_verifier"] = code_verifier
 
-    resp = requests.post(token_url, data=data, timeout=15)
+    resp = get_transport().post("token", token_url, data=data)
     resp.raise_for_status()
     j = resp.json()
     # persist tokens securely (if token_store available)
@@ -111,21 +207,26 @@ def exchange_code_for_token(client_key: str, client_secret: str, code: str, redi
     return j
 
 
-def obtain_access_token(client_key: str, client_secret: str) -> Optional[str]:
+def obtain_access_token(client_key: str, client_secret: str, account_id: Optional[str] = None) -> Optional[str]:
     """Obtain an access token for development/testing.
 
     If a real token endpoint is configured, callers should perform the full
     OAuth flow (redirect user -> exchange code). This helper returns a fake
     token for local/dev use and persists it via token_store when possible.
+    With `account_id`, the token comes from (and is saved to) that account's
+    row in the `AccountTokenStore`.
     """
     if not client_key or not client_secret:
         return None
 
-    # If we already have saved tokens, return the access_token
+    # If we already have saved tokens, return the access_token (cached after the
+    # first decrypt, refreshed shortly before it expires)
     try:
-        saved = token_store.load_tokens()
-        if saved.get('access_token'):
-            return saved['access_token']
+        token = token_manager.get_token_manager(client_key, client_secret, account_id=account_id).access_token()
+        if token:
+            return token
+    except token_manager.TokenExpiredError:
+        raise
     except Exception:
         pass
 
@@ -133,12 +234,16 @@ def obtain_access_token(client_key: str, client_secret: str) -> Optional[str]:
     token = f"dev-token-{uuid.uuid4()}"
     payload = {'access_token': token, 'expires_in': 3600}
     try:
-        token_store.save_tokens(payload)
+        if account_id is not None:
+            token_manager.get_token_manager(client_key, client_secret, account_id=account_id).db.save("tiktok", account_id, payload)
+        else:
+            token_store.save_tokens(payload)
     except Exception:
         _TOKEN_STORE.update(payload)
     return token
 
 
+@tracing.traced("tiktok.post_video")
 def post_video(title: str, video_path: str, access_token: Optional[str] = None, dry_run: bool = True) -> dict:
     """Upload a video using TikTok Content Posting API.
 
@@ -150,8 +255,7 @@ def post_video(title: str, video_path: str, access_token: Optional[str] = None,
     post_id = str(uuid.uuid4())
 
     if dry_run:
-        out_dir = os.path.join(Config.OUTPUT_DIR, "dry_runs", "tiktok_api")
-        os.makedirs(out_dir, exist_ok=True)
+        out_dir = dated_dir(os.path.join(Config.OUTPUT_DIR, "dry_runs", "tiktok_api"))
         preview_path = os.path.join(out_dir, f"{post_id}.json")
         payload = {"id": post_id, "timestamp": ts, "title": title, "video_path": video_path, "status": "dry_run"}
         with open(preview_path, "w", encoding="utf-8") as f:
@@ -174,9 +278,11 @@ def post_video(title: str, video_path: str, access_token: Optional[str] = None,
     return resp.json()
 
 
-def initiate_upload_session(access_token: str, file_size: int) -> dict:
+@tracing.traced("tiktok.init")
+def initiate_upload_session(access_token: str, file_size: int, part_size: Optional[int] = None) -> dict:
     """Initiate an upload session. Endpoint taken from env `TIKTOK_INIT_UPLOAD_URL`.
 
+    `part_size` is sent as a hint for providers that let the client choose.
     Returns session metadata (upload_id, part_size, upload_url_template)
     """
     url = os.getenv("TIKTOK_INIT_UPLOAD_URL")
@@ -184,33 +290,96 @@ def initiate_upload_session(access_token: str, file_size: int) -> dict:
         raise RuntimeError("TIKTOK_INIT_UPLOAD_URL not configured")
 
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.post(url, json={"file_size": file_size}, headers=headers, timeout=15)
+    body = {"file_size": file_size}
+    if part_size:
+        body["part_size"] = part_size
+    resp = get_transport().post("init", url, json=body, headers=headers)
     resp.raise_for_status()
     return resp.json()
 
 
-def upload_chunk(upload_url: str, chunk_data: bytes, part_number: int, headers: dict = None) -> dict:
-    """Upload a single chunk to the given URL. Returns server response JSON."""
-    headers = headers or {}
-    files = {"file": (f"part-{part_number}", chunk_data)}
-    resp = requests.post(upload_url, files=files, headers=headers, timeout=60)
+def split_parts(file_size: int, part_size: int) -> list:
+    """(part_number, offset, length) for every part of a file."""
+    total_parts = math.ceil(file_size / part_size) if part_size > 0 else 1
+    parts = []
+    for part_number in range(1, total_parts + 1):
+        offset = (part_number - 1) * part_size
+        parts.append((part_number, offset, min(part_size, file_size - offset)))
+    return parts
+
+
+def multipart_frame(boundary: str, field: str, filename: str, content_type: str = "application/octet-stream"):
+    """(head, tail) bytes that wrap a single file field in a multipart/form-data body."""
+    head = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="{field}"; filename="{filename}"\r\n'
+        f"Content-Type: {content_type}\r\n\r\n"
+    ).encode("utf-8")
+    return head, f"\r\n--{boundary}--\r\n".encode("utf-8")
+
+
+class _MultipartStream:
+    """Single-file multipart/form-data body that streams `data` without copying it.
+
+    `data` may be bytes or a memoryview (e.g. a slice of an mmap). requests
+    sends an iterable body with a known length chunk by chunk, so the part is
+    handed to the socket as-is instead of being copied into a form buffer.
+    """
+
+    def __init__(self, field: str, filename: str, data, content_type: str = "application/octet-stream"):
+        self.boundary = uuid.uuid4().hex
+        self._head, self._tail = multipart_frame(self.boundary, field, filename, content_type)
+        self._data = data
+        self._len = len(self._head) + memoryview(data).nbytes + len(self._tail)
+
+    @property
+    def content_type(self) -> str:
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self._len
+
+    def __iter__(self):
+        yield self._head
+        yield self._data
+        yield self._tail
+
+
+def upload_chunk(upload_url: str, chunk_data, part_number: int, headers: dict = None) -> dict:
+    """Upload a single chunk (bytes or memoryview) to the given URL. Returns server response JSON."""
+    body = _MultipartStream("file", f"part-{part_number}", chunk_data)
+    headers = dict(headers or {})
+    headers["Content-Type"] = body.content_type
+    resp = get_transport().post("part", upload_url, data=body, headers=headers)
     resp.raise_for_status()
     return resp.json()
 
 
+@tracing.traced("tiktok.commit")
 def commit_upload(access_token: str, upload_id: str) -> dict:
     """Commit the multipart upload session. Endpoint from `TIKTOK_COMMIT_UPLOAD_URL`."""
     url = os.getenv("TIKTOK_COMMIT_UPLOAD_URL")
     if not url:
         raise RuntimeError("TIKTOK_COMMIT_UPLOAD_URL not configured")
     headers = {"Authorization": f"Bearer {access_token}"}
-    resp = requests.post(url, json={"upload_id": upload_id}, headers=headers, timeout=15)
+    resp = get_transport().post("commit", url, json={"upload_id": upload_id}, headers=headers)
     resp.raise_for_status()
     j = resp.json()
-    # normalize provider-specific fields into a small metrics envelope
+    record_commit(upload_id, j)
+    return j
+
+
+def record_commit(upload_id: str, j: dict):
+    """Persist a commit response: metrics envelope plus the upload's publish status."""
+    write_commit_envelope(upload_id, j)
+    publish_status.record(upload_id, "committed", video_id=_provider_field(j, "video_id", "videoId", "id", default=None),
+                          message=_provider_field(j, "message", "msg", default=None))
+
+
+def write_commit_envelope(upload_id: str, j: dict):
+    """Normalize provider-specific commit fields into a small metrics envelope."""
     try:
-        outdir = os.path.join(Config.OUTPUT_DIR, "publish_metrics")
-        os.makedirs(outdir, exist_ok=True)
+        outdir = dated_dir(os.path.join(Config.OUTPUT_DIR, "publish_metrics"))
         envelope = {
             "upload_id": upload_id,
             "timestamp": int(time.time()),
@@ -225,166 +394,339 @@ def commit_upload(access_token: str, upload_id: str) -> dict:
             json.dump(envelope, fh, ensure_ascii=False, indent=2)
     except Exception:
         logger.exception("Failed to persist commit metrics")
-    return j
-
 
-def upload_video_chunked(title: str, video_path: str, access_token: str, dry_run: bool = True) -> dict:
-    """High-level orchestrator to upload a video using chunked upload.
 
-    Steps:
-      1. initiate_upload_session(file_size)
-      2. split file into parts (session.part_size)
-      3. upload_chunk for each part
-      4. commit_upload(upload_id)
+class ChunkedUpload:
+    """State and steps of one video's chunked upload: init -> parts -> commit.
 
-    This implementation is resilient and uses simple retries for each chunk.
+    `start()` maps the file, reuses a live session for the same content from
+    the `SessionIndex` (or initiates one), replays the journal and hashes parts;
+    `pending_parts` lists (part_number, offset, length) still to send;
+    `upload_part()` sends one part with retries and may run on any thread;
+    `finish()` commits and writes the publish summary (`complete()` alone does
+    the bookkeeping, for callers that commit themselves, e.g. `upload_async`); `close()` releases the
+    mmap and journal and is safe to call more than once. `upload_video_chunked`
+    drives one upload on its own pool; `UploadScheduler` interleaves many.
     """
-    if dry_run:
-        return post_video(title, video_path, access_token=access_token, dry_run=True)
-
-    # 1. Initiate
-    file_size = os.path.getsize(video_path)
-    session = initiate_upload_session(access_token, file_size)
-    upload_id = session.get("upload_id")
-    part_size = int(session.get("part_size", 5 * 1024 * 1024))
-    upload_url_template = session.get("upload_url_template")
-
-    # 2-3. Upload parts with MD5 checksums, resume support, server validation and parallel uploads
-    state_path = Path(Config.OUTPUT_DIR) / f"upload_state_{upload_id}.json"
-    state = {"uploaded_parts": {}}
-    if state_path.exists():
-        try:
-            with open(state_path, "r", encoding="utf-8") as sf:
-                state = json.load(sf)
-        except Exception:
-            state = {"uploaded_parts": {}}
-
-    def md5_hex(b: bytes) -> str:
-        m = hashlib.md5()
-        m.update(b)
-        return m.hexdigest()
 
-    # read and split file into parts first so we can upload in parallel
-    file_size = os.path.getsize(video_path)
-    total_parts = math.ceil(file_size / part_size) if part_size > 0 else 1
-
-    parts = []  # list of (part_number, offset, length)
-    for part_number in range(1, total_parts + 1):
-        offset = (part_number - 1) * part_size
-        length = min(part_size, file_size - offset)
-        parts.append((part_number, offset, length))
+    def __init__(self, title: str, video_path: str, access_token: str, controller: Optional[AdaptiveConcurrency] = None,
+                 account: Optional[str] = None, sessions: Optional[upload_sessions.SessionIndex] = None,
+                 item_id: Optional[str] = None):
+        self.title = title
+        self.item_id = item_id
+        self.video_path = video_path
+        self.access_token = access_token
+        self.controller = controller or AdaptiveConcurrency.from_env()
+        self.upload_id = None
+        self.part_size = None
+        self.upload_url_template = None
+        self.parts = []
+        self.state = {"uploaded_parts": {}}
+        self.account = account or upload_sessions.default_account()
+        self.sessions = sessions or upload_sessions.SessionIndex()
+        self.reused = False
+        self.fingerprint = None
+        self.md5s = {}
+        self.file_digest = None
+        self._hashed = {}
+        self._mm = None
+        self._view = None
+        self._journal = None
+
+    @property
+    def pending_parts(self) -> list:
+        done = self.state.get("uploaded_parts", {})
+        return [p for p in self.parts if str(p[0]) not in done]
+
+    @tracing.traced("tiktok.start")
+    def start(self):
+        file_size = self.open()
+        # 1. Reuse a live session for the same content, else initiate
+        #    (suggesting a part size when the provider lets us choose)
+        session = self.find_session(file_size)
+        if session is None:
+            hint = self.part_size_hint(file_size)
+            if hint:
+                session = initiate_upload_session(self.access_token, file_size, part_size=hint)
+            else:
+                session = initiate_upload_session(self.access_token, file_size)
+        return self.begin(session)
+
+    def part_size_hint(self, file_size: int) -> Optional[int]:
+        if os.getenv("TIKTOK_CHOOSE_PART_SIZE", "false").lower() in ("1", "true", "yes"):
+            return choose_part_size(file_size, self.controller.limit)
+        return None
 
-    max_workers = int(os.getenv("TIKTOK_UPLOAD_WORKERS", "4"))
+    def open(self) -> int:
+        """Stat and map the video; returns its size."""
+        file_size = os.path.getsize(self.video_path)
+        self.fingerprint = upload_hashing.fingerprint(self.video_path)
+
+        # map the file once; every part is a zero-copy memoryview slice of it, so
+        # resident memory stays near part_size x workers even for multi-GB videos
+        with open(self.video_path, "rb") as fh:
+            self._mm = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ) if file_size > 0 else None
+        self._view = memoryview(self._mm) if self._mm is not None else memoryview(b"")
+        return file_size
+
+    def begin(self, session: dict):
+        """Adopt an (initiated or reused) session: replay its journal, split and hash parts."""
+        file_size = self._view.nbytes
+        self.upload_id = upload_id = session.get("upload_id")
+        self.part_size = part_size = int(session.get("part_size", 5 * 1024 * 1024))
+        self.upload_url_template = session.get("upload_url_template")
+
+        # 2. Resume support: progress goes to an append-only journal; state is rebuilt by replaying it
+        self.journal_path = upload_journal.journal_path(upload_id)
+        self.state = upload_journal.replay(self.journal_path)
+        legacy_state_path = Path(Config.OUTPUT_DIR) / f"upload_state_{upload_id}.json"
+        if not self.state["uploaded_parts"] and legacy_state_path.exists():
+            try:
+                with open(legacy_state_path, "r", encoding="utf-8") as sf:
+                    self.state["uploaded_parts"] = json.load(sf).get("uploaded_parts", {})
+            except Exception:
+                pass
+
+        # split file into parts first so they can be uploaded in parallel
+        self.parts = split_parts(file_size, part_size)  # list of (part_number, offset, length)
+        self._journal = upload_journal.UploadJournal(self.journal_path)
+        publish_status.record(upload_id, "uploading", item_id=self.item_id, account=self.account)
+        self._prepare_digests()
+        if not self.reused:
+            self.sessions.record(self.account, file_size, self.file_digest, dict(session, part_size=part_size),
+                                 fingerprint=self.fingerprint)
+        return self
+
+    def find_session(self, file_size: int) -> Optional[dict]:
+        """Return a live indexed session whose content digest matches this file, if any.
+
+        A candidate recorded with the current stat fingerprint is taken as-is;
+        otherwise the file is hashed with the candidate's part size (the
+        digests are kept, so `begin` does not read the file again).
+        """
+        for entry in self.sessions.candidates(self.account, file_size):
+            part_size = int(entry["part_size"])
+            if entry.get("fingerprint") != self.fingerprint:
+                if part_size not in self._hashed:
+                    self._hashed[part_size] = upload_hashing.hash_parts(self._view, split_parts(file_size, part_size))
+                if upload_hashing.file_digest(part_size, self._hashed[part_size]) != entry.get("file_digest"):
+                    continue
+            logger.info("Resuming upload session %s for %s", entry["upload_id"], self.video_path)
+            self.reused = True
+            return entry
+        return None
 
-    def upload_part(part_info):
+    @tracing.traced("tiktok.hash")
+    def _prepare_digests(self):
+        """Hash every part once up front and check resume state against the file.
+
+        If the journal's manifest fingerprint (size, mtime) still matches, its
+        digests are trusted and nothing is re-read. Otherwise all parts are
+        hashed (in parallel) and, if the file digest changed, acknowledged
+        parts whose MD5 no longer matches are dropped so they are sent again.
+        """
+        recorded = self.state.get("manifest")
+        if (recorded and recorded.get("part_size") == self.part_size
+                and recorded.get("fingerprint") == upload_hashing.fingerprint(self.video_path)):
+            self.md5s = dict(recorded.get("md5s") or {})
+            if len(self.md5s) == len(self.parts):
+                self.file_digest = recorded.get("file_digest")
+                return
+        self.md5s = self._hashed.get(self.part_size) or upload_hashing.hash_parts(self._view, self.parts)
+        manifest = upload_hashing.manifest(self.video_path, self.part_size, self.md5s)
+        self.file_digest = manifest["file_digest"]
+        if recorded and recorded.get("file_digest") != self.file_digest:
+            # journals written before manifests existed have nothing to check acks against
+            logger.warning("%s changed since upload %s started; re-sending changed parts", self.video_path, self.upload_id)
+            uploaded = self.state.get("uploaded_parts", {})
+            for part in [p for p, info in uploaded.items() if (info or {}).get("md5") != self.md5s.get(p)]:
+                del uploaded[part]
+        self._journal.append(dict({"ev": "manifest"}, **manifest))
+
+    @tracing.traced("tiktok.part")
+    def upload_part(self, part_info) -> dict:
+        """3. Upload one part with MD5 checksum, server validation and retries."""
         part_number, offset, length = part_info
         # skip if already uploaded
-        if str(part_number) in state.get("uploaded_parts", {}):
+        if str(part_number) in self.state.get("uploaded_parts", {}):
             return {"status": "skipped", "part": part_number}
 
-        # derive upload URL per-part if template provided
-        if upload_url_template:
-            upload_url = upload_url_template.replace("{part_number}", str(part_number)).replace("{upload_id}", upload_id)
-        else:
-            upload_url = os.getenv("TIKTOK_PART_UPLOAD_URL")
+        with self._view[offset:offset + length] as chunk:
+            return self._send_part(part_number, self.part_url(part_number), chunk)
 
-        # read chunk
-        with open(video_path, "rb") as fh:
-            fh.seek(offset)
-            chunk = fh.read(length)
+    def part_url(self, part_number: int) -> str:
+        # derive upload URL per-part if template provided
+        if self.upload_url_template:
+            return self.upload_url_template.replace("{part_number}", str(part_number)).replace("{upload_id}", self.upload_id)
+        return os.getenv("TIKTOK_PART_UPLOAD_URL")
 
-        checksum = md5_hex(chunk)
-        headers = {"Authorization": f"Bearer {access_token}", "X-Chunk-MD5": checksum}
+    def _send_part(self, part_number, upload_url, chunk):
+        # digests come from the hashing stage in start(); hash in place only as a fallback
+        checksum = self.md5s.get(str(part_number)) or hashlib.md5(chunk).hexdigest()
+        headers = {"Authorization": f"Bearer {self.access_token}", "X-Chunk-MD5": checksum}
 
         # retry per-part with exponential backoff and basic metrics
         max_retries = int(os.getenv("TIKTOK_PART_MAX_RETRIES", "4"))
-        backoff_base = float(os.getenv("TIKTOK_PART_BACKOFF_BASE", "0.5"))
         last_exc = None
         attempt = 0
-        start_time = time.time()
         while attempt < max_retries:
             attempt += 1
+            t0 = time.time()
             try:
-                t0 = time.time()
                 resp = upload_chunk(upload_url, chunk, part_number, headers=headers)
-                t1 = time.time()
-                duration = t1 - t0
-
-                # validation: check server ack md5 matches local checksum
-                server_md5 = None
-                if isinstance(resp, dict):
-                    server_md5 = resp.get("md5") or resp.get("server_md5") or resp.get("checksum")
-                if server_md5 and server_md5 != checksum:
-                    raise RuntimeError(f"MD5 mismatch for part {part_number}: server={server_md5} local={checksum}")
-
-                # mark uploaded with server response and checksum
-                state.setdefault("uploaded_parts", {})[str(part_number)] = {"md5": checksum, "resp": resp}
-                # persist state
-                state_path.parent.mkdir(parents=True, exist_ok=True)
-                with open(state_path, "w", encoding="utf-8") as sf:
-                    json.dump(state, sf)
-
-                # record metrics
-                metrics_path = state_path.parent / f"upload_metrics_{upload_id}.json"
-                metrics = {}
-                if metrics_path.exists():
-                    try:
-                        with open(metrics_path, "r", encoding="utf-8") as mf:
-                            metrics = json.load(mf)
-                    except Exception:
-                        metrics = {}
-                metrics.setdefault(str(part_number), []).append({"attempt": attempt, "duration": duration, "timestamp": int(t1)})
-                with open(metrics_path, "w", encoding="utf-8") as mf:
-                    json.dump(metrics, mf)
-
-                return {"status": "ok", "part": part_number}
+                return self.record_ack(part_number, checksum, resp, attempt, t0, len(chunk))
             except Exception as e:
                 last_exc = e
-                wait = backoff_base * (2 ** (attempt - 1))
-                logger.warning("Part %s attempt %s failed: %s — backing off %.2fs", part_number, attempt, str(e), wait)
-                time.sleep(wait)
+                time.sleep(self.record_retry(part_number, attempt, t0, e))
         # if we exhausted retries, raise last exception
         raise last_exc
 
-    # run uploads in parallel
-    results = []
-    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as exe:
-        futures = {exe.submit(upload_part, p): p[0] for p in parts}
-        for fut in concurrent.futures.as_completed(futures):
-            part_no = futures[fut]
+    def record_ack(self, part_number: int, checksum: str, resp, attempt: int, t0: float, nbytes: int) -> dict:
+        """Validate a part response and record it as uploaded (raises on MD5 mismatch)."""
+        t1 = time.time()
+        # validation: check server ack md5 matches local checksum
+        server_md5 = None
+        if isinstance(resp, dict):
+            server_md5 = resp.get("md5") or resp.get("server_md5") or resp.get("checksum")
+        if server_md5 and server_md5 != checksum:
+            raise RuntimeError(f"MD5 mismatch for part {part_number}: server={server_md5} local={checksum}")
+
+        # mark uploaded with server response and checksum; the journal is the durable record
+        self.state["uploaded_parts"][str(part_number)] = {"md5": checksum, "resp": resp}
+        self._journal.append({"ev": "part", "part": part_number, "md5": checksum, "resp": resp, "attempt": attempt, "duration": t1 - t0, "ts": t1})
+        self.controller.record_success(nbytes)
+        UPLOAD_PART_BYTES.inc(nbytes)
+        UPLOAD_PART_SECONDS.observe(t1 - t0)
+        if t1 > t0:
+            UPLOAD_PART_THROUGHPUT.observe(nbytes / (t1 - t0))
+        return {"status": "ok", "part": part_number}
+
+    def record_retry(self, part_number: int, attempt: int, t0: float, error: Exception) -> float:
+        """Record a failed attempt; returns the backoff to wait before the next one."""
+        self._journal.append({"ev": "retry", "part": part_number, "attempt": attempt, "duration": time.time() - t0, "error": str(error)})
+        self.controller.record_failure()
+        UPLOAD_PART_RETRIES.inc()
+        wait = float(os.getenv("TIKTOK_PART_BACKOFF_BASE", "0.5")) * (2 ** (attempt - 1))
+        logger.warning("Part %s attempt %s failed: %s — backing off %.2fs", part_number, attempt, str(error), wait)
+        return wait
+
+    def finish(self) -> dict:
+        """4. Commit, then compact the journal and persist a small publish summary."""
+        self._release_file()
+        result = commit_upload(self.access_token, self.upload_id)
+        self.complete()
+        return result
+
+    def complete(self):
+        """Bookkeeping after a successful commit: index, journal, publish summary."""
+        self.sessions.forget(self.upload_id)
+        self._journal.append({"ev": "commit", "upload_id": self.upload_id, "parts": len(self.parts), "file_digest": self.file_digest})
+        self._journal.close()
+        self._journal = None
+        try:
+            upload_journal.compact(self.journal_path)
+        except Exception:
+            logger.exception("Failed to compact upload journal %s", self.journal_path)
+        try:
+            outdir = Path(dated_dir(os.path.join(Config.OUTPUT_DIR, "publish_metrics")))
+            summary = {
+                "upload_id": self.upload_id,
+                "parts_uploaded": len(self.state.get("uploaded_parts", {})),
+                "part_size": self.part_size,
+                "file_digest": self.file_digest,
+                "timestamp": int(time.time()),
+                "throughput": self.controller.stats(),
+            }
+            with open(outdir / f"summary_{self.upload_id}_{int(time.time())}.json", "w", encoding="utf-8") as sf:
+                json.dump(summary, sf, ensure_ascii=False, indent=2)
+        except Exception:
+            logger.exception("Failed to write upload summary")
+
+    def mark_failed(self, error: Exception):
+        publish_status.record(self.upload_id, publish_status.FAILED, item_id=self.item_id, message=str(error)[:500])
+
+    def _release_file(self):
+        if self._view is not None:
+            self._view.release()
+            self._view = None
+        if self._mm is not None:
             try:
-                r = fut.result()
-                results.append(r)
-            except Exception as e:
-                logger.exception("Failed to upload part %s", part_no)
-                raise
-    # 4. Commit
-    result = commit_upload(access_token, upload_id)
-    # after commit, persist a small summary mapping parts -> counts
-    try:
-        outdir = Path(Config.OUTPUT_DIR) / "publish_metrics"
-        outdir.mkdir(parents=True, exist_ok=True)
-        summary = {"upload_id": upload_id, "parts_uploaded": len(state.get("uploaded_parts", {})), "timestamp": int(time.time())}
-        with open(outdir / f"summary_{upload_id}_{int(time.time())}.json", "w", encoding="utf-8") as sf:
-            json.dump(summary, sf, ensure_ascii=False, indent=2)
-    except Exception:
-        logger.exception("Failed to write upload summary")
-    return result
+                self._mm.close()
+            except BufferError:
+                # a slice is still referenced (e.g. by a traceback); let GC unmap it
+                logger.debug("mmap for %s still exported; deferring close", self.video_path)
+            self._mm = None
+
+    def close(self):
+        if self._journal is not None:
+            self._journal.close()
+            self._journal = None
+        self._release_file()
+
+
+@tracing.traced("tiktok.upload")
+def upload_video_chunked(title: str, video_path: str, access_token: str, dry_run: bool = True,
+                         item_id: Optional[str] = None) -> dict:
+    """High-level orchestrator to upload a video using chunked upload.
 
+    Steps:
+      1. initiate_upload_session(file_size)
+      2. split file into parts (session.part_size)
+      3. upload_chunk for each part
+      4. commit_upload(upload_id)
+
+    This implementation is resilient and uses simple retries for each chunk.
+    The number of parts in flight is adjusted by an AIMD controller.
+    """
+    if dry_run:
+        return post_video(title, video_path, access_token=access_token, dry_run=True)
 
-def refresh_access_token(client_key: str, client_secret: str, refresh_token: str) -> dict:
+    upload = ChunkedUpload(title, video_path, access_token, item_id=item_id)
+    controller = upload.controller
+    try:
+        # inside the try: a failed init/begin must still unmap the file and stop the journal writer
+        upload.start()
+        # run uploads in parallel; the controller decides how many parts are in flight
+        pending = list(reversed(upload.pending_parts))
+        inflight = {}
+        with concurrent.futures.ThreadPoolExecutor(max_workers=controller.max_limit) as exe:
+            while pending or inflight:
+                while pending and len(inflight) < controller.limit:
+                    p = pending.pop()
+                    inflight[exe.submit(tracing.wrap(upload.upload_part), p)] = p[0]
+                done, _ = concurrent.futures.wait(inflight, return_when=concurrent.futures.FIRST_COMPLETED)
+                for fut in done:
+                    part_no = inflight.pop(fut)
+                    try:
+                        fut.result()
+                    except Exception:
+                        logger.exception("Failed to upload part %s", part_no)
+                        pending.clear()
+                        raise
+        return upload.finish()
+    except Exception as e:
+        upload.mark_failed(e)
+        raise
+    finally:
+        upload.close()
+
+
+def refresh_access_token(client_key: str, client_secret: str, refresh_token: str, save: bool = True) -> dict:
     """Refresh access token using a refresh token. Endpoint taken from env `TIKTOK_REFRESH_URL`.
 
-    Stores new tokens via token_store when available.
+    Stores new tokens via token_store when available (unless `save` is False,
+    e.g. when the caller persists them per account).
     """
     refresh_url = os.getenv("TIKTOK_REFRESH_URL")
     if not refresh_url:
         raise RuntimeError("TIKTOK_REFRESH_URL not configured in env.")
 
     data = {"client_key": client_key, "client_secret": client_secret, "grant_type": "refresh_token", "refresh_token": refresh_token}
-    resp = requests.post(refresh_url, data=data, timeout=15)
+    resp = get_transport().post("refresh", refresh_url, data=data)
     resp.raise_for_status()
     j = resp.json()
+    if not save:
+        return j
     try:
         token_store.save_tokens(j)
     except Exception:
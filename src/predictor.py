@@ -9,10 +9,17 @@ from PIL import Image, ImageStat
 import os
 import time
 from .openai_client import OpenAIClient
+from .phash import dedupe_paths
+from . import metrics
+from . import tracing
 import logging
 
 logger = logging.getLogger(__name__)
 
+SCORE_SECONDS = metrics.histogram("score_variant_seconds", "Time to score one caption/thumbnail pair",
+                                  buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1))
+CAPTION_VARIANTS = metrics.counter("caption_variants_total", "Caption variants generated by source", ["source"])
+
 
 # default CTA words and templates (can be overridden via env)
 CTA_WORDS = [w.strip() for w in os.getenv("PREDICTOR_CTA_WORDS", "ดูเลย,รีบซื้อ,กดสั่ง,สั่งเลย,อย่าพลาด,ดูตอนนี้,คลิก").split(",") if w.strip()]
@@ -35,6 +42,7 @@ def load_trending_hashtags() -> List[str]:
     return [t.strip() for t in raw.split(",") if t.strip()]
 
 
+@tracing.traced("predictor.contrast")
 def _contrast_score(image_path: str) -> float:
     try:
         im = Image.open(image_path).convert("L")
@@ -49,6 +57,8 @@ def _has_price(text: str) -> bool:
     return bool(re.search(r"\d{2,}", str(text)))
 
 
+@tracing.traced("predictor.score")
+@SCORE_SECONDS.time()
 def score_variant(caption: str, thumbnail_path: str) -> Tuple[float, dict]:
     """Return (score, details) for a caption+thumbnail pair.
 
@@ -100,6 +110,7 @@ def score_variant(caption: str, thumbnail_path: str) -> Tuple[float, dict]:
     return score, details
 
 
+@tracing.traced("predictor.captions")
 def generate_caption_variants(name: str, price, affiliate_link: str = "", n: int = 3):
     """Generate caption variants using OpenAI if available; fallback to heuristics.
 
@@ -143,6 +154,7 @@ def generate_caption_variants(name: str, price, affiliate_link: str = "", n: int
             except Exception:
                 continue
 
+    CAPTION_VARIANTS.labels("openai").inc(len(variants))
     # fallback heuristic variants
     if not variants:
         base = f"{name} ราคาพิเศษ {price} บาท"
@@ -151,6 +163,7 @@ def generate_caption_variants(name: str, price, affiliate_link: str = "", n: int
             cta = CTA_TEMPLATES[i % len(CTA_TEMPLATES)].format(base)
             # ensure at least one hashtag and one CTA
             variants.append(f"{cta} {tag}")
+        CAPTION_VARIANTS.labels("fallback").inc(n)
 
     # deduplicate and trim
     seen = set()
@@ -166,6 +179,7 @@ def generate_caption_variants(name: str, price, affiliate_link: str = "", n: int
 def pick_best_variant(name: str, price, affiliate_link: str, thumbnail_paths: list, n_captions: int = 4):
     """Generate caption variants and score combinations with thumbnails; return best caption, thumbnail, and score/details."""
     captions = generate_caption_variants(name, price, affiliate_link, n=n_captions)
+    thumbnail_paths = dedupe_paths(thumbnail_paths)
     best = None
     best_score = -1
     best_details = None
@@ -0,0 +1,213 @@
+"""Stage-scoped profiling for runner runs, driven by trace spans.
+
+A `StageProfiler` hooks into `tracing`: when a thread enters a span whose
+name starts with the stage filter (e.g. "media", "predictor.score",
+"tiktok.hash"; empty = every top-level span), profiling is switched on for
+that thread until the span ends. Nested spans belong to the outermost
+matching one, so each stage's numbers are inclusive. Network stages stay
+unprofiled unless the filter selects them.
+
+Modes:
+  cpu    cProfile per (stage, thread); `cpu-<stage>.prof` (pstats) per stage
+  alloc  tracemalloc snapshots around each stage span; allocation growth by line
+  wall   a sampler thread walks the stacks of threads inside a stage every
+         `PROFILE_WALL_INTERVAL` seconds (default 0.005), waits included;
+         `wall-<stage>.folded` is flamegraph.pl / speedscope input
+
+Items are sampled by trace id (`sample` = fraction of items, decided
+consistently for an item's generator and runner passes). Artifacts and a
+top-N `report.txt` go to OUTPUT_DIR/profiles/<run id>-<mode>/.
+
+    python -m src.runner --dry-run --profile cpu --profile-stage media --profile-sample 0.1
+"""
+import io
+import os
+import re
+import sys
+import zlib
+import pstats
+import cProfile
+import logging
+import threading
+import tracemalloc
+from collections import Counter, defaultdict
+from typing import Optional
+
+from .config import Config
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+MODES = ("cpu", "alloc", "wall")
+
+
+def _filename(stage: str) -> str:
+    return re.sub(r"[^A-Za-z0-9_.-]", "_", stage)
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class StageProfiler:
+    def __init__(self, mode: str, stage: str = "", sample: float = 1.0, top: int = 25,
+                 out_dir: Optional[str] = None, interval: Optional[float] = None):
+        if mode not in MODES:
+            raise ValueError(f"unknown profile mode {mode!r} (expected one of {', '.join(MODES)})")
+        self.mode = mode
+        self.stage = stage or ""
+        self.sample = sample
+        self.top = top
+        self.out_dir = out_dir or os.path.join(Config.OUTPUT_DIR, "profiles", f"{tracing.RUN_ID}-{mode}")
+        self.interval = interval or float(os.getenv("PROFILE_WALL_INTERVAL", "0.005"))
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self.spans = Counter()  # stage -> profiled span count
+        self._cpu = defaultdict(list)  # stage -> [cProfile.Profile]
+        self._alloc = defaultdict(lambda: [0, 0])  # (stage, line) -> [size diff, count diff]
+        self._wall = defaultdict(Counter)  # stage -> folded stack -> samples
+        self._wall_active = {}  # thread ident -> stage
+        self._sampler = None
+        self._stopped = threading.Event()
+
+    def sampled(self, trace_id: str) -> bool:
+        if self.sample >= 1:
+            return True
+        return zlib.crc32(trace_id.encode("utf-8")) % 10000 < self.sample * 10000
+
+    # -- tracing hooks (called on the span's own thread) --
+
+    def span_started(self, span):
+        if getattr(self._local, "active", None) is not None:
+            return
+        if not span.name.startswith(self.stage) or not self.sampled(span.trace):
+            return
+        stage = span.name
+        if self.mode == "cpu":
+            profiles = getattr(self._local, "profiles", None)
+            if profiles is None:
+                profiles = self._local.profiles = {}
+            prof = profiles.get(stage)
+            if prof is None:
+                prof = profiles[stage] = cProfile.Profile()
+                with self._lock:
+                    self._cpu[stage].append(prof)
+            try:
+                prof.enable()
+            except ValueError:
+                return  # another profiler already owns this thread
+            self._local.state = prof
+        elif self.mode == "alloc":
+            self._local.state = tracemalloc.take_snapshot()
+        else:
+            self._wall_active[threading.get_ident()] = stage
+        self._local.active = span.span
+        with self._lock:
+            self.spans[stage] += 1
+
+    def span_ended(self, span):
+        if getattr(self._local, "active", None) != span.span:
+            return
+        self._local.active = None
+        state, self._local.state = getattr(self._local, "state", None), None
+        if self.mode == "cpu":
+            state.disable()
+        elif self.mode == "alloc":
+            diff = tracemalloc.take_snapshot().compare_to(state, "lineno")
+            with self._lock:
+                for stat in diff:
+                    if stat.size_diff or stat.count_diff:
+                        acc = self._alloc[(span.name, str(stat.traceback[0]))]
+                        acc[0] += stat.size_diff
+                        acc[1] += stat.count_diff
+        else:
+            self._wall_active.pop(threading.get_ident(), None)
+
+    # -- lifecycle --
+
+    def start(self) -> "StageProfiler":
+        if self.mode == "alloc" and not tracemalloc.is_tracing():
+            tracemalloc.start(int(os.getenv("PROFILE_ALLOC_FRAMES", "1")))
+        if self.mode == "wall":
+            self._sampler = threading.Thread(target=self._sample_loop, name="wall-profiler", daemon=True)
+            self._sampler.start()
+        tracing.add_hook(self)
+        return self
+
+    def _sample_loop(self):
+        while not self._stopped.wait(self.interval):
+            frames = sys._current_frames()
+            for ident, stage in list(self._wall_active.items()):
+                frame = frames.get(ident)
+                stack = []
+                while frame is not None:
+                    stack.append(_frame_label(frame))
+                    frame = frame.f_back
+                if stack:
+                    stack.reverse()
+                    with self._lock:
+                        self._wall[stage][";".join(stack)] += 1
+
+    def stop(self) -> str:
+        """Detach, write the artifacts and the report; returns the report path."""
+        tracing.remove_hook(self)
+        self._stopped.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        os.makedirs(self.out_dir, exist_ok=True)
+        sections = getattr(self, f"_report_{self.mode}")()
+        head = (f"profile mode={self.mode} stage={self.stage or '*'} sample={self.sample} "
+                f"spans={dict(self.spans)}\n")
+        report = os.path.join(self.out_dir, "report.txt")
+        with open(report, "w", encoding="utf-8") as fh:
+            fh.write(head + "".join(sections))
+        if self.mode == "alloc":
+            tracemalloc.stop()
+        return report
+
+    def _report_cpu(self):
+        sections = []
+        for stage, profiles in sorted(self._cpu.items()):
+            profiles = [p for p in profiles if p.getstats()]
+            if not profiles:
+                continue
+            stats = pstats.Stats(*profiles)
+            stats.dump_stats(os.path.join(self.out_dir, f"cpu-{_filename(stage)}.prof"))
+            buf = io.StringIO()
+            pstats.Stats(*profiles, stream=buf).strip_dirs().sort_stats("cumulative").print_stats(self.top)
+            sections.append(f"\n== {stage} ({self.spans[stage]} spans) ==\n{buf.getvalue()}")
+        return sections
+
+    def _report_alloc(self):
+        by_stage = defaultdict(list)
+        for (stage, line), (size, count) in self._alloc.items():
+            by_stage[stage].append((size, count, line))
+        sections = []
+        for stage, rows in sorted(by_stage.items()):
+            rows.sort(reverse=True)
+            lines = [f"{size / 1024:12.1f} KiB {count:>9} blocks  {line}" for size, count, line in rows[: self.top]]
+            text = f"\n== {stage} ({self.spans[stage]} spans) net allocation growth ==\n" + "\n".join(lines) + "\n"
+            with open(os.path.join(self.out_dir, f"alloc-{_filename(stage)}.txt"), "w", encoding="utf-8") as fh:
+                fh.write(text)
+            sections.append(text)
+        return sections
+
+    def _report_wall(self):
+        sections = []
+        for stage, stacks in sorted(self._wall.items()):
+            with open(os.path.join(self.out_dir, f"wall-{_filename(stage)}.folded"), "w", encoding="utf-8") as fh:
+                for stack, n in stacks.most_common():
+                    fh.write(f"{stack} {n}\n")
+            total = sum(stacks.values())
+            own, inclusive = Counter(), Counter()
+            for stack, n in stacks.items():
+                frames = stack.split(";")
+                own[frames[-1]] += n
+                for f in set(frames):
+                    inclusive[f] += n
+            lines = [f"{n:>8} {100.0 * n / total:6.1f}% self   {f}" for f, n in own.most_common(self.top)]
+            lines += [f"{n:>8} {100.0 * n / total:6.1f}% total  {f}" for f, n in inclusive.most_common(self.top)]
+            sections.append(f"\n== {stage} ({self.spans[stage]} spans, {total} samples @ {self.interval}s) ==\n"
+                            + "\n".join(lines) + "\n")
+        return sections
@@ -0,0 +1,214 @@
+"""Publish status per upload, in the `publish_status` table of the publish DB.
+
+One row per upload_id, also indexed by item_id and video_id, so "what
+happened to item X" is an index lookup instead of a glob over
+publish_metrics/ and webhooks/. Writers:
+
+  - `ChunkedUpload` (uploading / failed, with item_id and account),
+  - `commit_upload` (committed, with video_id),
+  - the webhook writer (published / failed / provider event name).
+
+Later writes only overwrite the fields they know (COALESCE), so a webhook
+carrying just a video_id still lands on the row that has the item_id.
+
+The status never moves backwards: every write has a stage (upload <
+committed < provider outcome) and a write from an earlier stage than the
+row's is ignored, so a runner "committed" that lands after the webhook's
+"published"/"failed" does not undo it. Within a stage the latest write wins
+("failed" then a resumed "uploading" is fine).
+
+CLI:
+  python -m src.publish_status failures [--limit 20] [--hours 24]
+  python -m src.publish_status item <item_id>
+  python -m src.publish_status upload <upload_id>
+"""
+import os
+import sys
+import json
+import time
+import logging
+import argparse
+import sqlite3
+import threading
+from typing import List, Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+FAILED = "failed"
+
+# status precedence: uploader writes, the commit response, then webhooks from the provider
+STAGE_UPLOAD, STAGE_COMMITTED, STAGE_PROVIDER = 0, 1, 2
+_STAGES = {"uploading": STAGE_UPLOAD, FAILED: STAGE_UPLOAD, "committed": STAGE_COMMITTED}
+
+_COLUMNS = ("upload_id", "item_id", "video_id", "account", "status", "message", "created_at", "updated_at")
+
+
+def publish_db_path() -> str:
+    return os.getenv("PUBLISH_DB_PATH") or os.path.join(Config.OUTPUT_DIR, "publish.db")
+
+
+def init_db(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS publish_status (
+        upload_id TEXT PRIMARY KEY,
+        item_id TEXT,
+        video_id TEXT,
+        account TEXT,
+        status TEXT NOT NULL,
+        message TEXT,
+        created_at REAL NOT NULL,
+        updated_at REAL NOT NULL,
+        stage INTEGER NOT NULL DEFAULT 0
+    )
+    """)
+    if "stage" not in {r[1] for r in conn.execute("PRAGMA table_info(publish_status)")}:
+        # tables from before status precedence: derive the stage from the stored status
+        conn.execute("ALTER TABLE publish_status ADD COLUMN stage INTEGER NOT NULL DEFAULT 0")
+        conn.execute("UPDATE publish_status SET stage = CASE status WHEN 'uploading' THEN 0 WHEN 'failed' THEN 0 "
+                     "WHEN 'committed' THEN 1 ELSE 2 END")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_publish_status_item ON publish_status (item_id, updated_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_publish_status_video ON publish_status (video_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_publish_status_status ON publish_status (status, updated_at)")
+    conn.commit()
+
+
+def stage_of(status: str) -> int:
+    """Default stage of a status; webhook writes pass STAGE_PROVIDER explicitly (their "failed" is final)."""
+    return _STAGES.get(status, STAGE_PROVIDER)
+
+
+def upsert(conn: sqlite3.Connection, upload_id: str, status: str, item_id=None, video_id=None, account=None,
+           message=None, now: Optional[float] = None, stage: Optional[int] = None):
+    """Insert or update one row on an open connection (caller commits).
+
+    Ids are always merged in; status and message only change if `stage` is
+    not earlier than the row's.
+    """
+    now = time.time() if now is None else now
+    stage = stage_of(status) if stage is None else stage
+    conn.execute(
+        "INSERT INTO publish_status (upload_id, item_id, video_id, account, status, message, created_at, updated_at, stage) "
+        "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) ON CONFLICT (upload_id) DO UPDATE SET "
+        "item_id = COALESCE(excluded.item_id, item_id), video_id = COALESCE(excluded.video_id, video_id), "
+        "account = COALESCE(excluded.account, account), "
+        "status = CASE WHEN excluded.stage >= stage THEN excluded.status ELSE status END, "
+        "message = CASE WHEN excluded.stage >= stage THEN COALESCE(excluded.message, message) ELSE message END, "
+        "updated_at = excluded.updated_at, stage = MAX(stage, excluded.stage)",
+        (str(upload_id), _s(item_id), _s(video_id), _s(account), status, _s(message), now, now, stage),
+    )
+
+
+def update_by_video(conn: sqlite3.Connection, video_id: str, status: str, message=None, now: Optional[float] = None,
+                    stage: int = STAGE_PROVIDER) -> int:
+    cur = conn.execute(
+        "UPDATE publish_status SET status = ?, message = COALESCE(?, message), updated_at = ?, stage = ? "
+        "WHERE video_id = ? AND stage <= ?",
+        (status, _s(message), time.time() if now is None else now, stage, str(video_id), stage),
+    )
+    return cur.rowcount
+
+
+def status_from_event(event: Optional[str]) -> str:
+    """Map a provider webhook event name to a status."""
+    name = (event or "").lower()
+    if "fail" in name or "error" in name:
+        return FAILED
+    if "complete" in name or "success" in name or "publish" in name:
+        return "published"
+    return name or "webhook"
+
+
+def _s(value):
+    return None if value is None else str(value)
+
+
+class PublishStatusStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or publish_db_path()
+        self._local = threading.local()
+        init_db(self._conn())
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def record(self, upload_id: str, status: str, **fields):
+        with self._conn() as conn:
+            upsert(conn, upload_id, status, **fields)
+
+    def _rows(self, where: str, params, limit: Optional[int] = None) -> List[dict]:
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM publish_status WHERE {where} ORDER BY updated_at DESC"
+        if limit:
+            sql += f" LIMIT {int(limit)}"
+        return [dict(zip(_COLUMNS, r)) for r in self._conn().execute(sql, params)]
+
+    def get(self, upload_id: str) -> Optional[dict]:
+        rows = self._rows("upload_id = ?", (str(upload_id),))
+        return rows[0] if rows else None
+
+    def by_item(self, item_id: str) -> List[dict]:
+        """All uploads of an item, newest first."""
+        return self._rows("item_id = ?", (str(item_id),))
+
+    def by_video(self, video_id: str) -> List[dict]:
+        return self._rows("video_id = ?", (str(video_id),))
+
+    def recent_failures(self, limit: int = 20, since: Optional[float] = None) -> List[dict]:
+        return self._rows("status = ? AND updated_at >= ?", (FAILED, since or 0), limit=limit)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+def get_store() -> PublishStatusStore:
+    """Shared store for the current publish DB path."""
+    path = publish_db_path()
+    with _stores_lock:
+        store = _stores.get(path)
+        if store is None:
+            store = _stores[path] = PublishStatusStore(path)
+        return store
+
+
+def record(upload_id: Optional[str], status: str, **fields):
+    """Best-effort status write for upload code paths: logs instead of raising."""
+    if not upload_id:
+        return
+    try:
+        get_store().record(upload_id, status, **fields)
+    except Exception:
+        logger.exception("Failed to record publish status %s for upload %s", status, upload_id)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m src.publish_status")
+    sub = p.add_subparsers(dest="command", required=True)
+    f = sub.add_parser("failures", help="recent failed uploads")
+    f.add_argument("--limit", type=int, default=20)
+    f.add_argument("--hours", type=float, default=24)
+    sub.add_parser("item", help="uploads of one item").add_argument("item_id")
+    sub.add_parser("upload", help="one upload").add_argument("upload_id")
+    args = p.parse_args(argv)
+
+    store = get_store()
+    if args.command == "failures":
+        rows = store.recent_failures(args.limit, since=time.time() - args.hours * 3600)
+    elif args.command == "item":
+        rows = store.by_item(args.item_id)
+    else:
+        rows = [r for r in [store.get(args.upload_id)] if r]
+    for r in rows:
+        print(json.dumps(r, ensure_ascii=False))
+    return 0 if rows else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
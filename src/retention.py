@@ -0,0 +1,186 @@
+"""Output directory lifecycle: sharded layout helpers and retention (GC) policies.
+
+Everything the pipeline writes lands under `Config.OUTPUT_DIR` (the artifact
+store may live elsewhere via `ARTIFACT_DIR`). Write-mostly directories
+(dry-run previews, captions, publish metrics, PKCE verifiers, traces) are
+sharded by date via `dated_dir`, upload journals and the artifact store shard
+by hash, and `run_gc` applies age- and size-based policies so the hot
+directories stay small. Policies also match the flat files older versions
+wrote at the top level.
+
+Usage:
+  python -m src.runner gc --dry-run   # report only
+  python -m src.runner gc             # delete
+"""
+import os
+import time
+import logging
+from pathlib import Path
+from typing import List, Optional, Union
+
+from .config import Config
+from . import artifact_store
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+
+def dated_dir(base: str, when: Optional[float] = None) -> str:
+    """Return (and create) `base/YYYY/MM/DD` for `when` (default: now, UTC)."""
+    t = time.gmtime(when if when is not None else time.time())
+    path = os.path.join(base, f"{t.tm_year:04d}", f"{t.tm_mon:02d}", f"{t.tm_mday:02d}")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+class Policy:
+    """Retention rule for files matching a glob `pattern` (or a list of them).
+
+    Patterns are relative to `root` when given, else to the GC's OUTPUT_DIR.
+    Files older than `max_age_days` are removed first; if the remaining files
+    still exceed `max_bytes`, the least recently modified ones are removed
+    until the total fits.
+    """
+
+    def __init__(self, name: str, pattern: Union[str, List[str]], max_age_days: Optional[float] = None,
+                 max_bytes: Optional[int] = None, root: Optional[str] = None):
+        self.name = name
+        self.pattern = pattern
+        self.patterns = [pattern] if isinstance(pattern, str) else list(pattern)
+        self.max_age_days = max_age_days
+        self.max_bytes = max_bytes
+        self.root = root
+
+    def __repr__(self):
+        return (f"Policy({self.name!r}, {self.pattern!r}, max_age_days={self.max_age_days}, "
+                f"max_bytes={self.max_bytes}, root={self.root!r})")
+
+
+def _env_days(name: str, default: float) -> float:
+    return float(os.getenv(name, str(default)))
+
+
+def default_policies(output_dir: Optional[str] = None) -> List[Policy]:
+    """Policies for everything the pipeline writes; ages/sizes overridable via env."""
+    return [
+        Policy("dry_runs", "dry_runs/**/*.json", _env_days("RETENTION_DRY_RUN_DAYS", 7)),
+        Policy("captions", ["captions/**/*.txt", "*.txt"], _env_days("RETENTION_CAPTION_DAYS", 30)),
+        Policy("pkce_state", ["pkce/**/pkce_state_*.json", "pkce_state_*.json"], _env_days("RETENTION_PKCE_DAYS", 1)),
+        Policy("upload_state", "upload_state_*.json", _env_days("RETENTION_UPLOAD_STATE_DAYS", 14)),
+        Policy("upload_metrics", "upload_metrics_*.json", _env_days("RETENTION_UPLOAD_METRICS_DAYS", 30)),
+        Policy("upload_journals", "upload_journals/**/*.jsonl", _env_days("RETENTION_UPLOAD_JOURNAL_DAYS", 30)),
+        Policy("publish_metrics", "publish_metrics/**/*.json", _env_days("RETENTION_PUBLISH_METRICS_DAYS", 90)),
+        Policy("webhooks", "webhooks/**/*.json", _env_days("RETENTION_WEBHOOK_DAYS", 30)),
+        Policy("traces", "traces/**/*.jsonl", _env_days("RETENTION_TRACE_DAYS", 7)),
+        Policy(
+            "image_cache",
+            "image_cache/**/*",
+            _env_days("RETENTION_IMAGE_CACHE_DAYS", 30),
+            int(os.getenv("RETENTION_IMAGE_CACHE_MAX_BYTES", str(1024 ** 3))),
+        ),
+        Policy(
+            "artifacts",
+            "**/*",
+            _env_days("RETENTION_ARTIFACT_DAYS", 30),
+            int(os.getenv("RETENTION_ARTIFACT_MAX_BYTES", str(2 * 1024 ** 3))),
+            root=artifact_store.default_root(output_dir),
+        ),
+    ]
+
+
+def plan_gc(output_dir: str, policies: Optional[List[Policy]] = None, now: Optional[float] = None) -> dict:
+    """Return a report of what GC would delete, without touching anything.
+
+    Report shape: {policy_name: {"root", "scanned", "scanned_bytes", "delete": [(path, size, reason)], "delete_bytes"}}.
+    A file matched by several policies is handled by the first one.
+    """
+    policies = policies if policies is not None else default_policies(output_dir)
+    now = now if now is not None else time.time()
+    seen = set()
+    report = {}
+    for pol in policies:
+        root = Path(pol.root or output_dir)
+        files = []
+        for p in (p for pattern in pol.patterns for p in root.glob(pattern)):
+            if p in seen:
+                continue
+            try:
+                st = p.stat()
+            except OSError:
+                continue
+            if not p.is_file():
+                continue
+            seen.add(p)
+            files.append((st.st_mtime, st.st_size, p))
+
+        delete = []
+        keep = []
+        for mtime, size, p in files:
+            if pol.max_age_days is not None and now - mtime > pol.max_age_days * DAY:
+                delete.append((str(p), size, "age"))
+            else:
+                keep.append((mtime, size, p))
+
+        if pol.max_bytes is not None:
+            total = sum(size for _, size, _ in keep)
+            for mtime, size, p in sorted(keep, key=lambda x: x[0]):
+                if total <= pol.max_bytes:
+                    break
+                delete.append((str(p), size, "size"))
+                total -= size
+
+        report[pol.name] = {
+            "root": str(root),
+            "scanned": len(files),
+            "scanned_bytes": sum(size for _, size, _ in files),
+            "delete": delete,
+            "delete_bytes": sum(size for _, size, _ in delete),
+        }
+    return report
+
+
+def _prune_empty_dirs(root: Path, start: Path):
+    d = start
+    while d != root and root in d.parents:
+        try:
+            d.rmdir()
+        except OSError:
+            return
+        d = d.parent
+
+
+def run_gc(output_dir: Optional[str] = None, policies: Optional[List[Policy]] = None, dry_run: bool = False, now: Optional[float] = None) -> dict:
+    """Apply retention policies to `output_dir` and return the plan report.
+
+    With `dry_run` nothing is deleted. Otherwise matched files are removed and
+    shard directories left empty are pruned.
+    """
+    output_dir = output_dir or Config.OUTPUT_DIR
+    report = plan_gc(output_dir, policies, now)
+    if dry_run:
+        return report
+    for name, entry in report.items():
+        root = Path(entry["root"]).resolve()
+        removed = 0
+        for path, _size, _reason in entry["delete"]:
+            try:
+                os.unlink(path)
+                removed += 1
+            except OSError:
+                logger.warning("GC could not remove %s", path)
+                continue
+            _prune_empty_dirs(root, Path(path).resolve().parent)
+        entry["removed"] = removed
+    return report
+
+
+def format_report(report: dict, dry_run: bool = False) -> str:
+    lines = [f"{'policy':<16} {'files':>8} {'MB':>10} {'delete':>8} {'del MB':>10}"]
+    for name, e in report.items():
+        lines.append(
+            f"{name:<16} {e['scanned']:>8} {e['scanned_bytes'] / 1e6:>10.1f} "
+            f"{len(e['delete']):>8} {e['delete_bytes'] / 1e6:>10.1f}"
+        )
+    lines.append("(dry run: nothing deleted)" if dry_run else "")
+    return "\n".join(lines).rstrip()
@@ -3,6 +3,11 @@
 Usage:
   python -m src.runner --dry-run
   python -m src.runner --run
+  python -m src.runner --run --accounts shop-a,shop-b   (items are spread round-robin)
+  python -m src.runner --run --push-metrics http://localhost:8080   (PUT metrics to the service when done)
+  python -m src.runner --dry-run --profile cpu --profile-stage media --profile-sample 0.1
+      (per-stage profiles + top-N report under OUTPUT_DIR/profiles/, see src/profiling.py)
+  python -m src.runner gc [--dry-run]
 """
 import argparse
 import logging
@@ -12,93 +17,188 @@ from . import media_creator
 from . import poster_tiktok_api
 from .config import Config
 from . import predictor
-import time
+from . import retention
+from . import phash
+from . import metrics
+from . import profiling
+from . import tracing
+from .image_fetcher import ImageFetcher
+from .upload_scheduler import UploadScheduler
 
 logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"))
 logger = logging.getLogger(__name__)
 
 
+def process_item(item, idx=0, thumb=None, posted_index=None, scheduler=None, account=None) -> dict:
+    """Media, captions, scoring and posting for one generated item.
+
+    With a `scheduler` the video upload is queued there and the returned dict
+    carries its future; otherwise the chosen variant is posted as a dry run.
+    The status is one of failed / skipped / duplicate / queued / dry_run.
+    """
+    title = item.get("title") or item.get("name") or f"item-{idx}"
+    item_id = str(item.get("itemid") or title)
+    # one trace per item: stage spans from media_creator, predictor and the poster nest under it
+    with tracing.item(item_id, stage="post") as root:
+        outcome = _process_item(item, title, item_id, thumb, posted_index, scheduler, account)
+        root.set(status=outcome["status"])
+        return outcome
+
+
+def _process_item(item, title, item_id, thumb, posted_index, scheduler, account) -> dict:
+    price = item.get("price") or item.get("price_min") or ""
+    outcome = {"item_id": item_id, "title": title}
+
+    # banners/videos are content-addressed: identical inputs resolve to the stored file
+    try:
+        img_out = media_creator.render_banner(title, price, image_path=thumb)
+        logger.info("Media for item %s -> %s", title, img_out)
+    except Exception:
+        logger.exception("Failed to create media for %s", title)
+        return dict(outcome, status="failed", error="media")
+
+    # Generate caption variants (predictor will use OpenAI if available)
+    caption_variants = predictor.generate_caption_variants(title, price, item.get("affiliate_link", ""), n=3)
+
+    # Create thumbnail variants (original + dark high-contrast scheme)
+    thumb_variants = [img_out]
+    try:
+        alt = media_creator.render_banner(title, price, variant="alt", image_path=thumb)
+        thumb_variants.append(alt)
+    except Exception:
+        logger.exception("Failed to create thumbnail variant for %s", title)
+
+    # collapse pixel-identical / near-identical variants before scoring and encoding
+    thumb_variants = phash.dedupe_paths(thumb_variants)
+
+    # Score variants and pick top
+    best = None
+    best_score = -1.0
+    best_details = None
+    for cap in caption_variants:
+        for variant in thumb_variants:
+            try:
+                sc, details = predictor.score_variant(cap, variant)
+            except Exception:
+                sc, details = 0.0, {}
+            if sc > best_score:
+                best_score = sc
+                best = (cap, variant)
+                best_details = details
+
+    if best is None:
+        logger.warning("No viable variant for %s, skipping", title)
+        return dict(outcome, status="skipped")
+
+    chosen_caption, chosen_thumb = best
+    logger.info("Chosen variant for %s: score=%.3f details=%s", title, best_score, best_details)
+    outcome.update(caption=chosen_caption, thumbnail=chosen_thumb, score=best_score)
+
+    # without a product photo the banner is just title/price text on a fixed layout, and
+    # unrelated products hash within a few bits of each other: only compare composited images
+    thumb_hash = phash.file_hash(chosen_thumb) if thumb else None
+    outcome["thumb_hash"] = thumb_hash
+    if posted_index is not None and thumb_hash is not None:
+        dup = posted_index.find_duplicate(thumb_hash, item_id)
+        if dup:
+            logger.warning("Skipping %s: thumbnail looks identical to already-posted item %s (distance=%s)", title, dup[0], dup[1])
+            return dict(outcome, status="duplicate", duplicate_of=dup[0])
+
+    # call poster: with a scheduler, create a short video and upload via chunked API
+    try:
+        if scheduler is not None:
+            # obtain access token (per-account token row, else token_store, or dev token)
+            access_token = poster_tiktok_api.obtain_access_token(os.getenv("TIKTOK_CLIENT_KEY"), os.getenv("TIKTOK_CLIENT_SECRET"), account_id=account)
+            # create a short video from the banner as a single-frame video
+            media_path = media_creator.render_video([chosen_thumb])
+            logger.info("Queueing upload of %s for account %s with token present=%s", media_path, account or "default", bool(access_token))
+            fut = scheduler.submit(chosen_caption, media_path, access_token or "", priority=best_score, account=account, item_id=item_id)
+            if posted_index is not None and thumb_hash is not None:
+                # look-alikes later in this batch must see it before the upload lands
+                posted_index.reserve(item_id, thumb_hash)
+            return dict(outcome, status="queued", media=media_path, future=fut)
+        logger.info("Posting to TikTok (dry_run=%s) for %s", True, title)
+        post_res = poster_tiktok_api.post_video(chosen_caption, chosen_thumb, access_token=None, dry_run=True)
+        logger.info("Post result: %s", post_res)
+        return dict(outcome, status="dry_run", result=post_res)
+    except Exception as e:
+        logger.exception("Failed to post item %s", title)
+        return dict(outcome, status="failed", error=str(e))
+
+
 def main():
     p = argparse.ArgumentParser()
+    p.add_argument("command", nargs="?", choices=["post", "gc"], default="post")
     p.add_argument("--dry-run", action="store_true", default=False)
     p.add_argument("--run", action="store_true", default=False)
+    p.add_argument("--accounts", default=os.getenv("TIKTOK_ACCOUNTS", ""),
+                   help="comma-separated TikTok account ids from the token DB (default: the single legacy token)")
+    p.add_argument("--push-metrics", default=os.getenv("METRICS_PUSH_URL", ""),
+                   help="service (or Pushgateway) base URL to push this run's metrics to")
+    p.add_argument("--profile", choices=profiling.MODES, default=None,
+                   help="profile trace spans: cpu (cProfile), alloc (tracemalloc) or wall (stack sampling)")
+    p.add_argument("--profile-stage", default="",
+                   help="only profile spans whose name starts with this, e.g. media or predictor.score")
+    p.add_argument("--profile-sample", type=float, default=1.0, help="fraction of items to profile")
+    p.add_argument("--profile-top", type=int, default=25, help="hotspots per stage in the report")
     args = p.parse_args()
     os.makedirs(Config.OUTPUT_DIR, exist_ok=True)
 
+    if args.command == "gc":
+        report = retention.run_gc(Config.OUTPUT_DIR, dry_run=args.dry_run)
+        print(retention.format_report(report, dry_run=args.dry_run))
+        return
+
+    profiler = None
+    if args.profile:
+        profiler = profiling.StageProfiler(args.profile, stage=args.profile_stage,
+                                           sample=args.profile_sample, top=args.profile_top).start()
+    try:
+        _post(args)
+    finally:
+        if profiler is not None:
+            print(f"profile report: {profiler.stop()}")
+
+    logger.info("Runner finished")
+    if args.push_metrics:
+        metrics.push(args.push_metrics, os.getenv("METRICS_JOB", "runner"))
+
+
+def _post(args):
     logger.info("Starting runner. dry_run=%s", args.dry_run)
     results = run_once()
     logger.info("Generator produced %s items", len(results))
 
+    # download (or revalidate) the first product image of every item concurrently up front
+    fetcher = ImageFetcher()
+    with tracing.span("images.fetch_many", count=len(results)):
+        thumbs = fetcher.fetch_many([(it.get("images") or [None])[0] for it in results], size=media_creator.PRODUCT_THUMB_SIZE)
+    # hashes of thumbnails already posted, to avoid posting look-alike content under another item id
+    posted_index = phash.PHashIndex()
+    # real uploads from all items share one worker pool / bandwidth budget, best-scored first
+    scheduler = UploadScheduler() if args.run else None
+    uploads = []
+    accounts = [a.strip() for a in args.accounts.split(",") if a.strip()] or [None]
+
     # For each generated item, produce media and post (dry-run by default)
     for idx, item in enumerate(results):
-        title = item.get("title") or item.get("name") or f"item-{idx}"
-        price = item.get("price") or item.get("price_min") or ""
-
-        # create an output path per item
-        safe_name = title.replace(" ", "_").replace("/", "_")[:50]
-        img_out = os.path.join(Config.OUTPUT_DIR, f"banner_{safe_name}_{int(time.time())}.png")
+        thumb = thumbs.get((item.get("images") or [None])[0])
+        outcome = process_item(item, idx, thumb, posted_index, scheduler=scheduler, account=accounts[idx % len(accounts)])
+        if outcome.get("future") is not None:
+            uploads.append((outcome["future"], outcome["title"], outcome["item_id"], outcome["thumb_hash"]))
 
+    for fut, title, item_id, thumb_hash in uploads:
         try:
-            logger.info("Creating media for item %s -> %s", title, img_out)
-            media_creator.make_banner(title, price, img_out)
-        except Exception:
-            logger.exception("Failed to create media for %s", title)
-            continue
-
-        # Generate caption variants (predictor will use OpenAI if available)
-        caption_variants = predictor.generate_caption_variants(title, price, item.get("affiliate_link", ""), n=3)
-
-        # Create thumbnail variants (original + adjusted)
-        thumb_variants = [img_out]
-        try:
-            # brightness/contrast variant
-            alt = os.path.join(Config.OUTPUT_DIR, f"banner_{safe_name}_alt_{int(time.time())}.png")
-            media_creator.make_banner(title, price, alt)
-            thumb_variants.append(alt)
-        except Exception:
-            logger.exception("Failed to create thumbnail variant for %s", title)
-
-        # Score variants and pick top
-        best = None
-        best_score = -1.0
-        best_details = None
-        for cap in caption_variants:
-            for thumb in thumb_variants:
-                try:
-                    sc, details = predictor.score_variant(cap, thumb)
-                except Exception:
-                    sc, details = 0.0, {}
-                if sc > best_score:
-                    best_score = sc
-                    best = (cap, thumb)
-                    best_details = details
-
-        if best is None:
-            logger.warning("No viable variant for %s, skipping", title)
-            continue
-
-        chosen_caption, chosen_thumb = best
-        logger.info("Chosen variant for %s: score=%.3f details=%s", title, best_score, best_details)
-
-        # call poster: if run flag present, try to create a short video and upload via chunked API
-        try:
-            if args.run:
-                # obtain access token (uses token_store if configured, or dev token)
-                access_token = poster_tiktok_api.obtain_access_token(os.getenv("TIKTOK_CLIENT_KEY"), os.getenv("TIKTOK_CLIENT_SECRET"))
-                # create a short video from the banner as a single-frame video
-                video_out = os.path.join(Config.OUTPUT_DIR, f"video_{safe_name}_{int(time.time())}.mp4")
-                media_path = media_creator.make_video_from_images([chosen_thumb], video_out)
-                logger.info("Uploading video %s with token present=%s", media_path, bool(access_token))
-                upload_res = poster_tiktok_api.upload_video_chunked(chosen_caption, media_path, access_token or "", dry_run=False)
-                logger.info("Upload result: %s", upload_res)
-            else:
-                logger.info("Posting to TikTok (dry_run=%s) for %s", True, title)
-                post_res = poster_tiktok_api.post_video(chosen_caption, chosen_thumb, access_token=None, dry_run=True)
-                logger.info("Post result: %s", post_res)
+            upload_res = fut.result()
+            logger.info("Upload result for %s: %s", title, upload_res)
+            if thumb_hash is not None:
+                posted_index.commit(item_id, thumb_hash)
         except Exception:
             logger.exception("Failed to post item %s", title)
-
-    logger.info("Runner finished")
+            if thumb_hash is not None:
+                posted_index.release(item_id, thumb_hash)
+    if scheduler is not None:
+        scheduler.shutdown()
 
 
 if __name__ == '__main__':
@@ -5,15 +5,46 @@ import requests
 import json
 from urllib.parse import urlencode
 from .config import Config
+from . import metrics
+from . import tracing
 import logging
 from functools import wraps
 import os
 
 logger = logging.getLogger(__name__)
 
+SHOPEE_REQUESTS = metrics.counter("shopee_requests_total", "Shopee API calls by outcome (ok, error, rate_limited)", ["endpoint", "outcome"])
+SHOPEE_SECONDS = metrics.histogram("shopee_request_seconds", "Shopee API call latency", ["endpoint"])
+
+
+def observed(func):
+    """Count, time and trace every call (each retry attempt is one call)."""
+    seconds = SHOPEE_SECONDS.labels(func.__name__)
+
+    @wraps(func)
+    def f(*args, **kwargs):
+        t0 = time.perf_counter()
+        outcome = "error"
+        try:
+            with tracing.span("shopee." + func.__name__):
+                result = func(*args, **kwargs)
+            outcome = "ok"
+            return result
+        except Exception as e:
+            if getattr(getattr(e, "response", None), "status_code", None) == 429:
+                outcome = "rate_limited"
+            raise
+        finally:
+            seconds.observe(time.perf_counter() - t0)
+            SHOPEE_REQUESTS.labels(func.__name__, outcome).inc()
+
+    return f
+
 
 def retry(exceptions, tries=3, delay=1, backoff=2):
     def deco(func):
+        func = observed(func)
+
         @wraps(func)
         def f(*args, **kwargs):
             mtries, mdelay = tries, delay
@@ -104,6 +135,7 @@ class ShopeeClient:
         sig = hmac.new(self.partner_key.encode("utf-8"), message.encode("utf-8"), hashlib.sha256).hexdigest()
         return sig, ts
 
+    @observed
     def search_items(self, query: str = None, limit: int = 20):
         """Search items. If query is None, fall back to a popular items endpoint."""
         if query:
@@ -153,6 +185,26 @@ class ShopeeClient:
         logger.info("Fetched popular items, count=%s", len(resp.json().get('items', [])))
         return resp.json()
 
+    @retry((requests.RequestException, ), tries=3, delay=1, backoff=2)
+    def get_items(self, item_ids, shop_id=None):
+        """Fetch specific items by id (same {"items": [...]} shape as the search endpoints)."""
+        # สมมติ endpoint: /items/get
+        path = "/items/get"
+        url = f"{self.base}{path}"
+        params = {"partner_id": self.partner_id, "item_ids": ",".join(str(i) for i in item_ids)}
+        if shop_id:
+            params["shopid"] = shop_id
+        signature, ts = self._sign(path, params, method="GET")
+        headers = {"Content-Type": "application/json"}
+        if signature:
+            headers.update({"X-Signature": signature, "X-Timestamp": ts})
+        else:
+            headers.update({"X-Timestamp": ts})
+
+        resp = requests.get(url, params=params, headers=headers, timeout=15)
+        resp.raise_for_status()
+        return resp.json()
+
     @retry((requests.RequestException, ), tries=3, delay=1, backoff=2)
     def generate_affiliate_link(self, item_id, shop_id):
         # สมมติ endpoint: /items/generate_affiliate
@@ -0,0 +1,205 @@
+"""Auto-fit text layout for banners (Thai-aware wrapping + font fallback).
+
+`fit_text` wraps text into a bounding box and picks the largest font size that
+fits by binary search. Only measurements are performed during the search, and
+they are memoized per (font, size, text), so drawing a fitted layout costs
+about one render. Thai has no spaces between words, so words that don't fit a
+line are broken between grapheme clusters (a base character plus its
+combining vowel/tone marks) rather than between code points.
+
+Fonts are resolved from a fallback chain (env `BANNER_FONTS`, comma-separated
+paths/names, tried before the built-in list); the first font with glyphs for
+every character of the text is used.
+"""
+import os
+import unicodedata
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from PIL import ImageFont
+
+# Thai-capable fonts first (Linux/Windows/macOS names), then generic fallbacks
+DEFAULT_FONTS = [
+    "NotoSansThai-Regular.ttf",
+    "NotoSansThaiUI-Regular.ttf",
+    "Sarabun-Regular.ttf",
+    "Garuda.ttf",
+    "Loma.ttf",
+    "LeelawUI.ttf",
+    "leelawad.ttf",
+    "tahoma.ttf",
+    "Thonburi.ttc",
+    "arial.ttf",
+    "DejaVuSans.ttf",
+]
+
+# code point assumed absent from every font: its mask is the font's .notdef box
+_NOTDEF_PROBE = "\U0010FFFD"
+
+
+def font_chain() -> List[Optional[str]]:
+    """Return loadable fonts in preference order; `None` is Pillow's built-in font."""
+    env = [f.strip() for f in os.getenv("BANNER_FONTS", "").split(",") if f.strip()]
+    return _resolve_chain(tuple(env + DEFAULT_FONTS))
+
+
+@lru_cache(maxsize=8)
+def _resolve_chain(candidates: Tuple[str, ...]) -> List[Optional[str]]:
+    chain = []
+    for name in candidates:
+        try:
+            ImageFont.truetype(name, 12)
+        except OSError:
+            continue
+        chain.append(name)
+    chain.append(None)
+    return chain
+
+
+@lru_cache(maxsize=256)
+def get_font(font: Optional[str], size: int):
+    if font is None:
+        try:
+            return ImageFont.load_default(size)
+        except TypeError:
+            # Pillow < 10.1: bitmap default font has a single size
+            return ImageFont.load_default()
+    return ImageFont.truetype(font, size)
+
+
+@lru_cache(maxsize=None)
+def _notdef_mask(font: Optional[str]) -> bytes:
+    return bytes(get_font(font, 24).getmask(_NOTDEF_PROBE))
+
+
+@lru_cache(maxsize=65536)
+def _has_glyph(font: Optional[str], ch: str) -> bool:
+    if ch.isspace() or unicodedata.category(ch).startswith("M"):
+        # spaces and combining marks can legitimately render empty/odd alone
+        return True
+    return bytes(get_font(font, 24).getmask(ch)) != _notdef_mask(font)
+
+
+def pick_font(text: str) -> Optional[str]:
+    """Return the first font in the chain that has a glyph for every character of `text`."""
+    chain = font_chain()
+    chars = set(text)
+    for font in chain:
+        if all(_has_glyph(font, ch) for ch in chars):
+            return font
+    return chain[0]
+
+
+@lru_cache(maxsize=65536)
+def text_width(font: Optional[str], size: int, text: str) -> float:
+    return get_font(font, size).getlength(text)
+
+
+@lru_cache(maxsize=1024)
+def line_height(font: Optional[str], size: int, spacing: float = 1.2) -> int:
+    f = get_font(font, size)
+    try:
+        ascent, descent = f.getmetrics()
+        return int(round((ascent + descent) * spacing))
+    except AttributeError:
+        return int(round(size * spacing))
+
+
+# Thai/Lao vowels written before the consonant they follow in speech (category Lo, not M)
+_LEADING_VOWELS = frozenset("\u0e40\u0e41\u0e42\u0e43\u0e44\u0ec0\u0ec1\u0ec2\u0ec3\u0ec4")
+
+
+def grapheme_clusters(text: str) -> List[str]:
+    """Split text into clusters so combining marks stay attached to their base
+    and Thai leading vowels (เ แ โ ใ ไ) to the consonant after them."""
+    clusters = []
+    for ch in text:
+        if clusters and (unicodedata.category(ch).startswith("M")
+                         or (clusters[-1][-1] in _LEADING_VOWELS and not ch.isspace())):
+            clusters[-1] += ch
+        else:
+            clusters.append(ch)
+    return clusters
+
+
+def wrap_text(text: str, font: Optional[str], size: int, max_width: float) -> Optional[List[str]]:
+    """Greedy-wrap `text` to `max_width`. Returns None if a single cluster is wider than the box."""
+    lines = []
+    for paragraph in text.split("\n"):
+        line = ""
+        for word in paragraph.split(" "):
+            candidate = f"{line} {word}" if line else word
+            if text_width(font, size, candidate) <= max_width:
+                line = candidate
+                continue
+            if line:
+                lines.append(line)
+                line = ""
+            if text_width(font, size, word) <= max_width:
+                line = word
+                continue
+            # word too long for a line (typical for Thai): break between clusters
+            for cl in grapheme_clusters(word):
+                if text_width(font, size, line + cl) <= max_width:
+                    line += cl
+                elif not line:
+                    return None
+                else:
+                    lines.append(line)
+                    line = cl
+        lines.append(line)
+    return lines
+
+
+class TextLayout:
+    def __init__(self, font: Optional[str], size: int, lines: List[str], line_height: int):
+        self.font = font
+        self.size = size
+        self.lines = lines
+        self.line_height = line_height
+
+    @property
+    def height(self) -> int:
+        return self.line_height * len(self.lines)
+
+    def draw(self, draw, xy, fill) -> int:
+        """Draw the layout with an ImageDraw at `xy`; returns the y just below the block."""
+        x, y = xy
+        f = get_font(self.font, self.size)
+        for ln in self.lines:
+            draw.text((x, y), ln, font=f, fill=fill)
+            y += self.line_height
+        return y
+
+
+def fit_text(text: str, box: Tuple[int, int], max_size: int = 72, min_size: int = 20, font: Optional[str] = None) -> TextLayout:
+    """Return the largest-size layout of `text` that fits `box` (width, height).
+
+    Falls back to `min_size` (possibly overflowing vertically) if nothing fits.
+    """
+    width, height = box
+    font = font if font is not None else pick_font(text)
+
+    def layout(size):
+        lines = wrap_text(text, font, size, width)
+        if lines is None:
+            return None
+        lh = line_height(font, size)
+        if lh * len(lines) > height:
+            return None
+        return TextLayout(font, size, lines, lh)
+
+    best = None
+    lo, hi = min_size, max_size
+    while lo <= hi:
+        mid = (lo + hi) // 2
+        candidate = layout(mid)
+        if candidate is not None:
+            best = candidate
+            lo = mid + 1
+        else:
+            hi = mid - 1
+    if best is None:
+        lines = wrap_text(text, font, min_size, width) or grapheme_clusters(text)
+        best = TextLayout(font, min_size, lines, line_height(font, min_size))
+    return best
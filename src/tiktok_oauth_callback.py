@@ -1,16 +1,62 @@
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Response, Depends
+from contextlib import asynccontextmanager
 import os
+import re
+import hmac
+import uuid
+import asyncio
 import logging
 from . import poster_tiktok_api
 from . import token_store
+from . import token_refresh
+from . import upload_async
+from . import webhook_ingest
+from . import publish_status
+from . import jobs
+from . import metrics
 from .config import Config
-import threading
 import time
 import json
 
-app = FastAPI()
 logger = logging.getLogger(__name__)
 
+UPLOADS_RUNNING = metrics.gauge("service_uploads_running", "In-process uploads started through POST /uploads")
+
+
+def require_api_key(request: Request):
+    """Shared-secret check (`X-API-Key: $SERVICE_API_KEY`) for routes that upload or change state.
+
+    This app is also the public OAuth callback / webhook receiver, so these
+    routes refuse every request while SERVICE_API_KEY is unset.
+    """
+    expected = os.getenv("SERVICE_API_KEY", "")
+    if not expected:
+        raise HTTPException(status_code=503, detail="SERVICE_API_KEY not configured")
+    given = request.headers.get("X-API-Key", "")
+    if not hmac.compare_digest(given.encode("utf-8"), expected.encode("utf-8")):
+        raise HTTPException(status_code=401, detail="invalid API key")
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # expiry-driven token refresh for every account, on this event loop
+    app.state.token_refresh = token_refresh.RefreshScheduler.from_env()
+    refresh_task = asyncio.create_task(app.state.token_refresh.run())
+    # POST /jobs runs the runner's per-item pipeline on this worker pool
+    app.state.jobs = jobs.JobWorkers()
+    await asyncio.to_thread(app.state.jobs.start)
+    try:
+        yield
+    finally:
+        refresh_task.cancel()
+        await asyncio.gather(refresh_task, return_exceptions=True)
+        await asyncio.to_thread(app.state.jobs.stop, 30)
+        await _stop_uploads()
+        await _flush_webhooks()
+
+
+app = FastAPI(lifespan=lifespan)
+
 
 @app.get("/tiktok/callback")
 async def tiktok_callback(request: Request):
@@ -40,53 +86,191 @@ async def tiktok_callback(request: Request):
 
 @app.post("/tiktok/webhook")
 async def tiktok_webhook(request: Request):
-    # Accept publish status callbacks from TikTok (provider may send JSON)
+    # Accept publish status callbacks from TikTok (provider may send JSON).
+    # Acknowledge once queued; the ingestor's writer persists in batches.
+    try:
+        payload = json.loads(await request.body())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="invalid JSON")
+    if not _webhooks().offer(payload):
+        raise HTTPException(status_code=503, detail="webhook queue full", headers={"Retry-After": "1"})
+    return {"status": "ok"}
+
+
+def _webhooks() -> webhook_ingest.WebhookIngestor:
+    ingestor = getattr(app.state, "webhooks", None)
+    if ingestor is None:
+        ingestor = app.state.webhooks = webhook_ingest.WebhookIngestor()
+    return ingestor
+
+
+# in-process uploads started through POST /uploads (job id -> status dict);
+# finished entries are dropped UPLOAD_STATUS_TTL seconds after they finish
+_uploads = {}
+_upload_tasks = set()
+UPLOADS_RUNNING.set_function(lambda: len(_upload_tasks))
+
+
+def _expire_uploads():
+    cutoff = time.time() - float(os.getenv("UPLOAD_STATUS_TTL", "3600"))
+    for job_id in [j for j, job in _uploads.items() if job.get("finished_at", cutoff + 1) <= cutoff]:
+        del _uploads[job_id]
+
+
+def _uploader() -> upload_async.AsyncUploader:
+    up = getattr(app.state, "uploader", None)
+    if up is None:
+        up = app.state.uploader = upload_async.AsyncUploader()
+    return up
+
+
+async def _run_upload(job_id: str, title: str, video_path: str, access_token: str, item_id=None):
+    job = _uploads[job_id]
+    try:
+        job["result"] = await _uploader().upload(title, video_path, access_token, item_id=item_id)
+        job["status"] = "committed"
+    except asyncio.CancelledError:
+        job["status"] = "cancelled"
+        raise
+    except Exception as e:
+        logger.exception("Upload %s failed", job_id)
+        job["status"] = "failed"
+        job["error"] = str(e)
+    job["finished_at"] = int(time.time())
+
+
+@app.post("/uploads", dependencies=[Depends(require_api_key)])
+async def start_upload(request: Request):
+    """Start a chunked upload on the service's event loop; poll GET /uploads/{id}."""
     payload = await request.json()
-    ts = int(time.time())
-    outdir = os.path.join(Config.OUTPUT_DIR, "webhooks")
-    os.makedirs(outdir, exist_ok=True)
-    path = os.path.join(outdir, f"publish_{ts}.json")
+    video_path = payload.get("video_path")
+    if not video_path:
+        raise HTTPException(status_code=400, detail="missing video_path")
+    root = os.path.realpath(Config.OUTPUT_DIR)
+    real = os.path.realpath(video_path)
+    if os.path.commonpath([real, root]) != root or not os.path.isfile(real):
+        raise HTTPException(status_code=400, detail="video_path must be a file under OUTPUT_DIR")
+    access_token = payload.get("access_token")
+    if not access_token:
+        try:
+            access_token = token_store.load_tokens().get("access_token")
+        except Exception:
+            logger.exception("Failed to load stored tokens")
+    if not access_token:
+        raise HTTPException(status_code=409, detail="no access token available")
+
+    _expire_uploads()
+    job_id = uuid.uuid4().hex
+    _uploads[job_id] = {"status": "running", "title": payload.get("title", ""), "video_path": real, "started_at": int(time.time())}
+    task = asyncio.create_task(_run_upload(job_id, payload.get("title", ""), real, access_token, item_id=payload.get("item_id")))
+    _upload_tasks.add(task)
+    task.add_done_callback(_upload_tasks.discard)
+    return {"status": "accepted", "upload": job_id}
+
+
+@app.get("/uploads/{job_id}", dependencies=[Depends(require_api_key)])
+async def upload_status(job_id: str):
+    _expire_uploads()
+    job = _uploads.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown upload")
+    return dict(job, upload=job_id)
+
+
+@app.post("/jobs", dependencies=[Depends(require_api_key)])
+async def submit_job(request: Request):
+    """Queue a targeted run for item ids, a search query or raw item payloads; poll GET /jobs/{id}."""
     try:
-        with open(path, "w", encoding="utf-8") as fh:
-            json.dump(payload, fh, ensure_ascii=False, indent=2)
-    except Exception:
-        logger.exception("Failed to write webhook payload")
-        raise HTTPException(status_code=500, detail="failed to persist webhook")
-    return {"status": "ok", "saved": path}
+        spec = jobs.parse_spec(await request.json())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    job_id = await asyncio.to_thread(app.state.jobs.submit, spec)
+    return {"status": "accepted", "job": job_id}
+
+
+@app.get("/jobs/{job_id}", dependencies=[Depends(require_api_key)])
+async def job_status(job_id: str):
+    job = await asyncio.to_thread(app.state.jobs.queue.get, job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="unknown job")
+    return job
+
+
+@app.get("/publish/items/{item_id}")
+async def publish_status_by_item(item_id: str):
+    """Publish status of every upload of a shop item, newest first."""
+    rows = await asyncio.to_thread(publish_status.get_store().by_item, item_id)
+    if not rows:
+        raise HTTPException(status_code=404, detail="no uploads for item")
+    return {"item_id": item_id, "uploads": rows}
+
+
+# metrics pushed by standalone processes (job name -> families labelled job=<name>)
+_pushed = {}
+_JOB_NAME = re.compile(r"[A-Za-z0-9_.:-]{1,64}")
+
+
+def _push_limits():
+    return (int(os.getenv("METRICS_PUSH_MAX_JOBS", "64")),
+            int(os.getenv("METRICS_PUSH_MAX_BYTES", str(1024 * 1024))))
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    pushed = [f for families in list(_pushed.values()) for f in families]
+    # gauge callbacks may query SQLite; keep the scrape off the event loop
+    body = await asyncio.to_thread(metrics.REGISTRY.render, pushed)
+    return Response(body, media_type=metrics.CONTENT_TYPE)
+
+
+@app.put("/metrics/job/{job}", dependencies=[Depends(require_api_key)])
+async def push_metrics(job: str, request: Request):
+    """Pushgateway-style: replace the metrics of `job` with the text-format body.
+
+    Bounded: at most METRICS_PUSH_MAX_JOBS job names and METRICS_PUSH_MAX_BYTES per body.
+    """
+    max_jobs, max_bytes = _push_limits()
+    if not _JOB_NAME.fullmatch(job):
+        raise HTTPException(status_code=400, detail="invalid job name")
+    if job not in _pushed and len(_pushed) >= max_jobs:
+        raise HTTPException(status_code=429, detail=f"too many pushed jobs (max {max_jobs}); DELETE one first")
+    body = bytearray()
+    async for chunk in request.stream():
+        body += chunk
+        if len(body) > max_bytes:
+            raise HTTPException(status_code=413, detail=f"metrics body over {max_bytes} bytes")
+    try:
+        families = metrics.parse(body.decode("utf-8"))
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=f"invalid metrics: {e}")
+    _pushed[job] = metrics.with_labels(families, job=job)
+    return {"status": "ok", "families": len(families)}
+
+
+@app.delete("/metrics/job/{job}", dependencies=[Depends(require_api_key)])
+async def delete_pushed_metrics(job: str):
+    _pushed.pop(job, None)
+    return {"status": "ok"}
 
 
 @app.get("/health")
 async def health():
-    return {"status": "ok"}
+    scheduler = getattr(app.state, "token_refresh", None)
+    return {"status": "ok", "token_refresh": scheduler.status() if scheduler is not None else {}}
 
 
-def _refresh_loop():
-    """Background thread: refresh access token periodically if refresh_token exists."""
-    interval = int(os.getenv("TIKTOK_REFRESH_INTERVAL", "3600"))
-    client_key = os.getenv("TIKTOK_CLIENT_KEY")
-    client_secret = os.getenv("TIKTOK_CLIENT_SECRET")
-    while True:
-        try:
-            tokens = token_store.load_tokens()
-            refresh_token = tokens.get("refresh_token")
-            if refresh_token and client_key and client_secret:
-                try:
-                    logger.info("Refreshing TikTok access token using refresh_token")
-                    new = poster_tiktok_api.refresh_access_token(client_key, client_secret, refresh_token)
-                    # persist new tokens
-                    try:
-                        token_store.save_tokens(new)
-                    except Exception:
-                        logger.exception("Failed to persist refreshed tokens")
-                except Exception:
-                    logger.exception("Failed to refresh token")
-        except Exception:
-            logger.exception("Token refresh loop error")
-        time.sleep(interval)
+async def _stop_uploads():
+    for task in list(_upload_tasks):
+        task.cancel()
+    await asyncio.gather(*_upload_tasks, return_exceptions=True)
+    up = getattr(app.state, "uploader", None)
+    if up is not None:
+        app.state.uploader = None
+        await up.aclose()
 
 
-@app.on_event("startup")
-def start_background_tasks():
-    # start token refresh thread
-    t = threading.Thread(target=_refresh_loop, daemon=True)
-    t.start()
+async def _flush_webhooks():
+    ingestor = getattr(app.state, "webhooks", None)
+    if ingestor is not None:
+        app.state.webhooks = None
+        await ingestor.stop()
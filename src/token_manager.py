@@ -0,0 +1,171 @@
+"""In-memory access-token cache in front of the encrypted token store.
+
+`token_store.load_tokens()` reads and Fernet-decrypts the store on every
+call. `TokenManager` does that once and then serves the cached token until
+the store file changes on disk (mtime/size) or the token gets close to expiry.
+`TIKTOK_TOKEN_REFRESH_SKEW` seconds before expiry it refreshes through
+`poster_tiktok_api.refresh_access_token`. Concurrent callers share one refresh
+(single-flight) and everyone else picks up its result.
+
+With an `account_id` the manager is backed by one row of the SQLite
+`AccountTokenStore` instead, and a row's `updated_at` plays the role of the
+file stat.
+
+    token = get_token_manager(client_key, client_secret).access_token()
+    token = get_token_manager(client_key, client_secret, account_id="shop-7").access_token()
+"""
+import os
+import time
+import logging
+import threading
+from typing import Callable, Optional
+
+from . import token_store
+
+logger = logging.getLogger(__name__)
+
+
+class TokenExpiredError(RuntimeError):
+    """The stored token has expired and could not be refreshed."""
+
+
+class TokenManager:
+    def __init__(self, client_key: Optional[str] = None, client_secret: Optional[str] = None,
+                 path: Optional[str] = None, skew: Optional[float] = None,
+                 refresh: Optional[Callable[[str, str, str], dict]] = None,
+                 account_id: Optional[str] = None, db: Optional[token_store.AccountTokenStore] = None,
+                 platform: str = "tiktok"):
+        self.client_key = client_key
+        self.client_secret = client_secret
+        self.path = path
+        self.account_id = account_id
+        self.platform = platform
+        self.db = db or (token_store.AccountTokenStore() if account_id is not None else None)
+        self.skew = skew if skew is not None else float(os.getenv("TIKTOK_TOKEN_REFRESH_SKEW", "300"))
+        self._refresh_fn = refresh
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._tokens = None
+        self._expires_at = None
+        self._stat = None
+
+    def _store_path(self) -> str:
+        return self.path or token_store.STORE_PATH
+
+    def _file_stat(self):
+        if self.db is not None:
+            return self.db.version(self.platform, self.account_id)
+        if token_store._use_keyring():
+            return None
+        try:
+            st = os.stat(self._store_path())
+        except FileNotFoundError:
+            return (0, 0)
+        return (st.st_mtime_ns, st.st_size)
+
+    def invalidate(self):
+        with self._lock:
+            self._tokens = None
+
+    def tokens(self) -> dict:
+        """Decrypted token payload, re-read only when the store file changed."""
+        stat = self._file_stat()
+        with self._lock:
+            if self._tokens is not None and stat == self._stat:
+                return self._tokens
+        if self.db is not None:
+            tokens, issued = self.db.load(self.platform, self.account_id), stat
+        else:
+            tokens = token_store.load_tokens(self.path)
+            issued = stat[0] / 1e9 if stat else None
+        with self._lock:
+            self._tokens, self._stat = tokens, stat
+            self._expires_at = token_store.expires_at(tokens, issued)
+            return tokens
+
+    def expires_at(self) -> Optional[float]:
+        self.tokens()
+        return self._expires_at
+
+    def needs_refresh(self, now: Optional[float] = None) -> bool:
+        exp = self.expires_at()
+        return exp is not None and exp - self.skew <= (time.time() if now is None else now)
+
+    def access_token(self) -> Optional[str]:
+        """A usable access token, refreshing it first if it is about to expire."""
+        tokens = self.tokens()
+        if tokens.get("access_token") and self.needs_refresh():
+            tokens = self.refresh(stale=tokens)
+        return tokens.get("access_token")
+
+    def refresh(self, stale: Optional[dict] = None, raise_errors: bool = False) -> dict:
+        """Refresh once for all concurrent callers; returns the current payload.
+
+        A failed refresh of a still-valid token is only logged unless
+        `raise_errors` is set (the refresh scheduler needs it to back off).
+        """
+        with self._refresh_lock:
+            current = self.tokens()
+            if stale is not None and current is not stale and not self.needs_refresh():
+                return current  # another caller refreshed while we waited
+            refresh_token = current.get("refresh_token")
+            try:
+                if not (refresh_token and self.client_key and self.client_secret):
+                    raise RuntimeError("no refresh_token or client credentials")
+                new = self._refresh(refresh_token)
+            except Exception as e:
+                exp = self._expires_at
+                if exp is not None and exp <= time.time():
+                    raise TokenExpiredError(f"access token expired and refresh failed: {e}") from e
+                if raise_errors:
+                    raise
+                logger.warning("Proactive token refresh failed (token still valid): %s", e)
+                return current
+            # providers may omit an unchanged refresh_token; keep the old one
+            merged = dict(current, **new)
+            if "expires_in" in new and "expires_at" not in new:
+                merged.pop("expires_at", None)  # re-stamped from the new expires_in on save
+            try:
+                if self.db is not None:
+                    self.db.save(self.platform, self.account_id, merged)
+                else:
+                    token_store.save_tokens(merged, path=self.path)
+            except Exception:
+                logger.exception("Failed to persist refreshed tokens")
+            stat = self._file_stat()
+            with self._lock:
+                self._tokens = merged
+                self._stat = stat
+                self._expires_at = token_store.expires_at(merged, time.time())
+            return merged
+
+    def _refresh(self, refresh_token: str) -> dict:
+        if self._refresh_fn is not None:
+            return self._refresh_fn(self.client_key, self.client_secret, refresh_token)
+        from . import poster_tiktok_api
+        # persisted by refresh() into this manager's own store, not the default blob
+        return poster_tiktok_api.refresh_access_token(self.client_key, self.client_secret, refresh_token, save=False)
+
+
+_managers = {}
+_managers_lock = threading.Lock()
+_db = None
+
+
+def get_token_manager(client_key: Optional[str] = None, client_secret: Optional[str] = None,
+                      path: Optional[str] = None, account_id: Optional[str] = None,
+                      platform: str = "tiktok") -> TokenManager:
+    """Process-wide manager per (client, store path or account)."""
+    global _db
+    if account_id is not None:
+        key = (client_key, client_secret, platform, token_store.DB_PATH, str(account_id))
+    else:
+        key = (client_key, client_secret, path or token_store.STORE_PATH)
+    with _managers_lock:
+        mgr = _managers.get(key)
+        if mgr is None:
+            if account_id is not None and (_db is None or _db.path != token_store.DB_PATH):
+                _db = token_store.AccountTokenStore()
+            mgr = _managers[key] = TokenManager(client_key, client_secret, path=path, account_id=account_id,
+                                                db=_db if account_id is not None else None, platform=platform)
+        return mgr
@@ -0,0 +1,157 @@
+"""Expiry-driven token refresh scheduler for the FastAPI app (runs on its loop).
+
+Each token (the legacy single-blob token and every TikTok row of the account
+token DB) is refreshed once, `TIKTOK_TOKEN_REFRESH_SKEW` seconds before its
+stored expiry minus a per-expiry random jitter (`TIKTOK_REFRESH_JITTER`), so
+many accounts issued together don't all refresh in the same instant. Tokens
+with no known expiry or no refresh_token are never refreshed. A failed refresh
+is retried with exponential backoff (`TIKTOK_REFRESH_BACKOFF_BASE` doubling up
+to `TIKTOK_REFRESH_MAX_BACKOFF`). Due refreshes of different accounts run
+concurrently, up to `TIKTOK_REFRESH_CONCURRENCY`.
+
+Between refreshes the scheduler sleeps until the next due time, waking at
+least every `TIKTOK_REFRESH_INTERVAL` seconds. Each pass asks the account
+token DB for the rows expiring before the next pass could still catch them
+(interval + skew + jitter, one indexed query) and loads only those; a row is
+decrypted again only when its stored expiry changed. `status()` feeds the
+/health endpoint and lists the legacy token plus the accounts in that window.
+"""
+import os
+import time
+import random
+import asyncio
+import logging
+from typing import Callable, Dict, Optional
+
+from . import token_store
+from . import token_manager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ACCOUNT = "default"
+
+
+class _Target:
+    def __init__(self, manager: token_manager.TokenManager):
+        self.manager = manager
+        self.expires_at = None
+        self.offset = 0.0
+        self.next_at = None
+        self.retry_at = None
+        self.failures = 0
+        self.last_error = None
+        self.last_refresh = None
+
+
+class RefreshScheduler:
+    def __init__(self, client_key: Optional[str], client_secret: Optional[str], skew: Optional[float] = None,
+                 jitter: Optional[float] = None, interval: Optional[float] = None,
+                 backoff_base: Optional[float] = None, max_backoff: Optional[float] = None,
+                 concurrency: Optional[int] = None, clock: Callable[[], float] = time.time,
+                 rand: Callable[[], float] = random.random):
+        self.client_key = client_key
+        self.client_secret = client_secret
+        self.skew = skew if skew is not None else float(os.getenv("TIKTOK_TOKEN_REFRESH_SKEW", "300"))
+        self.jitter = jitter if jitter is not None else float(os.getenv("TIKTOK_REFRESH_JITTER", "60"))
+        self.interval = interval or float(os.getenv("TIKTOK_REFRESH_INTERVAL", "300"))
+        self.backoff_base = backoff_base or float(os.getenv("TIKTOK_REFRESH_BACKOFF_BASE", "30"))
+        self.max_backoff = max_backoff or float(os.getenv("TIKTOK_REFRESH_MAX_BACKOFF", "1800"))
+        self.concurrency = concurrency or int(os.getenv("TIKTOK_REFRESH_CONCURRENCY", "8"))
+        self.clock = clock
+        self.rand = rand
+        self.targets: Dict[str, _Target] = {}
+
+    @classmethod
+    def from_env(cls) -> "RefreshScheduler":
+        return cls(os.getenv("TIKTOK_CLIENT_KEY"), os.getenv("TIKTOK_CLIENT_SECRET"))
+
+    def _expiring(self) -> Dict[str, float]:
+        """account_id -> stored expiry of TikTok rows that may fall due before the next pass."""
+        if not os.path.exists(token_store.DB_PATH):
+            return {}
+        window = self.interval + self.skew + self.jitter
+        rows = token_store.AccountTokenStore().expiring(window, platform="tiktok", now=self.clock())
+        return {account_id: exp for _, account_id, exp in rows}
+
+    def _plan(self, t: _Target):
+        try:
+            tokens = t.manager.tokens()
+            exp = t.manager.expires_at()
+        except Exception as e:
+            t.next_at, t.last_error = None, str(e)
+            return
+        if exp != t.expires_at:
+            # new expiry (refreshed here or elsewhere): fresh jitter, forget old failures
+            t.expires_at, t.offset = exp, self.rand() * self.jitter
+            t.retry_at, t.failures = None, 0
+        if exp is None or not tokens.get("refresh_token"):
+            t.next_at = None
+            return
+        t.next_at = max(exp - self.skew - t.offset, t.retry_at or 0)
+
+    def _scan(self):
+        if DEFAULT_ACCOUNT not in self.targets and (token_store._use_keyring() or os.path.exists(token_store.STORE_PATH)):
+            self.targets[DEFAULT_ACCOUNT] = _Target(token_manager.get_token_manager(self.client_key, self.client_secret))
+        if DEFAULT_ACCOUNT in self.targets:
+            self._plan(self.targets[DEFAULT_ACCOUNT])
+        expiring = self._expiring()
+        # rows that left the window were refreshed (here or elsewhere) or deleted;
+        # they come back into it at least one pass before they are due
+        for name in [n for n in self.targets if n != DEFAULT_ACCOUNT and n not in expiring]:
+            del self.targets[name]
+        for account_id, exp in expiring.items():
+            t = self.targets.get(account_id)
+            if t is None:
+                t = self.targets[account_id] = _Target(
+                    token_manager.get_token_manager(self.client_key, self.client_secret, account_id=account_id))
+            elif t.expires_at == exp:
+                continue  # unchanged row: keep the plan, skip the load/decrypt
+            self._plan(t)
+
+    async def _refresh(self, name: str, t: _Target, limit: asyncio.Semaphore):
+        async with limit:
+            try:
+                await asyncio.to_thread(t.manager.refresh, None, True)
+                t.last_refresh, t.last_error = self.clock(), None
+                logger.info("Refreshed TikTok token for %s", name)
+            except Exception as e:
+                t.failures += 1
+                t.last_error = str(e)
+                delay = min(self.backoff_base * 2 ** (t.failures - 1), self.max_backoff)
+                t.retry_at = self.clock() + delay * (0.5 + self.rand() / 2)
+                logger.warning("Token refresh for %s failed (%s); retrying in %.0fs", name, e, t.retry_at - self.clock())
+            await asyncio.to_thread(self._plan, t)
+
+    async def run_once(self) -> float:
+        """Refresh everything due now; returns seconds until the next wake-up."""
+        if not (self.client_key and self.client_secret):
+            return self.interval
+        await asyncio.to_thread(self._scan)
+        now = self.clock()
+        limit = asyncio.Semaphore(self.concurrency)
+        due = [(name, t) for name, t in self.targets.items() if t.next_at is not None and t.next_at <= now]
+        await asyncio.gather(*(self._refresh(name, t, limit) for name, t in due))
+        upcoming = [t.next_at for t in self.targets.values() if t.next_at is not None]
+        wake = min(upcoming + [self.clock() + self.interval])
+        return max(1.0, wake - self.clock())
+
+    async def run(self):
+        while True:
+            try:
+                wait = await self.run_once()
+            except Exception:
+                logger.exception("Token refresh scheduler error")
+                wait = self.interval
+            await asyncio.sleep(wait)
+
+    def status(self) -> dict:
+        return {
+            name: {
+                "expires_at": t.expires_at,
+                "next_refresh_at": t.next_at,
+                "failures": t.failures,
+                "last_error": t.last_error,
+                "last_refresh": t.last_refresh,
+            }
+            for name, t in self.targets.items()
+        }
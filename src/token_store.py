@@ -2,10 +2,18 @@
 
 This small utility uses a FERNET_KEY env var (URL-safe base64) to encrypt and
 decrypt a JSON blob stored on disk. It's minimal and suitable for local use.
+
+`AccountTokenStore` keeps one encrypted row per (platform, account_id) in
+SQLite instead, with the expiry in a plain indexed column so a refresh loop
+can find soon-to-expire tokens across many accounts without decrypting any.
 """
 import os
 import json
-from typing import Optional
+import time
+import sqlite3
+import threading
+from functools import lru_cache
+from typing import Callable, List, Optional, Tuple
 
 try:
     from cryptography.fernet import Fernet
@@ -19,23 +27,46 @@ except Exception:
 
 
 STORE_PATH = os.getenv("TOKEN_STORE_PATH", ".tokens.enc")
+DB_PATH = os.getenv("TOKEN_DB_PATH", ".tokens.db")
 KEYRING_SERVICE = os.getenv("TOKEN_KEYRING_SERVICE", "shopee_affiliate_auto_content")
 
 
+@lru_cache(maxsize=4)
+def _fernet_for(cls, key: str):
+    return cls(key.encode())
+
+
 def _get_fernet():
     key = os.getenv("FERNET_KEY")
     if not key:
         raise RuntimeError("FERNET_KEY not set in env. Set it to use encrypted token store.")
     if Fernet is None:
         raise RuntimeError("cryptography package not available. Install cryptography to use token encryption.")
-    return Fernet(key.encode())
+    # building a Fernet derives keys; reuse one instance per key
+    return _fernet_for(Fernet, key)
 
 
 def _use_keyring() -> bool:
     return os.getenv("USE_OS_KEYRING", "false").lower() in ("1", "true", "yes") and keyring is not None
 
 
+def expires_at(data: dict, issued_at: Optional[float] = None) -> Optional[float]:
+    """Absolute expiry (epoch seconds) of a token payload, or None if unknown.
+
+    Uses `expires_at` when present, else `issued_at + expires_in` (callers pass
+    the store file's mtime for payloads saved before expires_at was stamped).
+    """
+    if data.get("expires_at"):
+        return float(data["expires_at"])
+    if data.get("expires_in") and issued_at is not None:
+        return issued_at + float(data["expires_in"])
+    return None
+
+
 def save_tokens(data: dict, path: Optional[str] = None):
+    # stamp absolute expiry so readers don't depend on when the file was written
+    if data.get("expires_in") and not data.get("expires_at"):
+        data = dict(data, expires_at=time.time() + float(data["expires_in"]))
     if _use_keyring():
         # store JSON blob in OS keyring (string)
         raw = json.dumps(data)
@@ -67,3 +98,111 @@ def load_tokens(path: Optional[str] = None) -> dict:
         blob = fh.read()
     data = f.decrypt(blob)
     return json.loads(data.decode("utf-8"))
+
+
+class AccountTokenStore:
+    """Per-account encrypted tokens in SQLite: one row per (platform, account_id).
+
+    Rows hold the Fernet-encrypted JSON payload plus `expires_at` and
+    `updated_at` in the clear; `expires_at` is indexed for `expiring()`.
+    Each thread uses its own connection; `update()` is a read-modify-write
+    inside one IMMEDIATE transaction, so concurrent refreshes cannot lose writes.
+    """
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or DB_PATH
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute("""
+            CREATE TABLE IF NOT EXISTS tokens (
+                platform TEXT NOT NULL,
+                account_id TEXT NOT NULL,
+                token BLOB NOT NULL,
+                expires_at REAL,
+                updated_at REAL NOT NULL,
+                PRIMARY KEY (platform, account_id)
+            )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_tokens_expires_at ON tokens (expires_at)")
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _encode(data: dict) -> Tuple[bytes, Optional[float]]:
+        if data.get("expires_in") and not data.get("expires_at"):
+            data = dict(data, expires_at=time.time() + float(data["expires_in"]))
+        return _get_fernet().encrypt(json.dumps(data).encode("utf-8")), expires_at(data)
+
+    @staticmethod
+    def _decode(blob: bytes) -> dict:
+        return json.loads(_get_fernet().decrypt(bytes(blob)).decode("utf-8"))
+
+    def save(self, platform: str, account_id: str, data: dict):
+        blob, exp = self._encode(data)
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT INTO tokens (platform, account_id, token, expires_at, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (platform, account_id) DO UPDATE SET token = excluded.token, "
+                "expires_at = excluded.expires_at, updated_at = excluded.updated_at",
+                (platform, str(account_id), blob, exp, time.time()),
+            )
+
+    def load(self, platform: str, account_id: str) -> dict:
+        row = self._conn().execute("SELECT token FROM tokens WHERE platform = ? AND account_id = ?",
+                                   (platform, str(account_id))).fetchone()
+        return self._decode(row[0]) if row else {}
+
+    def version(self, platform: str, account_id: str) -> Optional[float]:
+        """`updated_at` of a row (None if absent); cheap change check without decrypting."""
+        row = self._conn().execute("SELECT updated_at FROM tokens WHERE platform = ? AND account_id = ?",
+                                   (platform, str(account_id))).fetchone()
+        return row[0] if row else None
+
+    def update(self, platform: str, account_id: str, fn: Callable[[dict], dict]) -> dict:
+        """Atomically replace a row's payload with `fn(current)`; returns the new payload."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT token FROM tokens WHERE platform = ? AND account_id = ?",
+                               (platform, str(account_id))).fetchone()
+            new = fn(self._decode(row[0]) if row else {})
+            blob, exp = self._encode(new)
+            conn.execute(
+                "INSERT OR REPLACE INTO tokens (platform, account_id, token, expires_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (platform, str(account_id), blob, exp, time.time()),
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return new
+
+    def delete(self, platform: str, account_id: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM tokens WHERE platform = ? AND account_id = ?", (platform, str(account_id)))
+
+    def accounts(self, platform: str) -> List[str]:
+        rows = self._conn().execute("SELECT account_id FROM tokens WHERE platform = ? ORDER BY account_id", (platform,))
+        return [r[0] for r in rows]
+
+    def expiring(self, within: float, platform: Optional[str] = None, now: Optional[float] = None) -> List[Tuple[str, str, float]]:
+        """(platform, account_id, expires_at) of tokens expiring within `within` seconds, soonest first."""
+        deadline = (time.time() if now is None else now) + within
+        sql = "SELECT platform, account_id, expires_at FROM tokens WHERE expires_at IS NOT NULL AND expires_at <= ?"
+        params = [deadline]
+        if platform:
+            sql += " AND platform = ?"
+            params.append(platform)
+        return [tuple(r) for r in self._conn().execute(sql + " ORDER BY expires_at", params)]
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
@@ -0,0 +1,345 @@
+"""Lightweight per-item tracing: nested spans written as JSONL.
+
+Each item gets its own trace (`item(item_id)`); the id is derived from the
+process run id and the item id, so the generator pass and the runner pass of
+the same item land in one trace. Spans nest through a contextvar, which
+`asyncio.to_thread` copies automatically; thread pools go through `wrap()` (or
+submit via a copied context) so spans opened on workers keep their parent.
+
+Spans are appended to OUTPUT_DIR/traces/YYYY/MM/DD/spans-<pid>.jsonl (or
+`TRACE_DIR`), one JSON object per line, and flushed every
+`TRACE_FLUSH_SPANS` spans, `TRACE_FLUSH_INTERVAL` seconds, on `flush()` and
+at exit:
+
+    {"trace", "span", "parent", "name", "start", "end", "dur", "status", "attrs", "thread"}
+
+Set `TRACING=0` to turn spans into no-ops. Hooks (`add_hook`, used by
+`profiling`) see every span start and end on the span's own thread, and keep
+spans on while registered.
+
+CLI:
+  python -m src.tracing summary [--dir DIR] [--hours 24] [--slowest 5]
+    p50/p95/p99 per span name, then the critical path of the slowest items.
+"""
+import os
+import sys
+import math
+import json
+import time
+import uuid
+import atexit
+import logging
+import argparse
+import threading
+import contextvars
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from .config import Config
+from .retention import dated_dir
+
+logger = logging.getLogger(__name__)
+
+RUN_ID = os.getenv("TRACE_RUN_ID") or uuid.uuid4().hex[:12]
+
+_current: contextvars.ContextVar = contextvars.ContextVar("trace_span", default=None)
+_hooks = []
+
+
+def enabled() -> bool:
+    return bool(_hooks) or os.getenv("TRACING", "1") != "0"
+
+
+def add_hook(hook):
+    """Register an object with span_started(span) / span_ended(span) methods."""
+    _hooks.append(hook)
+
+
+def remove_hook(hook):
+    if hook in _hooks:
+        _hooks.remove(hook)
+
+
+def trace_dir() -> str:
+    return os.getenv("TRACE_DIR") or os.path.join(Config.OUTPUT_DIR, "traces")
+
+
+class Span:
+    __slots__ = ("trace", "span", "parent", "name", "start", "end", "attrs", "status", "_t0")
+
+    def __init__(self, name: str, trace: str, parent: Optional[str], attrs: dict):
+        self.trace = trace
+        self.span = uuid.uuid4().hex[:16]
+        self.parent = parent
+        self.name = name
+        self.attrs = attrs
+        self.status = "ok"
+        self.start = time.time()
+        self.end = None
+        self._t0 = time.perf_counter()
+
+    def set(self, **attrs):
+        self.attrs.update(attrs)
+
+    def record(self) -> dict:
+        return {
+            "trace": self.trace, "span": self.span, "parent": self.parent, "name": self.name,
+            "start": self.start, "end": self.end, "dur": self.end - self.start, "status": self.status,
+            "attrs": self.attrs, "thread": threading.current_thread().name,
+        }
+
+
+class _NoopSpan:
+    def set(self, **attrs):
+        pass
+
+
+_NOOP = _NoopSpan()
+
+
+class _Writer:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._key = None  # (trace dir, UTC day, pid) of the open file
+        self._fh = None
+        self._pending = 0
+        self._flushed_at = time.monotonic()
+        self.batch = int(os.getenv("TRACE_FLUSH_SPANS", "256"))
+        self.interval = float(os.getenv("TRACE_FLUSH_INTERVAL", "1"))
+
+    def write(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        key = (trace_dir(), int(record["start"] // 86400), os.getpid())
+        with self._lock:
+            if key != self._key:
+                # new day (or dir/process): only now touch the filesystem for the dated dir
+                self._close()
+                path = os.path.join(dated_dir(key[0], record["start"]), f"spans-{key[2]}.jsonl")
+                self._fh = open(path, "a", encoding="utf-8")
+                self._key = key
+            self._fh.write(line)
+            self._pending += 1
+            now = time.monotonic()
+            if self._pending >= self.batch or now - self._flushed_at >= self.interval:
+                self._flush(now)
+
+    def flush(self):
+        with self._lock:
+            if self._fh is not None:
+                self._flush(time.monotonic())
+
+    def close(self):
+        with self._lock:
+            self._close()
+
+    def _flush(self, now: float):
+        self._fh.flush()
+        self._pending = 0
+        self._flushed_at = now
+
+    def _close(self):
+        if self._fh is not None:
+            self._fh.close()
+        self._fh, self._key, self._pending = None, None, 0
+
+
+_writer = _Writer()
+atexit.register(_writer.close)
+
+
+def flush():
+    """Write out buffered spans (they are also flushed periodically and at exit)."""
+    _writer.flush()
+
+
+def _notify(event: str, s: Span):
+    for hook in list(_hooks):
+        try:
+            getattr(hook, event)(s)
+        except Exception:
+            logger.exception("Tracing hook %r failed on %s", hook, event)
+
+
+@contextmanager
+def _open(name: str, trace: str, parent: Optional[str], attrs: dict):
+    s = Span(name, trace, parent, attrs)
+    token = _current.set(s)
+    _notify("span_started", s)
+    try:
+        yield s
+    except BaseException as e:
+        s.status = "error"
+        s.attrs["error"] = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current.reset(token)
+        s.end = s.start + (time.perf_counter() - s._t0)
+        _notify("span_ended", s)
+        try:
+            _writer.write(s.record())
+        except Exception:
+            logger.exception("Failed to write span %s", name)
+
+
+@contextmanager
+def span(name: str, **attrs):
+    """Child span of the current one (a new trace if there is none)."""
+    if not enabled():
+        yield _NOOP
+        return
+    parent = _current.get()
+    if parent is None:
+        cm = _open(name, uuid.uuid4().hex[:16], None, attrs)
+    else:
+        cm = _open(name, parent.trace, parent.span, attrs)
+    with cm as s:
+        yield s
+
+
+@contextmanager
+def item(item_id, **attrs):
+    """Root span of an item's trace; the same item id maps to the same trace in this run."""
+    if not enabled():
+        yield _NOOP
+        return
+    with _open("item", f"{RUN_ID}-{item_id}", None, dict(attrs, item_id=str(item_id))) as s:
+        yield s
+
+
+def traced(name: str):
+    """Decorator: run the function inside a span called `name`."""
+    def deco(fn):
+        @wraps(fn)
+        def f(*args, **kwargs):
+            with span(name):
+                return fn(*args, **kwargs)
+        return f
+    return deco
+
+
+def wrap(fn):
+    """Bind `fn` to the caller's trace context, for submitting to a thread pool."""
+    ctx = contextvars.copy_context()
+
+    @wraps(fn)
+    def f(*args, **kwargs):
+        # a copy per call: one context can't be entered by two threads at once
+        return ctx.copy().run(fn, *args, **kwargs)
+    return f
+
+
+# -- summary CLI --
+
+def load_spans(directory: Optional[str] = None, since: Optional[float] = None) -> List[dict]:
+    flush()  # this process's own buffered spans
+    spans = []
+    for path in sorted(Path(directory or trace_dir()).glob("**/*.jsonl")):
+        with open(path, "r", encoding="utf-8") as fh:
+            for line in fh:
+                try:
+                    rec = json.loads(line)
+                except ValueError:
+                    continue  # torn last line of a live file
+                if since is None or rec.get("start", 0) >= since:
+                    spans.append(rec)
+    return spans
+
+
+def percentile(sorted_values: List[float], p: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    k = max(0, min(len(sorted_values) - 1, math.ceil(p / 100.0 * len(sorted_values)) - 1))
+    return sorted_values[k]
+
+
+def stage_stats(spans: List[dict]) -> Dict[str, dict]:
+    by_name: Dict[str, List[float]] = {}
+    for s in spans:
+        by_name.setdefault(s["name"], []).append(s["dur"])
+    out = {}
+    for name, durs in by_name.items():
+        durs.sort()
+        out[name] = {"count": len(durs), "total": sum(durs), "p50": percentile(durs, 50),
+                     "p95": percentile(durs, 95), "p99": percentile(durs, 99)}
+    return out
+
+
+def critical_path(spans: List[dict]) -> List[dict]:
+    """Spans of one trace that the trace's end time waited on, in start order.
+
+    Starting from the latest end, repeatedly take the child that finished last
+    before the current point and continue from its start; each taken span is
+    expanded the same way. Several roots (generator and runner passes) are
+    treated as children of one virtual root.
+    """
+    children: Dict[Optional[str], List[dict]] = {}
+    ids = {s["span"] for s in spans}
+    for s in spans:
+        parent = s.get("parent") if s.get("parent") in ids else None
+        children.setdefault(parent, []).append(s)
+
+    path = []
+
+    def walk(parent_id, until):
+        kids = sorted(children.get(parent_id, []), key=lambda s: s["end"], reverse=True)
+        t = until
+        chain = []
+        for s in kids:
+            if s["end"] <= t + 1e-9:
+                chain.append(s)
+                t = s["start"]
+        for s in reversed(chain):
+            path.append(s)
+            # children may outlive their parent (uploads finishing after the item span)
+            walk(s["span"], float("inf"))
+
+    walk(None, max(s["end"] for s in spans))
+    return path
+
+
+def summarize(spans: List[dict], slowest: int = 5) -> str:
+    lines = []
+    stats = stage_stats(spans)
+    w = max([len(n) for n in stats] + [5]) + 2
+    lines.append(f"{'stage':<{w}}{'count':>8}{'p50':>10}{'p95':>10}{'p99':>10}{'total':>11}")
+    for name, st in sorted(stats.items(), key=lambda kv: -kv[1]["total"]):
+        lines.append(f"{name:<{w}}{st['count']:>8}{st['p50']:>10.3f}{st['p95']:>10.3f}{st['p99']:>10.3f}{st['total']:>11.2f}")
+
+    traces: Dict[str, List[dict]] = {}
+    for s in spans:
+        traces.setdefault(s["trace"], []).append(s)
+    ranked = sorted(traces.values(), key=lambda ss: max(s["end"] for s in ss) - min(s["start"] for s in ss), reverse=True)
+    for ss in ranked[:slowest]:
+        t0 = min(s["start"] for s in ss)
+        item_id = next((s["attrs"].get("item_id") for s in ss if s["name"] == "item"), None)
+        lines.append("")
+        lines.append(f"trace {ss[0]['trace']} item={item_id} total={max(s['end'] for s in ss) - t0:.3f}s")
+        depth = {}
+        for s in critical_path(ss):
+            depth[s["span"]] = depth.get(s.get("parent"), -1) + 1
+            lines.append(f"  {'  ' * depth[s['span']]}{s['name']:<{w}} +{s['start'] - t0:8.3f}s {s['dur']:8.3f}s {s['status']}")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python -m src.tracing")
+    sub = p.add_subparsers(dest="command", required=True)
+    s = sub.add_parser("summary", help="per-stage latency percentiles and critical paths of the slowest items")
+    s.add_argument("--dir", default=None, help="trace directory (default: OUTPUT_DIR/traces)")
+    s.add_argument("--hours", type=float, default=24)
+    s.add_argument("--slowest", type=int, default=5)
+    args = p.parse_args(argv)
+
+    spans = load_spans(args.dir, since=time.time() - args.hours * 3600)
+    if not spans:
+        print("no spans found")
+        return 1
+    print(summarize(spans, slowest=args.slowest))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
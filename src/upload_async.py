@@ -0,0 +1,173 @@
+"""Asyncio upload engine: the init -> parts -> commit protocol of
+`poster_tiktok_api.upload_video_chunked` on a single event loop.
+
+Parts are streamed from the file in small blocks read in a worker thread, so
+an in-flight part holds one block rather than a whole part buffer, and
+hundreds of parts across many videos can be in flight at once. Concurrency is
+bounded per session (`TIKTOK_ASYNC_PER_SESSION`), per upload host
+(`TIKTOK_ASYNC_PER_HOST`) and overall by the client's connection pool
+(`TIKTOK_ASYNC_MAX_CONNECTIONS`).
+
+Session reuse, hashing, the journal and the publish summary are shared with
+`ChunkedUpload`; its blocking steps run via `asyncio.to_thread`. An uploader
+belongs to the event loop it is first used on.
+
+    async with AsyncUploader() as up:
+        results = await asyncio.gather(*(up.upload(t, p, token) for t, p in videos))
+"""
+import os
+import time
+import uuid
+import asyncio
+import logging
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+
+from . import poster_tiktok_api
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+
+class AsyncUploader:
+    def __init__(self, client: Optional[httpx.AsyncClient] = None, per_session: Optional[int] = None,
+                 per_host: Optional[int] = None, max_connections: Optional[int] = None,
+                 read_block: Optional[int] = None):
+        self.per_session = per_session or int(os.getenv("TIKTOK_ASYNC_PER_SESSION", "8"))
+        self.per_host = per_host or int(os.getenv("TIKTOK_ASYNC_PER_HOST", "64"))
+        self.read_block = read_block or int(os.getenv("TIKTOK_ASYNC_READ_BLOCK", str(256 * 1024)))
+        max_connections = max_connections or int(os.getenv("TIKTOK_ASYNC_MAX_CONNECTIONS", "256"))
+        self.timeouts = poster_tiktok_api.TikTokTransport.timeouts_from_env()
+        self._own_client = client is None
+        self.client = client or httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections))
+        self._hosts = {}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
+
+    async def aclose(self):
+        if self._own_client:
+            await self.client.aclose()
+
+    def _timeout(self, op: str) -> httpx.Timeout:
+        connect, read = self.timeouts.get(op, (5, 60))
+        return httpx.Timeout(read, connect=connect)
+
+    def _host_limit(self, url: str) -> asyncio.Semaphore:
+        host = urlsplit(url).netloc
+        sem = self._hosts.get(host)
+        if sem is None:
+            sem = self._hosts[host] = asyncio.Semaphore(self.per_host)
+        return sem
+
+    async def upload(self, title: str, video_path: str, access_token: str, account: Optional[str] = None,
+                     item_id: Optional[str] = None) -> dict:
+        """Upload one video; returns the commit response."""
+        upload = poster_tiktok_api.ChunkedUpload(title, video_path, access_token, account=account, item_id=item_id)
+        try:
+            file_size = await asyncio.to_thread(upload.open)
+            session = await asyncio.to_thread(upload.find_session, file_size)
+            if session is None:
+                session = await self._initiate(access_token, file_size, upload.part_size_hint(file_size))
+            await asyncio.to_thread(upload.begin, session)
+
+            limit = asyncio.Semaphore(self.per_session)
+            tasks = [asyncio.create_task(self._send_part(upload, part, limit)) for part in upload.pending_parts]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for t in tasks:
+                    t.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+            result = await self._commit(access_token, upload.upload_id)
+            await asyncio.to_thread(upload.complete)
+            return result
+        except Exception as e:
+            await asyncio.to_thread(upload.mark_failed, e)
+            raise
+        finally:
+            await asyncio.to_thread(upload.close)
+
+    async def _initiate(self, access_token: str, file_size: int, part_size: Optional[int] = None) -> dict:
+        url = os.getenv("TIKTOK_INIT_UPLOAD_URL")
+        if not url:
+            raise RuntimeError("TIKTOK_INIT_UPLOAD_URL not configured")
+        body = {"file_size": file_size}
+        if part_size:
+            body["part_size"] = part_size
+        resp = await self.client.post(url, json=body, headers={"Authorization": f"Bearer {access_token}"},
+                                      timeout=self._timeout("init"))
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _commit(self, access_token: str, upload_id: str) -> dict:
+        url = os.getenv("TIKTOK_COMMIT_UPLOAD_URL")
+        if not url:
+            raise RuntimeError("TIKTOK_COMMIT_UPLOAD_URL not configured")
+        resp = await self.client.post(url, json={"upload_id": upload_id}, headers={"Authorization": f"Bearer {access_token}"},
+                                      timeout=self._timeout("commit"))
+        resp.raise_for_status()
+        j = resp.json()
+        await asyncio.to_thread(poster_tiktok_api.record_commit, upload_id, j)
+        return j
+
+    async def _send_part(self, upload, part, limit: asyncio.Semaphore) -> dict:
+        part_number, offset, length = part
+        url = upload.part_url(part_number)
+        checksum = upload.md5s[str(part_number)]
+        max_retries = int(os.getenv("TIKTOK_PART_MAX_RETRIES", "4"))
+        attempt = 0
+        while True:
+            attempt += 1
+            # slots are held only while a request is on the wire, not during backoff
+            async with limit, self._host_limit(url):
+                t0 = time.time()
+                try:
+                    with tracing.span("tiktok.part", part=part_number, attempt=attempt):
+                        resp = await self._post_part(url, upload, part, checksum)
+                    return upload.record_ack(part_number, checksum, resp, attempt, t0, length)
+                except Exception as e:
+                    error = e
+            wait = upload.record_retry(part_number, attempt, t0, error)
+            if attempt >= max_retries:
+                raise error
+            await asyncio.sleep(wait)
+
+    async def _post_part(self, url: str, upload, part, checksum: str) -> dict:
+        part_number, offset, length = part
+        boundary = uuid.uuid4().hex
+        head, tail = poster_tiktok_api.multipart_frame(boundary, "file", f"part-{part_number}")
+        headers = {
+            "Authorization": f"Bearer {upload.access_token}",
+            "X-Chunk-MD5": checksum,
+            "Content-Type": f"multipart/form-data; boundary={boundary}",
+            "Content-Length": str(len(head) + length + len(tail)),
+        }
+        body = self._stream(upload.video_path, offset, length, head, tail)
+        resp = await self.client.post(url, content=body, headers=headers, timeout=self._timeout("part"))
+        resp.raise_for_status()
+        return resp.json()
+
+    async def _stream(self, path: str, offset: int, length: int, head: bytes, tail: bytes):
+        yield head
+        fh = await asyncio.to_thread(open, path, "rb")
+        try:
+            await asyncio.to_thread(fh.seek, offset)
+            remaining = length
+            while remaining > 0:
+                block = await asyncio.to_thread(fh.read, min(self.read_block, remaining))
+                if not block:
+                    raise IOError(f"{path} shrank while uploading (offset {offset + length - remaining})")
+                remaining -= len(block)
+                yield block
+        finally:
+            fh.close()
+        yield tail
@@ -0,0 +1,59 @@
+"""Hashing stage for chunked uploads.
+
+Every part is read exactly once: part MD5s are computed in parallel over
+zero-copy slices of the mapped file (hashlib releases the GIL on large
+buffers, so threads hash on separate cores). The whole-file digest is then
+derived from the ordered part digests (sha256 over part size + part MD5s,
+like an S3 multipart ETag), so it needs no second pass over the data.
+
+`manifest` bundles both with a stat fingerprint so a resumed upload whose
+file is unchanged can trust the recorded digests without re-reading anything.
+"""
+import os
+import hashlib
+import concurrent.futures
+from typing import Dict, List, Optional, Tuple
+
+from . import tracing
+
+
+def hash_parts(buf, parts: List[Tuple[int, int, int]], workers: Optional[int] = None) -> Dict[str, str]:
+    """Return {str(part_number): md5 hex} for (part_number, offset, length) slices of `buf`."""
+    view = memoryview(buf)
+    workers = workers or int(os.getenv("TIKTOK_HASH_WORKERS", str(min(8, os.cpu_count() or 1))))
+
+    @tracing.traced("tiktok.hash_part")
+    def md5_part(part):
+        part_number, offset, length = part
+        with view[offset:offset + length] as chunk:
+            return str(part_number), hashlib.md5(chunk).hexdigest()
+
+    try:
+        if workers <= 1 or len(parts) <= 1:
+            return dict(md5_part(p) for p in parts)
+        with concurrent.futures.ThreadPoolExecutor(max_workers=workers) as exe:
+            return dict(exe.map(tracing.wrap(md5_part), parts))
+    finally:
+        view.release()
+
+
+def file_digest(part_size: int, md5s: Dict[str, str]) -> str:
+    """Whole-file digest derived from the ordered part MD5s."""
+    h = hashlib.sha256(f"{part_size}:".encode("ascii"))
+    for key in sorted(md5s, key=int):
+        h.update(bytes.fromhex(md5s[key]))
+    return h.hexdigest()
+
+
+def fingerprint(path: str) -> List[int]:
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+def manifest(path: str, part_size: int, md5s: Dict[str, str]) -> dict:
+    return {
+        "part_size": part_size,
+        "fingerprint": fingerprint(path),
+        "file_digest": file_digest(part_size, md5s),
+        "md5s": md5s,
+    }
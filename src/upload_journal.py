@@ -0,0 +1,175 @@
+"""Append-only journal of chunked-upload events (one JSON line per event).
+
+Upload workers never touch the file: `append` only enqueues, and a single
+writer thread drains the queue in batches, writing lines and fsync-ing every
+`fsync_every` events or `fsync_interval` seconds, whichever comes first. This
+replaces rewriting the whole state/metrics JSON after every part.
+
+Events:
+  {"ev": "part",  "part": n, "md5": ..., "resp": ..., "attempt": a, "duration": s, "ts": t}
+  {"ev": "retry", "part": n, "attempt": a, "duration": s, "error": "...", "ts": t}
+  {"ev": "commit", "upload_id": ..., "ts": t, ...}
+  {"ev": "manifest", "part_size": p, "fingerprint": [size, mtime_ns], "file_digest": ..., "md5s": {...}}
+
+`replay` rebuilds resume state and per-part metrics from a journal; after the
+upload commits, `compact` rewrites it as one line per part plus the commit.
+"""
+import os
+import json
+import time
+import hashlib
+import queue
+import logging
+import tempfile
+import threading
+from pathlib import Path
+from typing import Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+_CLOSE = object()
+
+
+def journal_dir() -> Path:
+    return Path(Config.OUTPUT_DIR) / "upload_journals"
+
+
+def journal_path(upload_id: str) -> Path:
+    """`upload_journals/<shard>/<upload_id>.jsonl`, sharded by id hash; flat legacy journals are still used."""
+    legacy = journal_dir() / f"{upload_id}.jsonl"
+    if legacy.exists():
+        return legacy
+    shard = hashlib.sha1(str(upload_id).encode("utf-8")).hexdigest()[:2]
+    return journal_dir() / shard / f"{upload_id}.jsonl"
+
+
+class UploadJournal:
+    def __init__(self, path, fsync_every: Optional[int] = None, fsync_interval: Optional[float] = None):
+        self.path = Path(path)
+        self.fsync_every = fsync_every or int(os.getenv("TIKTOK_JOURNAL_FSYNC_EVERY", "32"))
+        self.fsync_interval = fsync_interval or float(os.getenv("TIKTOK_JOURNAL_FSYNC_INTERVAL", "0.5"))
+        self._q = queue.SimpleQueue()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._thread = threading.Thread(target=self._run, name=f"upload-journal-{self.path.stem}", daemon=True)
+        self._thread.start()
+
+    def append(self, event: dict):
+        """Queue an event for the writer thread (never blocks on I/O)."""
+        event.setdefault("ts", time.time())
+        self._q.put(event)
+
+    def sync(self, timeout: Optional[float] = None):
+        """Block until everything appended so far is written and fsync-ed."""
+        done = threading.Event()
+        self._q.put(done)
+        done.wait(timeout)
+
+    def close(self):
+        self._q.put(_CLOSE)
+        self._thread.join()
+
+    def _run(self):
+        pending = 0
+        last_sync = time.monotonic()
+        closing = False
+        with open(self.path, "a", encoding="utf-8") as fh:
+            while not closing:
+                try:
+                    batch = [self._q.get(timeout=self.fsync_interval)]
+                except queue.Empty:
+                    batch = []
+                while True:
+                    try:
+                        batch.append(self._q.get_nowait())
+                    except queue.Empty:
+                        break
+
+                waiters = []
+                for ev in batch:
+                    if ev is _CLOSE:
+                        closing = True
+                    elif isinstance(ev, threading.Event):
+                        waiters.append(ev)
+                    else:
+                        try:
+                            fh.write(json.dumps(ev, ensure_ascii=False, default=str) + "\n")
+                            pending += 1
+                        except Exception:
+                            logger.exception("Failed to write journal event to %s", self.path)
+
+                due = closing or waiters or pending >= self.fsync_every or time.monotonic() - last_sync >= self.fsync_interval
+                if pending and due:
+                    try:
+                        fh.flush()
+                        os.fsync(fh.fileno())
+                    except OSError:
+                        logger.exception("Failed to fsync journal %s", self.path)
+                    pending = 0
+                    last_sync = time.monotonic()
+                for w in waiters:
+                    w.set()
+
+
+def replay(path) -> dict:
+    """Rebuild upload state from a (raw or compacted) journal.
+
+    Returns {"uploaded_parts": {part: {"md5", "resp"}}, "metrics": {part: [attempts]},
+    "commit": dict|None, "manifest": dict|None}. A torn last line (crash mid-write) is ignored.
+    """
+    state = {"uploaded_parts": {}, "metrics": {}, "commit": None, "manifest": None}
+    path = Path(path)
+    if not path.exists():
+        return state
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            try:
+                ev = json.loads(line)
+            except ValueError:
+                continue
+            kind = ev.get("ev")
+            if kind in ("commit", "manifest"):
+                state[kind] = ev
+                continue
+            if kind not in ("part", "retry"):
+                continue
+            part = str(ev.get("part"))
+            if "attempts" in ev:
+                state["metrics"].setdefault(part, []).extend(ev["attempts"])
+            else:
+                attempt = {"attempt": ev.get("attempt"), "duration": ev.get("duration"), "timestamp": int(ev.get("ts", 0))}
+                if kind == "retry":
+                    attempt["error"] = ev.get("error")
+                state["metrics"].setdefault(part, []).append(attempt)
+            if kind == "part":
+                state["uploaded_parts"][part] = {"md5": ev.get("md5"), "resp": ev.get("resp")}
+    return state
+
+
+def compact(path):
+    """Atomically rewrite a closed journal as the manifest, one line per part and the commit event."""
+    path = Path(path)
+    state = replay(path)
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=str(path.parent))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            if state["manifest"]:
+                fh.write(json.dumps(state["manifest"], ensure_ascii=False, default=str) + "\n")
+            for part in sorted(state["metrics"], key=lambda p: int(p) if p.isdigit() else p):
+                rec = {"ev": "part" if part in state["uploaded_parts"] else "retry", "part": int(part) if part.isdigit() else part}
+                rec.update(state["uploaded_parts"].get(part, {}))
+                rec["attempts"] = state["metrics"][part]
+                fh.write(json.dumps(rec, ensure_ascii=False, default=str) + "\n")
+            if state["commit"]:
+                fh.write(json.dumps(state["commit"], ensure_ascii=False, default=str) + "\n")
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+    return state
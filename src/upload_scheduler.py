@@ -0,0 +1,195 @@
+"""Multi-video upload scheduler over one shared worker pool.
+
+Jobs are `ChunkedUpload`s. Parts of all active sessions are interleaved on a
+single thread pool, highest priority first (e.g. the predictor score), with
+each session capped by its own adaptive controller. A pacer enforces a global
+bytes/sec budget across all parts, at most `max_sessions` sessions are open at
+once, and a video is committed as soon as its last part lands.
+
+    sched = UploadScheduler()
+    fut = sched.submit(caption, video_path, token, priority=score)
+    ...
+    fut.result()   # commit response
+    sched.shutdown()
+"""
+import os
+import time
+import heapq
+import logging
+import threading
+import itertools
+import concurrent.futures
+from collections import deque
+from typing import Optional
+
+from . import poster_tiktok_api
+from . import metrics
+from . import tracing
+
+logger = logging.getLogger(__name__)
+
+QUEUED = metrics.gauge("upload_scheduler_queued", "Videos waiting for an upload session")
+ACTIVE = metrics.gauge("upload_scheduler_active_sessions", "Upload sessions in progress")
+BUSY = metrics.gauge("upload_scheduler_busy_workers", "Upload workers running a step")
+
+
+class _Pacer:
+    """Global bytes/sec budget: each caller waits for its slot on a virtual clock."""
+
+    def __init__(self, bytes_per_sec: Optional[float]):
+        self.rate = bytes_per_sec or 0
+        self._next = time.monotonic()
+        self._lock = threading.Lock()
+
+    def consume(self, nbytes: int):
+        if not self.rate:
+            return
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next)
+            self._next = start + nbytes / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+class _Job:
+    def __init__(self, seq, priority, upload):
+        self.seq = seq
+        self.priority = priority
+        self.upload = upload
+        self.future = concurrent.futures.Future()
+        self.pending = deque()
+        self.inflight = 0
+        self.state = "queued"  # queued -> starting -> active -> committing -> done
+        self.error = None
+        # steps run on pool threads inside the submitter's trace
+        self.run = tracing.wrap(lambda fn, *args: fn(*args))
+
+
+class UploadScheduler:
+    def __init__(self, workers: Optional[int] = None, max_sessions: Optional[int] = None,
+                 bytes_per_sec: Optional[float] = None):
+        self.workers = workers or int(os.getenv("TIKTOK_SCHEDULER_WORKERS", "16"))
+        self.max_sessions = max_sessions or int(os.getenv("TIKTOK_MAX_SESSIONS", "4"))
+        rate = bytes_per_sec if bytes_per_sec is not None else float(os.getenv("TIKTOK_UPLOAD_BYTES_PER_SEC", "0"))
+        self._pacer = _Pacer(rate)
+        self._pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="upload")
+        # re-entrant: a done-callback fires inline if its future finished before registration
+        self._lock = threading.RLock()
+        self._queue = []  # heap of (-priority, seq, job)
+        self._active = []
+        self._busy = 0
+        self._seq = itertools.count()
+        self._closed = False
+
+    def submit(self, title: str, video_path: str, access_token: str, priority: float = 0.0,
+               account: Optional[str] = None, item_id: Optional[str] = None) -> concurrent.futures.Future:
+        """Queue a video for upload; the returned future resolves to the commit response."""
+        upload = poster_tiktok_api.ChunkedUpload(title, video_path, access_token, account=account, item_id=item_id)
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("scheduler is shut down")
+            job = _Job(next(self._seq), priority, upload)
+            heapq.heappush(self._queue, (-priority, job.seq, job))
+            self._pump()
+        return job.future
+
+    def queue_depth(self) -> int:
+        with self._lock:
+            return len(self._queue)
+
+    def shutdown(self, wait: bool = True):
+        with self._lock:
+            self._closed = True
+        if wait:
+            while True:
+                with self._lock:
+                    if not self._queue and not self._active:
+                        break
+                time.sleep(0.05)
+        self._pool.shutdown(wait=wait)
+
+    # -- scheduling (all called with self._lock held) --
+
+    def _pump(self):
+        # open new sessions while under the session limit
+        while self._queue and len(self._active) < self.max_sessions and self._busy < self.workers:
+            _, _, job = heapq.heappop(self._queue)
+            job.state = "starting"
+            self._active.append(job)
+            self._run(job, self._start_job)
+        # hand free workers to parts, highest-priority session first
+        for job in sorted(self._active, key=lambda j: (-j.priority, j.seq)):
+            while (job.state == "active" and job.pending and self._busy < self.workers
+                   and job.inflight < job.upload.controller.limit):
+                part = job.pending.popleft()
+                job.inflight += 1
+                self._run(job, self._send_part, part)
+            if (job.state == "active" and job.error is None and not job.pending and not job.inflight
+                    and self._busy < self.workers):
+                job.state = "committing"
+                self._run(job, self._finish_job)
+            if self._busy >= self.workers:
+                break
+        QUEUED.set(len(self._queue))
+        ACTIVE.set(len(self._active))
+        BUSY.set(self._busy)
+
+    def _run(self, job, fn, *args):
+        self._busy += 1
+        fut = self._pool.submit(job.run, fn, job, *args)
+        fut.add_done_callback(lambda f, job=job: self._done(job, f))
+
+    def _done(self, job, fut):
+        with self._lock:
+            self._busy -= 1
+            exc = fut.exception()
+            if exc is not None and job.error is None:
+                job.error = exc
+                job.pending.clear()
+            if job.error is not None and job.state != "done" and not job.inflight:
+                self._complete(job, error=job.error)
+            self._pump()
+
+    def _complete(self, job, result=None, error=None):
+        if job.state == "done":
+            return
+        job.state = "done"
+        if job in self._active:
+            self._active.remove(job)
+        job.upload.close()
+        if error is not None:
+            job.upload.mark_failed(error)
+            job.future.set_exception(error)
+        else:
+            job.future.set_result(result)
+
+    # -- work items (run on pool threads) --
+
+    def _start_job(self, job):
+        job.upload.start()
+        with self._lock:
+            job.pending.extend(job.upload.pending_parts)
+            job.state = "active"
+
+    def _send_part(self, job, part):
+        error = None
+        try:
+            self._pacer.consume(part[2])
+            job.upload.upload_part(part)
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            # record the failure in the same step that frees the slot, so no
+            # _pump can see the job drained and error-free before _done runs
+            with self._lock:
+                if error is not None and job.error is None:
+                    job.error = error
+                    job.pending.clear()
+                job.inflight -= 1
+
+    def _finish_job(self, job):
+        result = job.upload.finish()
+        with self._lock:
+            self._complete(job, result=result)
@@ -0,0 +1,137 @@
+"""Local index of open upload sessions, keyed by content rather than upload_id.
+
+Every `initiate_upload_session` call returns a fresh upload_id, so resume state
+keyed by upload_id alone is never found after a restart. The index maps
+(account, file size, content digest) -> (upload_id, part_size, url template,
+expiry); acknowledged parts live in that upload's journal. A restarted upload
+finds its live session here and only sends what is missing. Entries are
+dropped on commit and ignored (then pruned) once expired.
+
+The content digest is `upload_hashing.file_digest`, which depends on the part
+size, so lookups return candidates by (account, size) and the caller confirms
+one by hashing with that candidate's part size (or by matching its stat
+fingerprint, which needs no read at all).
+
+The index is a SQLite table (`UPLOAD_SESSIONS_DB`, default
+OUTPUT_DIR/upload_sessions.db) because the runner, the job workers and the
+service are separate processes writing it concurrently; each change is a
+single-row statement, so no writer can drop another's entry.
+"""
+import os
+import json
+import time
+import logging
+import sqlite3
+import threading
+from typing import List, Optional
+
+from .config import Config
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TTL = 3600
+
+_COLUMNS = ("account", "size", "file_digest", "fingerprint", "upload_id", "part_size", "upload_url_template",
+            "created_at", "expires_at")
+
+
+def default_account() -> str:
+    return os.getenv("TIKTOK_ACCOUNT_ID", "default")
+
+
+def session_ttl() -> int:
+    return int(os.getenv("TIKTOK_UPLOAD_SESSION_TTL", str(DEFAULT_TTL)))
+
+
+def session_key(account: str, size: int, digest: str) -> str:
+    return f"{account}:{size}:{digest}"
+
+
+def sessions_db_path() -> str:
+    return os.getenv("UPLOAD_SESSIONS_DB") or os.path.join(Config.OUTPUT_DIR, "upload_sessions.db")
+
+
+def init_db(conn: sqlite3.Connection):
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS upload_sessions (
+        key TEXT PRIMARY KEY,
+        account TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        file_digest TEXT,
+        fingerprint TEXT,
+        upload_id TEXT NOT NULL,
+        part_size INTEGER NOT NULL,
+        upload_url_template TEXT,
+        created_at REAL NOT NULL,
+        expires_at REAL NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_upload_sessions_lookup ON upload_sessions (account, size, expires_at)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_upload_sessions_upload ON upload_sessions (upload_id)")
+    conn.commit()
+
+
+class SessionIndex:
+    def __init__(self, path=None):
+        self.path = str(path or sessions_db_path())
+        self._local = threading.local()
+        init_db(self._conn())
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, key: str, entry: dict):
+        conn.execute(
+            f"INSERT OR REPLACE INTO upload_sessions (key, {', '.join(_COLUMNS)}) "
+            f"VALUES (?, {', '.join('?' for _ in _COLUMNS)})",
+            (key, *(entry.get(c) for c in _COLUMNS)),
+        )
+
+    def candidates(self, account: str, size: int, now: Optional[float] = None) -> List[dict]:
+        """Live sessions for this account and file size, newest first."""
+        now = time.time() if now is None else now
+        rows = self._conn().execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM upload_sessions WHERE account = ? AND size = ? AND expires_at > ? "
+            "ORDER BY created_at DESC",
+            (account, size, now),
+        ).fetchall()
+        out = []
+        for row in rows:
+            entry = dict(zip(_COLUMNS, row))
+            entry["fingerprint"] = json.loads(entry["fingerprint"]) if entry["fingerprint"] else None
+            out.append(entry)
+        return out
+
+    def record(self, account: str, size: int, digest: str, session: dict, fingerprint=None,
+               now: Optional[float] = None) -> dict:
+        """Remember a session (dict with upload_id, part_size, upload_url_template, optional expires_at)."""
+        now = time.time() if now is None else now
+        entry = {
+            "account": account,
+            "size": size,
+            "file_digest": digest,
+            "fingerprint": fingerprint,
+            "upload_id": session["upload_id"],
+            "part_size": session["part_size"],
+            "upload_url_template": session.get("upload_url_template"),
+            "created_at": now,
+            "expires_at": float(session.get("expires_at") or now + session_ttl()),
+        }
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM upload_sessions WHERE expires_at <= ?", (now,))
+            self._insert(conn, session_key(account, size, digest),
+                         dict(entry, fingerprint=json.dumps(list(fingerprint)) if fingerprint is not None else None))
+        return entry
+
+    def forget(self, upload_id: str):
+        conn = self._conn()
+        with conn:
+            conn.execute("DELETE FROM upload_sessions WHERE upload_id = ?", (str(upload_id),))
@@ -0,0 +1,102 @@
+"""Adaptive concurrency and part sizing for chunked uploads.
+
+`AdaptiveConcurrency` is an AIMD controller for the number of in-flight
+parts. Each "round" lasts as many completions as the current limit. A round
+with errors halves the limit. A round whose aggregate throughput drops well
+below the previous round's cuts the limit by a quarter. Any other round adds
+one. The limit always stays within [min_limit, max_limit].
+"""
+import math
+import os
+import threading
+import time
+from typing import Optional
+
+MB = 1024 * 1024
+
+
+def choose_part_size(file_size: int, max_workers: int) -> int:
+    """Pick a part size giving every worker a few parts, within provider bounds (env, bytes)."""
+    lo = int(os.getenv("TIKTOK_PART_SIZE_MIN", str(5 * MB)))
+    hi = int(os.getenv("TIKTOK_PART_SIZE_MAX", str(64 * MB)))
+    target_parts = max(1, max_workers * int(os.getenv("TIKTOK_PARTS_PER_WORKER", "4")))
+    size = math.ceil(file_size / target_parts / MB) * MB
+    return max(lo, min(hi, size))
+
+
+class AdaptiveConcurrency:
+    def __init__(self, min_limit: int = 1, max_limit: int = 8, initial: Optional[int] = None,
+                 drop_tolerance: float = 0.25):
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(self.min_limit, max_limit)
+        self.limit = max(self.min_limit, min(self.max_limit, initial or self.min_limit))
+        self.drop_tolerance = drop_tolerance
+        self._lock = threading.Lock()
+        self._start = time.monotonic()
+        self._round_start = self._start
+        self._round_bytes = 0
+        self._round_done = 0
+        self._round_errors = 0
+        self._prev_rate = None
+        self.bytes = 0
+        self.parts = 0
+        self.retries = 0
+        self.timeline = [[0.0, self.limit]]
+
+    @classmethod
+    def from_env(cls) -> "AdaptiveConcurrency":
+        workers = int(os.getenv("TIKTOK_UPLOAD_WORKERS", "4"))
+        return cls(
+            min_limit=int(os.getenv("TIKTOK_UPLOAD_MIN_WORKERS", "1")),
+            max_limit=int(os.getenv("TIKTOK_UPLOAD_MAX_WORKERS", str(max(workers, 1) * 2))),
+            initial=workers,
+        )
+
+    def record_success(self, nbytes: int):
+        with self._lock:
+            self.bytes += nbytes
+            self.parts += 1
+            self._round_bytes += nbytes
+            self._round_done += 1
+            self._maybe_adjust()
+
+    def record_failure(self):
+        with self._lock:
+            self.retries += 1
+            self._round_errors += 1
+            self._round_done += 1
+            self._maybe_adjust()
+
+    def _maybe_adjust(self):
+        if self._round_done < self.limit:
+            return
+        now = time.monotonic()
+        rate = self._round_bytes / max(now - self._round_start, 1e-6)
+        if self._round_errors:
+            new = self.limit // 2
+        elif self._prev_rate is not None and rate < self._prev_rate * (1 - self.drop_tolerance):
+            new = int(self.limit * 0.75)
+        else:
+            new = self.limit + 1
+        new = max(self.min_limit, min(self.max_limit, new))
+        if new != self.limit:
+            self.limit = new
+            self.timeline.append([round(now - self._start, 3), new])
+        self._prev_rate = rate if not self._round_errors else self._prev_rate
+        self._round_start = now
+        self._round_bytes = 0
+        self._round_done = 0
+        self._round_errors = 0
+
+    def stats(self) -> dict:
+        with self._lock:
+            elapsed = max(time.monotonic() - self._start, 1e-6)
+            return {
+                "bytes": self.bytes,
+                "parts": self.parts,
+                "retries": self.retries,
+                "elapsed_s": round(elapsed, 3),
+                "throughput_mbps": round(self.bytes / MB / elapsed, 3),
+                "final_concurrency": self.limit,
+                "concurrency_timeline": list(self.timeline),
+            }
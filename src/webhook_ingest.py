@@ -0,0 +1,221 @@
+"""Webhook ingestion: acknowledge immediately, persist in batches.
+
+The HTTP handler only parses the body and `offer`s it to a bounded
+`asyncio.Queue`; when the queue is full it is rejected (the handler answers
+503 so the provider retries) instead of growing without bound. A writer task
+drains the queue in batches and appends them, in one transaction per batch,
+to the `webhook_events` table of the publish database on a dedicated thread,
+so the event loop never blocks on disk. `stop()` drains and flushes everything
+still queued.
+
+A batch that cannot be written is retried with backoff up to
+`WEBHOOK_WRITE_RETRIES` times (once while stopping), then appended to an
+append-only JSONL fallback file (`WEBHOOK_FALLBACK_PATH`, default
+`webhook_failed.jsonl` next to the database) so the writer keeps moving and
+`stop()` always returns.
+
+Events are indexed by upload_id (TikTok's publish_id) and video_id. The same
+transaction updates the matching `publish_status` row.
+"""
+import os
+import json
+import time
+import asyncio
+import logging
+import sqlite3
+import concurrent.futures
+from typing import List, Optional, Tuple
+
+from . import publish_status
+from . import metrics
+from .publish_status import publish_db_path
+
+logger = logging.getLogger(__name__)
+
+QUEUE_DEPTH = metrics.gauge("webhook_queue_depth", "Webhook events waiting for the batch writer")
+REJECTED = metrics.counter("webhook_rejected_total", "Webhook events refused because the queue was full")
+FALLBACK = metrics.counter("webhook_fallback_total", "Webhook events written to the fallback file after the database failed")
+
+
+def _first(d: dict, *names):
+    for n in names:
+        if d.get(n):
+            return str(d[n])
+    return None
+
+
+def extract_ids(payload) -> Tuple[Optional[str], Optional[str], Optional[str]]:
+    """(event, upload_id, video_id) from a webhook payload.
+
+    TikTok nests details in `content`, which may itself be a JSON string.
+    """
+    if not isinstance(payload, dict):
+        return None, None, None
+    content = payload.get("content")
+    if isinstance(content, str):
+        try:
+            content = json.loads(content)
+        except ValueError:
+            content = None
+    scopes = [payload] + ([content] if isinstance(content, dict) else [])
+    event = upload_id = video_id = None
+    for d in scopes:
+        event = event or _first(d, "event", "type")
+        upload_id = upload_id or _first(d, "upload_id", "publish_id")
+        video_id = video_id or _first(d, "video_id", "videoId", "post_id")
+    return event, upload_id, video_id
+
+
+def init_db(conn: sqlite3.Connection):
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS webhook_events (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        received_at REAL NOT NULL,
+        event TEXT,
+        upload_id TEXT,
+        video_id TEXT,
+        payload TEXT NOT NULL
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_webhook_events_upload_id ON webhook_events (upload_id)")
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_webhook_events_video_id ON webhook_events (video_id)")
+    conn.commit()
+
+
+class WebhookIngestor:
+    def __init__(self, db_path: Optional[str] = None, max_queue: Optional[int] = None,
+                 batch_size: Optional[int] = None):
+        self.db_path = db_path or publish_db_path()
+        self.max_queue = max_queue or int(os.getenv("WEBHOOK_QUEUE_SIZE", "10000"))
+        self.batch_size = batch_size or int(os.getenv("WEBHOOK_BATCH_SIZE", "500"))
+        self.retries = int(os.getenv("WEBHOOK_WRITE_RETRIES", "5"))
+        self.fallback_path = os.getenv("WEBHOOK_FALLBACK_PATH") or os.path.join(
+            os.path.dirname(os.path.abspath(self.db_path)), "webhook_failed.jsonl")
+        self.queue = None
+        self.written = 0
+        self.rejected = 0
+        self.fallback = 0
+        self._stopping = False
+        self._task = None
+        self._conn = None
+        self._executor = None
+
+    def start(self):
+        """Start the writer on the running loop (idempotent)."""
+        if self._task is None:
+            self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix="webhook-writer")
+            self.queue = asyncio.Queue(self.max_queue)
+            QUEUE_DEPTH.set_function(self.queue.qsize)
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    def offer(self, payload) -> bool:
+        """Queue a payload without waiting; False when the queue is full."""
+        self.start()
+        try:
+            self.queue.put_nowait((time.time(), payload))
+            return True
+        except asyncio.QueueFull:
+            self.rejected += 1
+            REJECTED.inc()
+            return False
+
+    async def stop(self):
+        """Flush everything queued, then stop the writer."""
+        if self._task is None:
+            return
+        self._stopping = True  # a failing batch now goes to the fallback file without backoff
+        await self.queue.put(None)
+        await self._task
+        self._task = None
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._close)
+        self._executor.shutdown(wait=True)
+        self._executor = None
+        self._stopping = False
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        stopping = False
+        while not stopping:
+            batch = [await self.queue.get()]
+            while len(batch) < self.batch_size and not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+            if None in batch:
+                stopping = True
+                batch = [ev for ev in batch if ev is not None]
+            if batch:
+                await self._persist(loop, batch)
+
+    async def _persist(self, loop, batch: List[tuple]):
+        delay = 0.1
+        for attempt in range(1, self.retries + 1):
+            try:
+                await loop.run_in_executor(self._executor, self._write, batch)
+                self.written += len(batch)
+                return
+            except Exception:
+                logger.exception("Failed to write %s webhook events (attempt %s/%s)", len(batch), attempt, self.retries)
+            if self._stopping or attempt == self.retries:
+                break
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 5.0)
+        # an acknowledged event must not be dropped: park it where it can be replayed from
+        try:
+            await loop.run_in_executor(self._executor, self._write_fallback, batch)
+            self.fallback += len(batch)
+            FALLBACK.inc(len(batch))
+            logger.error("Appended %s webhook events to %s", len(batch), self.fallback_path)
+        except Exception:
+            logger.exception("Lost %s webhook events: database and fallback file both failed", len(batch))
+
+    def _write_fallback(self, batch: List[tuple]):
+        os.makedirs(os.path.dirname(os.path.abspath(self.fallback_path)), exist_ok=True)
+        with open(self.fallback_path, "a", encoding="utf-8") as fh:
+            for received_at, payload in batch:
+                fh.write(json.dumps({"received_at": received_at, "payload": payload}, ensure_ascii=False, default=str) + "\n")
+
+    def _write(self, batch: List[tuple]):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.db_path)), exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, timeout=30)
+            init_db(self._conn)
+            publish_status.init_db(self._conn)
+        rows = []
+        for received_at, payload in batch:
+            event, upload_id, video_id = extract_ids(payload)
+            rows.append((received_at, event, upload_id, video_id, json.dumps(payload, ensure_ascii=False, default=str)))
+        with self._conn:
+            self._conn.executemany(
+                "INSERT INTO webhook_events (received_at, event, upload_id, video_id, payload) VALUES (?, ?, ?, ?, ?)", rows)
+            for received_at, event, upload_id, video_id, _ in rows:
+                if upload_id or video_id:
+                    status = publish_status.status_from_event(event)
+                    if upload_id:
+                        publish_status.upsert(self._conn, upload_id, status, video_id=video_id, message=event, now=received_at,
+                                              stage=publish_status.STAGE_PROVIDER)
+                    else:
+                        publish_status.update_by_video(self._conn, video_id, status, message=event, now=received_at)
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+def events_for(upload_id: Optional[str] = None, video_id: Optional[str] = None,
+               db_path: Optional[str] = None) -> List[dict]:
+    """Stored events for an upload_id and/or video_id, oldest first."""
+    conn = sqlite3.connect(db_path or publish_db_path())
+    try:
+        init_db(conn)
+        sql, params = "SELECT received_at, event, upload_id, video_id, payload FROM webhook_events WHERE 1=1", []
+        if upload_id:
+            sql += " AND upload_id = ?"
+            params.append(upload_id)
+        if video_id:
+            sql += " AND video_id = ?"
+            params.append(video_id)
+        return [{"received_at": r[0], "event": r[1], "upload_id": r[2], "video_id": r[3], "payload": json.loads(r[4])}
+                for r in conn.execute(sql + " ORDER BY id", params)]
+    finally:
+        conn.close()
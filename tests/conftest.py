@@ -3,6 +3,8 @@ import sys
 
 
 def pytest_configure():
+    # spans would otherwise land in ./output/traces for tests that don't patch OUTPUT_DIR
+    os.environ.setdefault("TRACING", "0")
     # Add the project root (one level up from tests/) to sys.path so tests can import src
     root = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
     if root not in sys.path:
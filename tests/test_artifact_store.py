@@ -0,0 +1,57 @@
+import os
+
+from src.artifact_store import ArtifactStore, artifact_key
+from src import media_creator
+
+
+def test_artifact_key_is_stable_and_input_sensitive():
+    a = artifact_key("banner", title="T", price=10, variant="base")
+    b = artifact_key("banner", variant="base", price=10, title="T")
+    c = artifact_key("banner", title="T", price=11, variant="base")
+    assert a == b
+    assert a != c
+
+
+def test_get_or_create_renders_once(tmp_path):
+    store = ArtifactStore(root=str(tmp_path / "artifacts"))
+    calls = []
+
+    def render(tmp):
+        calls.append(tmp)
+        with open(tmp, "w") as fh:
+            fh.write("x")
+        return tmp
+
+    key = artifact_key("banner", title="T")
+    p1 = store.get_or_create(key, ".txt", render)
+    p2 = store.get_or_create(key, ".txt", render)
+    assert p1 == p2 == store.path_for(key, ".txt")
+    assert len(calls) == 1
+    # sharded layout, no temp files left behind
+    assert os.path.dirname(p1).endswith(os.path.join(key[:2], key[2:4]))
+    assert os.listdir(os.path.dirname(p1)) == [os.path.basename(p1)]
+
+
+def test_failed_render_leaves_no_artifact(tmp_path):
+    store = ArtifactStore(root=str(tmp_path))
+    key = artifact_key("banner", title="boom")
+
+    def render(tmp):
+        raise RuntimeError("render failed")
+
+    try:
+        store.get_or_create(key, ".png", render)
+    except RuntimeError:
+        pass
+    assert store.get(key, ".png") is None
+    assert os.listdir(os.path.dirname(store.path_for(key, ".png"))) == []
+
+
+def test_render_banner_uses_store(tmp_path):
+    store = ArtifactStore(root=str(tmp_path))
+    p1 = media_creator.render_banner("Item", 99, store=store)
+    mtime = os.path.getmtime(p1)
+    p2 = media_creator.render_banner("Item", 99, store=store)
+    assert p1 == p2
+    assert os.path.getmtime(p2) >= mtime
+    assert media_creator.render_banner("Item", 100, store=store) != p1
@@ -0,0 +1,39 @@
+import json
+
+from benchmarks import harness
+
+
+def test_run_case_stats_and_skip(tmp_path):
+    calls = []
+
+    def case(workdir):
+        calls.append("setup")
+        yield lambda: calls.append("run")
+        calls.append("teardown")
+
+    def skipped(workdir):
+        raise harness.Skip("no codec")
+        yield
+
+    res = harness.run_case(harness.Case("c", case, number=3, repeat=None), str(tmp_path), repeat=2)
+    assert calls == ["setup"] + ["run"] * 9 + ["teardown"]  # one warm-up round, two timed
+    assert res["rounds"] == 2 and res["number"] == 3 and res["min"] <= res["median"]
+    assert harness.run_case(harness.Case("s", skipped, 1, None), str(tmp_path)) == {"skipped": "no codec"}
+
+
+def test_compare_thresholds_and_baseline_round_trip(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    harness.save_baseline(path, {"a.x": {"median": 1.0}, "b": {"median": 2.0}, "c": {"skipped": "n/a"}})
+    baseline = harness.load_baseline(path)
+    assert set(baseline["results"]) == {"a.x", "b"} and baseline["machine"] == harness.machine()
+
+    current = {"a.x": {"median": 1.4}, "b": {"median": 2.2}, "d": {"median": 1.0}, "c": {"skipped": "n/a"}}
+    verdicts = harness.compare(current, baseline["results"], threshold=0.25)
+    assert {k: v["status"] for k, v in verdicts.items()} == {"a.x": "regressed", "b": "ok", "d": "new", "c": "skipped"}
+    relaxed = harness.compare(current, baseline["results"], threshold=0.25, rules={"a": 0.5})
+    assert relaxed["a.x"]["status"] == "ok" and relaxed["a.x"]["threshold"] == 0.5
+    assert harness.compare({"b": {"median": 1.0}}, baseline["results"], 0.25)["b"]["status"] == "faster"
+
+    # saving a filtered run keeps the other cases' baselines
+    harness.save_baseline(path, {"b": {"median": 3.0}}, baseline)
+    assert json.load(open(path))["results"] == {"a.x": {"median": 1.0}, "b": {"median": 3.0}}
@@ -0,0 +1,76 @@
+import hashlib
+
+import pytest
+import requests
+
+from src.config import Config
+from src.poster_tiktok_api import upload_chunk, upload_video_chunked
+from src.shopee_client import ShopeeClient
+from tools import fake_services
+
+
+@pytest.fixture
+def services():
+    svc = fake_services.FakeServices(part_size=4096, catalogue=50)
+    svc.serve()
+    yield svc
+    svc.shutdown()
+
+
+def _point_at(monkeypatch, tmp_path, base):
+    for k, v in fake_services.env_for(base).items():
+        monkeypatch.setenv(k, v)
+    monkeypatch.setenv("TIKTOK_PART_BACKOFF_BASE", "0.01")
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+
+
+def test_shopee_endpoints_and_images(services):
+    client = ShopeeClient(partner_id="p", partner_key="k", base=services.base_url + "/shopee")
+    items = client.search_popular_items(limit=3)["items"]
+    assert [it["itemid"] for it in items] == [1, 2, 3]
+    assert client.get_items([7, 9])["items"][1]["name"] == "Load test product 9"
+    assert "s.shopee.test" in client.generate_affiliate_link(7, 1007)["affiliate_link"]
+
+    url = f"{services.base_url}/img/{items[0]['images'][0]}"
+    first = requests.get(url, timeout=5)
+    assert first.headers["Content-Type"] == "image/jpeg" and first.content[:2] == b"\xff\xd8"
+    assert requests.get(url, headers={"If-None-Match": first.headers["ETag"]}, timeout=5).status_code == 304
+    assert services.snapshot()["shopee.popular 200"] == 1
+
+
+def test_chunked_upload_is_acked_and_committed(monkeypatch, tmp_path, services):
+    _point_at(monkeypatch, tmp_path, services.base_url)
+    video = tmp_path / "v.mp4"
+    video.write_bytes(bytes(range(256)) * 50)  # 12800 bytes -> 4 parts
+
+    res = upload_video_chunked("T", str(video), "tok", dry_run=False)
+    assert res["status"] == "ok"
+    (upload,) = services.uploads.values()
+    assert upload["committed"] and sorted(upload["acked"]) == [1, 2, 3, 4]
+    assert services.snapshot()["tiktok.part 200"] == 4
+
+
+def test_chunk_md5_mismatch_and_missing_parts_are_rejected(monkeypatch, tmp_path, services):
+    _point_at(monkeypatch, tmp_path, services.base_url)
+    init = requests.post(f"{services.base_url}/tiktok/upload/init", json={"file_size": 5000}, timeout=5).json()
+    part_url = init["upload_url_template"].replace("{upload_id}", init["upload_id"])
+
+    with pytest.raises(requests.HTTPError):
+        upload_chunk(part_url.replace("{part_number}", "1"), b"x" * 4096, 1, headers={"X-Chunk-MD5": "0" * 32})
+    ack = upload_chunk(part_url.replace("{part_number}", "1"), b"x" * 4096, 1,
+                       headers={"X-Chunk-MD5": hashlib.md5(b"x" * 4096).hexdigest()})
+    assert ack["md5"] == hashlib.md5(b"x" * 4096).hexdigest()
+
+    commit = requests.post(f"{services.base_url}/tiktok/upload/commit", json={"upload_id": init["upload_id"]}, timeout=5)
+    assert commit.status_code == 400 and "[2]" in commit.json()["message"]
+
+
+def test_fault_rules_match_the_most_specific_name():
+    faults = fake_services.Faults(latency=["tiktok=0.5", "tiktok.part=uniform:0.1,0.2"],
+                                  error_rate=["*=1"], throttle_rate=["shopee=1"], seed=1)
+    assert faults.decide("shopee.get") == (0.0, 429)
+    delay, status = faults.decide("tiktok.part")
+    assert 0.1 <= delay <= 0.2 and status == 500
+    assert faults.decide("tiktok.commit") == (0.5, 500)
+    with pytest.raises(ValueError):
+        fake_services.parse_latency("gamma:1,2")
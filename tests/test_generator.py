@@ -1,6 +1,7 @@
 import pytest
 import os
 import tempfile
+from pathlib import Path
 from unittest.mock import MagicMock, patch
 
 # Ensure test imports the project
@@ -36,6 +37,18 @@ def test_run_once_creates_output(mock_openai_cls, mock_shopee_cls, tmp_path):
         res = generator.run_once()
 
     # Assert output file created
-    files = list(temp_out.iterdir())
-    assert any(f.suffix == ".txt" for f in files)
+    assert list((temp_out / "captions").rglob("*.txt")) == [Path(res[0]["caption_file"])]
     assert len(res) == 1
+
+
+@pytest.mark.parametrize("enabled, kwargs", [(False, {}), (True, {"api_key": "sk-x", "model": "m"})])
+def test_openai_captions_are_opt_in(monkeypatch, tmp_path, enabled, kwargs):
+    monkeypatch.setattr(generator.Config, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(generator.Config, "OPENAI_CAPTIONS", enabled)
+    monkeypatch.setattr(generator.Config, "OPENAI_API_KEY", "sk-x")
+    monkeypatch.setattr(generator.Config, "OPENAI_MODEL", "m")
+    for name in ("db", "shopee", "openai_client"):
+        monkeypatch.setattr(generator, name, MagicMock() if name != "openai_client" else None)
+    with patch("src.generator.OpenAIClient") as openai_cls:
+        generator._clients()
+    openai_cls.assert_called_once_with(**kwargs)
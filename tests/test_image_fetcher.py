@@ -0,0 +1,80 @@
+import io
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from PIL import Image
+
+from src.image_fetcher import ImageFetcher, image_urls
+
+
+def _png_bytes(size=(800, 400)):
+    buf = io.BytesIO()
+    Image.new("RGB", size, color=(200, 30, 30)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.fixture
+def image_server():
+    body = _png_bytes()
+    stats = {"requests": 0, "bodies": 0, "conditional": 0}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            stats["requests"] += 1
+            if self.headers.get("If-None-Match") == '"v1"':
+                stats["conditional"] += 1
+                self.send_response(304)
+                self.end_headers()
+                return
+            stats["bodies"] += 1
+            self.send_response(200)
+            self.send_header("Content-Type", "image/png")
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    t = threading.Thread(target=srv.serve_forever, daemon=True)
+    t.start()
+    yield f"http://127.0.0.1:{srv.server_address[1]}", stats
+    srv.shutdown()
+    srv.server_close()
+
+
+def test_image_urls_from_payload(monkeypatch):
+    monkeypatch.setenv("SHOPEE_IMAGE_URL_TEMPLATE", "https://cdn.example/{image}")
+    assert image_urls({"images": ["abc", "https://x/y.jpg"]}) == ["https://cdn.example/abc", "https://x/y.jpg"]
+    assert image_urls({"image": "def"}) == ["https://cdn.example/def"]
+    assert image_urls({}) == []
+
+
+def test_fetch_many_caches_and_revalidates(tmp_path, image_server):
+    base, stats = image_server
+    urls = [f"{base}/img/{i}.png" for i in range(6)]
+
+    fetcher = ImageFetcher(cache_dir=str(tmp_path), max_workers=3)
+    res = fetcher.fetch_many(urls + urls[:2], size=(200, 200))
+    assert set(res) == set(urls)
+    assert stats["bodies"] == 6
+    with Image.open(res[urls[0]]) as im:
+        assert im.size == (200, 100)
+
+    # a second run within the TTL makes no requests at all
+    ImageFetcher(cache_dir=str(tmp_path)).fetch_many(urls, size=(200, 200))
+    assert stats["requests"] == 6
+
+    # once stale, entries are revalidated without re-downloading bodies
+    ImageFetcher(cache_dir=str(tmp_path), ttl=0).fetch_many(urls, size=(200, 200))
+    assert stats["conditional"] == 6
+    assert stats["bodies"] == 6
+
+
+def test_fetch_many_reports_failures(tmp_path, image_server):
+    fetcher = ImageFetcher(cache_dir=str(tmp_path))
+    res = fetcher.fetch_many(["http://127.0.0.1:1/missing.png"])
+    assert res == {"http://127.0.0.1:1/missing.png": None}
@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from src import generator, jobs, predictor
+from src.config import Config
+from src.db import DB
+
+
+class FakeShopee:
+    def __init__(self):
+        self.requested = []
+
+    def get_items(self, item_ids, shop_id=None):
+        self.requested.append(list(item_ids))
+        return {"items": [{"itemid": i, "shopid": shop_id or "s1", "name": f"Item {i}", "price": 1500000} for i in item_ids]}
+
+    def generate_affiliate_link(self, item_id, shop_id):
+        return {"affiliate_link": f"https://aff.test/{item_id}"}
+
+
+@pytest.fixture
+def env(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    shopee = FakeShopee()
+    monkeypatch.setattr(generator, "db", DB(str(tmp_path / "data.db")))
+    monkeypatch.setattr(generator, "shopee", shopee)
+    monkeypatch.setattr(generator, "openai_client", generator.OpenAIClient())
+
+    def no_openai():
+        raise RuntimeError("offline")
+
+    monkeypatch.setattr(predictor, "OpenAIClient", no_openai)
+    return shopee
+
+
+def test_parse_spec():
+    assert jobs.parse_spec({"item_ids": [1, 2]})["item_ids"] == ["1", "2"]
+    assert jobs.parse_spec({"item_ids": ["1"]})["skip_posted"] is False
+    assert jobs.parse_spec({"query": "x"})["skip_posted"] is True
+    for bad in ({}, {"item_ids": ["1"], "query": "x"}, {"items": ["nope"]}, []):
+        with pytest.raises(ValueError):
+            jobs.parse_spec(bad)
+
+
+def test_queue_claims_in_order_and_requeues_interrupted(tmp_path):
+    q = jobs.JobQueue(str(tmp_path / "jobs.db"))
+    a = q.submit({"item_ids": ["1"]})
+    up = q.submit({"item_ids": ["3"], "run": True})
+    b = q.submit({"item_ids": ["2"]})
+    assert q.claim() == (a, {"item_ids": ["1"]})
+    assert q.claim()[0] == up
+    assert q.depth() == 1
+
+    # a restart finds both still running: the dry run is queued again, the upload is not retried
+    q2 = jobs.JobQueue(str(tmp_path / "jobs.db"))
+    assert q2.recover_running() == (1, 1)
+    assert q2.get(up)["status"] == jobs.INTERRUPTED
+    assert [q2.claim()[0], q2.claim()[0], q2.claim()] == [a, b, None]
+    q2.complete(a, {"items": []})
+    q2.fail(b, "boom")
+    assert q2.get(a)["status"] == "done" and q2.get(a)["attempts"] == 2
+    assert q2.get(b)["error"] == "boom"
+
+
+def test_service_runs_targeted_job(env, monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    from src import tiktok_oauth_callback as svc
+
+    monkeypatch.setenv("JOBS_POLL_INTERVAL", "0.05")
+    monkeypatch.setenv("SERVICE_API_KEY", "k")
+    generator.db.mark_posted("42", "s1")  # explicitly named items are built again
+    with TestClient(svc.app) as client:
+        assert client.post("/jobs", json={"item_ids": ["42"]}).status_code == 401
+        client.headers["X-API-Key"] = "k"
+        assert client.post("/jobs", json={"query": "x", "items": [{}]}).status_code == 400
+        job = client.post("/jobs", json={"item_ids": ["42", "43"]}).json()["job"]
+        for _ in range(300):
+            status = client.get(f"/jobs/{job}").json()
+            if status["status"] not in ("queued", "running"):
+                break
+            time.sleep(0.02)
+        assert client.get("/jobs/nope").status_code == 404
+
+    assert status["status"] == "done", status
+    assert env.requested == [["42", "43"]]
+    items = status["result"]["items"]
+    assert [(i["item_id"], i["status"]) for i in items] == [("42", "dry_run"), ("43", "dry_run")]
+    assert list((tmp_path / "dry_runs").rglob("*.json"))
+
+
+def test_run_job_queues_every_upload_before_waiting(env, monkeypatch):
+    from concurrent.futures import Future
+    from src import runner
+
+    events = []
+
+    class Pending(Future):
+        def result(self, timeout=None):
+            events.append("wait")
+            return super().result(timeout)
+
+    class Scheduler:
+        def submit(self, title, video_path, access_token, priority=0.0, account=None, item_id=None):
+            events.append(("submit", item_id))
+            fut = Pending()
+            fut.set_result({"upload_id": item_id})
+            return fut
+
+    monkeypatch.setattr(runner.poster_tiktok_api, "obtain_access_token", lambda *a, **kw: "tok")
+    monkeypatch.setattr(runner.media_creator, "render_video", lambda frames: frames[0])
+    result = jobs.run_job(jobs.parse_spec({"item_ids": ["1", "2", "3"], "run": True}), scheduler=Scheduler())
+
+    assert events == [("submit", "1"), ("submit", "2"), ("submit", "3"), "wait", "wait", "wait"]
+    assert [i["status"] for i in result["items"]] == ["committed"] * 3
@@ -0,0 +1,79 @@
+import threading
+
+from src import metrics
+
+
+def test_counter_shards_are_summed_across_threads():
+    reg = metrics.Registry()
+    c = reg.counter("things_total", "Things", ["kind"])
+    h = reg.histogram("op_seconds", "Op", buckets=(0.1, 1))
+
+    def work():
+        for _ in range(1000):
+            c.labels("a").inc()
+            h.observe(0.5)
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    c.labels(kind="b").inc(2.5)
+
+    # shards of the exited threads are folded in and still counted
+    assert c.labels("a").value() == 8000
+    assert c.labels("a").value() == 8000
+    text = reg.render()
+    assert 'things_total{kind="a"} 8000' in text
+    assert 'things_total{kind="b"} 2.5' in text
+    assert 'op_seconds_bucket{le="0.1"} 0' in text
+    assert 'op_seconds_bucket{le="1"} 8000' in text
+    assert 'op_seconds_bucket{le="+Inf"} 8000' in text
+    assert "op_seconds_count 8000" in text
+
+
+def test_gauge_callback_and_text_round_trip():
+    reg = metrics.Registry()
+    depth = [3]
+    reg.gauge("queue_depth", "Depth").set_function(lambda: depth[0])
+    reg.counter("odd_total", 'Label "escaping"', ["v"]).labels('a"b\\c').inc()
+    families = metrics.parse(reg.render())
+    assert ("queue_depth", "gauge", "Depth", [("queue_depth", {}, 3.0)]) in families
+    assert metrics.parse(reg.render()) == families
+    labelled = metrics.with_labels(families, job="runner")
+    assert labelled[1][3] == [("odd_total", {"v": 'a"b\\c', "job": "runner"}, 1.0)]
+
+
+def test_service_exposes_metrics_and_accepts_pushes(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    from src import tiktok_oauth_callback as svc
+    from src.shopee_client import SHOPEE_REQUESTS
+
+    SHOPEE_REQUESTS.labels("get_items", "rate_limited").inc()
+    runner = metrics.Registry()
+    runner.counter("shopee_requests_total", "Shopee API calls", ["endpoint", "outcome"]).labels("get_items", "ok").inc(7)
+
+    monkeypatch.setenv("SERVICE_API_KEY", "k")
+    monkeypatch.setenv("METRICS_PUSH_MAX_JOBS", "2")
+    monkeypatch.setenv("METRICS_PUSH_MAX_BYTES", "4096")
+    monkeypatch.setattr(svc, "_pushed", {})
+    client = TestClient(svc.app)
+    assert client.put("/metrics/job/runner", content=runner.render()).status_code == 401
+    assert client.delete("/metrics/job/runner").status_code == 401
+    client.headers["X-API-Key"] = "k"
+    assert client.put("/metrics/job/runner", content=runner.render()).status_code == 200
+    assert client.put("/metrics/job/big", content="# " + "x" * 5000).status_code == 413
+    assert client.put("/metrics/job/bad", content="not a metric line ###").status_code == 400
+    assert client.put("/metrics/job/other", content="").status_code == 200
+    assert client.put("/metrics/job/third", content="").status_code == 429
+    assert client.put("/metrics/job/other", content="").status_code == 200  # replacing a job is fine
+    resp = client.get("/metrics")
+    assert resp.status_code == 200
+    assert resp.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = resp.text
+    assert text.count("# TYPE shopee_requests_total counter") == 1
+    assert 'shopee_requests_total{endpoint="get_items",outcome="ok",job="runner"} 7' in text
+    assert 'shopee_requests_total{endpoint="get_items",outcome="rate_limited"}' in text
+    assert client.delete("/metrics/job/runner").status_code == 200
+    assert 'job="runner"' not in client.get("/metrics").text
+    assert client.put("/metrics/job/third", content="").status_code == 200
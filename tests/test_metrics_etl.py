@@ -0,0 +1,72 @@
+import json
+import os
+
+from tools import metrics_etl
+
+
+def _write(path, obj):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(obj), encoding="utf-8")
+
+
+def _upload(root, uid, ts, parts=(1, 2)):
+    pm = root / "publish_metrics"
+    _write(pm / f"commit_{uid}_{ts}.json", {"upload_id": uid, "video_id": f"v-{uid}", "status": "ok", "timestamp": ts})
+    _write(pm / f"summary_{uid}_{ts}.json", {"upload_id": uid, "parts_uploaded": len(parts), "timestamp": ts})
+    journal = root / "upload_journals" / f"{uid}.jsonl"
+    journal.parent.mkdir(parents=True, exist_ok=True)
+    with open(journal, "a", encoding="utf-8") as fh:
+        for p in parts:
+            fh.write(json.dumps({"ev": "part", "part": p, "md5": "m", "attempt": 1, "duration": 0.5, "ts": ts}) + "\n")
+
+
+def _full_rebuild(root, tmp_path):
+    out = metrics_etl.aggregate(str(root), str(tmp_path / "full.csv"), full=True)
+    return open(out, encoding="utf-8").read()
+
+
+def test_incremental_runs_parse_only_changes_and_match_a_full_rebuild(tmp_path, capsys):
+    root = tmp_path / "output"
+    _upload(root, "u1", 100)
+    _upload(root, "u2", 200)
+    _write(root / "upload_metrics_legacy.json", {"1": [{"attempt": 1, "duration": 2.0}]})
+    out = metrics_etl.aggregate(str(root))
+    state = metrics_etl.state_path_for(out)
+    assert os.path.exists(state)
+
+    conn = metrics_etl._open_state(state)
+    assert metrics_etl.sync(conn, str(root)) == {"parsed": 0, "removed": 0, "files": 7}
+
+    # a new upload, a journal that grew, a later commit for u1 and a file removed by retention GC
+    _upload(root, "u3", 300)
+    with open(root / "upload_journals" / "u2.jsonl", "a", encoding="utf-8") as fh:
+        fh.write(json.dumps({"ev": "retry", "part": 3, "attempt": 1, "duration": 1.0, "error": "x"}) + "\n")
+    _write(root / "publish_metrics" / "commit_u1_150.json", {"upload_id": "u1", "video_id": "v-u1-b", "status": "ok", "timestamp": 150})
+    os.unlink(root / "upload_metrics_legacy.json")
+    counts = metrics_etl.sync(conn, str(root))
+    conn.close()
+    assert counts == {"parsed": 5, "removed": 1, "files": 10}
+
+    capsys.readouterr()
+    metrics_etl.aggregate(str(root))
+    assert "0 files parsed" in capsys.readouterr().out
+    os.unlink(out)  # no changes, but a missing CSV is written again from the state
+    metrics_etl.aggregate(str(root))
+    text = open(out, encoding="utf-8").read()
+    assert text == _full_rebuild(root, tmp_path)
+    assert "v-u1-b" in text and "legacy" not in text and "u3" in text
+    assert metrics_etl.verify(str(root))
+
+
+def test_unreadable_files_are_retried_once_they_change(tmp_path):
+    root = tmp_path / "output"
+    _upload(root, "u1", 100)
+    torn = root / "publish_metrics" / "commit_u1_200.json"
+    torn.write_text('{"upload_id": "u1", "video', encoding="utf-8")
+    out = metrics_etl.aggregate(str(root))
+    assert "v-u1," in open(out, encoding="utf-8").read()
+
+    _write(torn, {"upload_id": "u1", "video_id": "v-late", "status": "ok", "timestamp": 200})
+    metrics_etl.aggregate(str(root))
+    assert "v-late" in open(out, encoding="utf-8").read()
+    assert open(out, encoding="utf-8").read() == _full_rebuild(root, tmp_path)
@@ -0,0 +1,90 @@
+from PIL import Image, ImageDraw
+
+from src.phash import PHashIndex, ahash, dedupe_paths, dhash, file_hash, hamming
+
+
+def _banner(path, text, shade=255):
+    im = Image.new("RGB", (360, 640), color=(shade, shade, shade))
+    d = ImageDraw.Draw(im)
+    d.rectangle((40, 40, 200, 300), fill=(0, 0, 0))
+    d.text((40, 400), text, fill=(255, 0, 0))
+    im.save(path)
+    return str(path)
+
+
+def test_hashes_tolerate_small_changes(tmp_path):
+    a = _banner(tmp_path / "a.png", "x")
+    b = _banner(tmp_path / "b.png", "x", shade=250)
+    im = Image.new("RGB", (360, 640), color=(255, 255, 255))
+    ImageDraw.Draw(im).ellipse((100, 300, 340, 620), fill=(0, 0, 255))
+    im.save(tmp_path / "c.png")
+    assert hamming(dhash(a), dhash(b)) <= 2
+    assert hamming(ahash(a), ahash(b)) <= 2
+    assert hamming(dhash(a), dhash(str(tmp_path / "c.png"))) > 6
+
+
+def test_dedupe_paths_collapses_near_duplicates(tmp_path):
+    a = _banner(tmp_path / "a.png", "x")
+    b = _banner(tmp_path / "b.png", "x", shade=252)
+    im = Image.new("RGB", (360, 640), color=(0, 0, 0))
+    im.save(tmp_path / "c.png")
+    c = str(tmp_path / "c.png")
+    assert dedupe_paths([a, b, a, c]) == [a, c]
+
+
+def test_index_flags_lookalike_for_other_item(tmp_path):
+    a = _banner(tmp_path / "a.png", "x")
+    b = _banner(tmp_path / "b.png", "x", shade=252)
+    path = str(tmp_path / "index.jsonl")
+    idx = PHashIndex(path)
+    idx.add("item-1", file_hash(a))
+
+    reloaded = PHashIndex(path)
+    assert len(reloaded) == 1
+    assert reloaded.find_duplicate(file_hash(b), "item-2")[0] == "item-1"
+    # reposting the same item is not a conflict
+    assert reloaded.find_duplicate(file_hash(b), "item-1") is None
+
+
+def test_text_only_banners_of_different_items_are_all_posted(tmp_path, monkeypatch):
+    from src import predictor, runner
+    from src.config import Config
+
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(predictor, "generate_caption_variants", lambda *a, **k: ["caption"])
+    index = PHashIndex(str(tmp_path / "index.jsonl"))
+    # an earlier run posted a text-only banner that hashes like any other text-only banner
+    index.add("0", file_hash(runner.media_creator.render_banner("Phone case", 100)))
+    for item_id, name in (("1", "Phone case"), ("2", "Lipstick red")):
+        out = runner.process_item({"itemid": item_id, "name": name, "price": 100}, posted_index=index)
+        assert out["status"] == "dry_run"
+        assert out["thumb_hash"] is None
+
+
+def test_lookalikes_queued_in_one_batch_post_once(tmp_path, monkeypatch):
+    from concurrent.futures import Future
+    from src import predictor, runner
+    from src.config import Config
+
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr(predictor, "generate_caption_variants", lambda *a, **k: ["caption"])
+    monkeypatch.setattr(runner.poster_tiktok_api, "obtain_access_token", lambda *a, **kw: "tok")
+    monkeypatch.setattr(runner.media_creator, "render_video", lambda frames: frames[0])
+
+    class Scheduler:
+        def submit(self, *a, **kw):
+            return Future()  # still uploading
+
+    photo = _banner(tmp_path / "photo.png", "x")
+    index = PHashIndex(str(tmp_path / "index.jsonl"))
+    first = runner.process_item({"itemid": "1", "name": "Phone case", "price": 100}, thumb=photo,
+                                posted_index=index, scheduler=Scheduler())
+    second = runner.process_item({"itemid": "2", "name": "Phone case", "price": 100}, thumb=photo,
+                                 posted_index=index, scheduler=Scheduler())
+    assert first["status"] == "queued"
+    assert second["status"] == "duplicate" and second["duplicate_of"] == "1"
+
+    # a failed upload frees the hash; nothing was written for it
+    index.release("1", first["thumb_hash"])
+    assert index.find_duplicate(first["thumb_hash"], "2") is None
+    assert len(PHashIndex(index.path)) == 0
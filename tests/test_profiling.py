@@ -0,0 +1,80 @@
+import os
+import time
+import pstats
+
+import pytest
+
+from src import profiling
+from src import tracing
+from src.config import Config
+
+
+def _env(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRACING", "1")
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+
+
+def _busy(n):
+    return sum(i * i for i in range(n))
+
+
+def _run_items(count):
+    for i in range(count):
+        with tracing.item(str(i)):
+            with tracing.span("predictor.score"):
+                _busy(2000)
+            with tracing.span("media.render_banner"):
+                with tracing.span("media.make_banner"):
+                    _busy(5000)
+                    time.sleep(0.02)
+
+
+def test_cpu_profile_only_covers_the_selected_stage(monkeypatch, tmp_path):
+    _env(monkeypatch, tmp_path)
+    prof = profiling.StageProfiler("cpu", stage="media", top=5).start()
+    _run_items(3)
+    report = prof.stop()
+
+    assert os.path.dirname(report) == os.path.join(str(tmp_path), "profiles", f"{tracing.RUN_ID}-cpu")
+    # nested media.make_banner is folded into the outermost matching span
+    assert dict(prof.spans) == {"media.render_banner": 3}
+    artifacts = sorted(os.listdir(os.path.dirname(report)))
+    assert artifacts == ["cpu-media.render_banner.prof", "report.txt"]
+    stats = pstats.Stats(os.path.join(os.path.dirname(report), artifacts[0]))
+    assert any(fn == "_busy" for (_, _, fn) in stats.stats)
+    text = open(report, encoding="utf-8").read()
+    assert "== media.render_banner (3 spans) ==" in text and "predictor" not in text
+    assert not tracing._hooks
+
+
+def test_sampling_is_per_item_and_consistent(monkeypatch, tmp_path):
+    _env(monkeypatch, tmp_path)
+    prof = profiling.StageProfiler("alloc", stage="predictor", sample=0.5)
+    chosen = [i for i in range(200) if prof.sampled(f"{tracing.RUN_ID}-{i}")]
+    assert 60 < len(chosen) < 140
+    assert chosen == [i for i in range(200) if prof.sampled(f"{tracing.RUN_ID}-{i}")]
+
+    prof.start()
+    _run_items(20)
+    report = prof.stop()
+    expected = sum(prof.sampled(f"{tracing.RUN_ID}-{i}") for i in range(20))
+    assert prof.spans["predictor.score"] == expected
+    if expected:
+        assert os.path.exists(os.path.join(os.path.dirname(report), "alloc-predictor.score.txt"))
+
+
+def test_wall_profile_writes_folded_stacks(monkeypatch, tmp_path):
+    _env(monkeypatch, tmp_path)
+    prof = profiling.StageProfiler("wall", stage="media.make_banner", interval=0.002).start()
+    _run_items(2)
+    report = prof.stop()
+
+    folded = os.path.join(os.path.dirname(report), "wall-media.make_banner.folded")
+    lines = open(folded, encoding="utf-8").read().splitlines()
+    assert lines and all(line.rsplit(" ", 1)[1].isdigit() for line in lines)
+    assert any("_run_items" in line for line in lines)  # sleeps are sampled too
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        profiling.StageProfiler("gpu")
@@ -0,0 +1,106 @@
+import asyncio
+import json
+
+from src.config import Config
+from src import publish_status
+from src.poster_tiktok_api import upload_video_chunked
+from src.webhook_ingest import WebhookIngestor
+
+
+def _fake_api(monkeypatch, tmp_path, upload_id, fail_parts=()):
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setenv("TIKTOK_PART_MAX_RETRIES", "1")
+    monkeypatch.setenv("TIKTOK_PART_BACKOFF_BASE", "0")
+    monkeypatch.setattr("src.poster_tiktok_api.initiate_upload_session",
+                        lambda tok, size: {"upload_id": upload_id, "part_size": 4096, "upload_url_template": "http://x/{part_number}"})
+
+    def fake_chunk(url, data, n, headers=None):
+        if n in fail_parts:
+            raise RuntimeError("part rejected")
+        return {"md5": headers["X-Chunk-MD5"]}
+
+    monkeypatch.setattr("src.poster_tiktok_api.upload_chunk", fake_chunk)
+
+    class Resp:
+        def raise_for_status(self):
+            pass
+
+        def json(self):
+            return {"video_id": "vid-1", "status": "ok"}
+
+    class Transport:
+        def post(self, op, url, **kw):
+            return Resp()
+
+    monkeypatch.setenv("TIKTOK_COMMIT_UPLOAD_URL", "http://x/commit")
+    monkeypatch.setattr("src.poster_tiktok_api._transport", Transport())
+
+
+def test_upload_commit_and_webhook_land_on_one_row(monkeypatch, tmp_path, capsys):
+    f = tmp_path / "v.bin"
+    f.write_bytes(b"a" * 10000)
+    _fake_api(monkeypatch, tmp_path, "u1", fail_parts={2})
+    try:
+        upload_video_chunked("t", str(f), "tok", dry_run=False, item_id="item-9")
+    except RuntimeError:
+        pass
+    f.write_bytes(b"b" * 10000)  # different content -> new session
+    _fake_api(monkeypatch, tmp_path, "u2")
+    upload_video_chunked("t", str(f), "tok", dry_run=False, item_id="item-9")
+
+    store = publish_status.get_store()
+    rows = store.by_item("item-9")
+    assert [(r["upload_id"], r["status"]) for r in rows] == [("u2", "committed"), ("u1", "failed")]
+    assert rows[0]["video_id"] == "vid-1" and rows[0]["account"] == "default"
+    assert "part rejected" in rows[1]["message"]
+
+    async def deliver():
+        ing = WebhookIngestor()
+        ing.offer({"event": "post.publish.failed", "content": json.dumps({"post_id": "vid-1"})})
+        await ing.stop()
+
+    asyncio.run(deliver())
+    assert store.get("u2")["status"] == "failed"
+    assert {r["upload_id"] for r in store.recent_failures()} == {"u1", "u2"}
+
+    assert publish_status.main(["failures"]) == 0
+    assert len(capsys.readouterr().out.splitlines()) == 2
+    assert publish_status.main(["item", "missing"]) == 1
+
+
+def test_status_endpoint_by_item(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    from src import tiktok_oauth_callback as svc
+
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    publish_status.record("u7", "committed", item_id="42", video_id="v7")
+    client = TestClient(svc.app)
+    body = client.get("/publish/items/42").json()
+    assert body["uploads"][0]["upload_id"] == "u7" and body["uploads"][0]["status"] == "committed"
+    assert client.get("/publish/items/43").status_code == 404
+
+
+def test_late_commit_does_not_undo_webhook_outcome(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    store = publish_status.get_store()
+    # upload failed, then resumed: same stage, the latest write wins
+    publish_status.record("u1", "uploading", item_id="i1")
+    publish_status.record("u1", publish_status.FAILED, message="part rejected")
+    publish_status.record("u1", "uploading")
+    assert store.get("u1")["status"] == "uploading"
+
+    # the provider's webhook lands before the runner records the commit
+    with store._conn() as conn:
+        publish_status.upsert(conn, "u1", "published", video_id="v1", message="post.publish.complete",
+                              stage=publish_status.STAGE_PROVIDER)
+    publish_status.record("u1", "committed", video_id="v1", message="ok")
+    publish_status.record("u1", "uploading")
+    row = store.get("u1")
+    assert (row["status"], row["message"], row["item_id"]) == ("published", "post.publish.complete", "i1")
+
+    # a provider-side failure after commit is final, too
+    publish_status.record("u2", "committed", video_id="v2")
+    with store._conn() as conn:
+        publish_status.update_by_video(conn, "v2", publish_status.FAILED, message="post.publish.failed")
+    publish_status.record("u2", "committed", video_id="v2")
+    assert store.get("u2")["status"] == publish_status.FAILED
@@ -0,0 +1,79 @@
+import os
+import time
+
+from src import retention
+from src.retention import Policy, dated_dir, plan_gc, run_gc
+
+
+def _touch(path, size=10, age_days=0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"x" * size)
+    t = time.time() - age_days * retention.DAY
+    os.utime(path, (t, t))
+    return path
+
+
+def test_dated_dir_layout(tmp_path):
+    d = dated_dir(str(tmp_path / "dry_runs"), when=0)
+    assert d == os.path.join(str(tmp_path / "dry_runs"), "1970", "01", "01")
+    assert os.path.isdir(d)
+
+
+def test_age_and_size_policies(tmp_path):
+    old = _touch(tmp_path / "dry_runs" / "2020" / "01" / "01" / "a.json", age_days=30)
+    new = _touch(tmp_path / "dry_runs" / "2020" / "01" / "02" / "b.json")
+    a1 = _touch(tmp_path / "artifacts" / "aa" / "bb" / "k1.png", size=100, age_days=3)
+    a2 = _touch(tmp_path / "artifacts" / "cc" / "dd" / "k2.png", size=100, age_days=1)
+    policies = [
+        Policy("dry_runs", "dry_runs/**/*.json", max_age_days=7),
+        Policy("artifacts", "artifacts/**/*", max_age_days=None, max_bytes=150),
+    ]
+
+    report = plan_gc(str(tmp_path), policies)
+    assert [p for p, _, _ in report["dry_runs"]["delete"]] == [str(old)]
+    # oldest artifact evicted first until under the size budget
+    assert report["artifacts"]["delete"] == [(str(a1), 100, "size")]
+
+    # dry run deletes nothing
+    run_gc(str(tmp_path), policies, dry_run=True)
+    assert old.exists() and a1.exists()
+
+    run_gc(str(tmp_path), policies)
+    assert not old.exists() and not a1.exists()
+    assert new.exists() and a2.exists()
+    # empty shard directories are pruned
+    assert not (tmp_path / "dry_runs" / "2020" / "01" / "01").exists()
+    assert not (tmp_path / "artifacts" / "aa").exists()
+    assert (tmp_path / "dry_runs").exists()
+
+
+def test_default_policies_cover_sharded_and_external_dirs(tmp_path, monkeypatch):
+    out = tmp_path / "out"
+    store = tmp_path / "store"
+    monkeypatch.setenv("ARTIFACT_DIR", str(store))
+    old = [
+        _touch(out / "captions" / "2020" / "01" / "01" / "a.txt", age_days=60),
+        _touch(out / "legacy.txt", age_days=60),
+        _touch(out / "pkce" / "2020" / "01" / "01" / "pkce_state_s1.json", age_days=2),
+        _touch(out / "upload_journals" / "ab" / "u1.jsonl", age_days=60),
+        _touch(store / "aa" / "bb" / "k1.png", age_days=60),
+    ]
+    fresh = _touch(store / "cc" / "dd" / "k2.png")
+
+    report = run_gc(str(out))
+    assert report["artifacts"]["root"] == str(store)
+    assert not any(p.exists() for p in old)
+    assert fresh.exists()
+    assert not (store / "aa").exists() and store.exists()
+
+
+def test_pkce_verifier_found_in_sharded_and_legacy_layout(tmp_path):
+    from src import pkce
+
+    path = pkce.state_path(str(tmp_path), "s1")
+    assert os.path.dirname(path) == dated_dir(str(tmp_path / "pkce"))
+    _touch(tmp_path / "pkce_state_s0.json")
+    open(path, "w").close()
+    assert pkce.find_state_files(str(tmp_path), "s1") == [path]
+    assert pkce.find_state_files(str(tmp_path), "s0") == [str(tmp_path / "pkce_state_s0.json")]
+    assert len(pkce.find_state_files(str(tmp_path))) == 2
@@ -0,0 +1,45 @@
+from src import text_layout
+from src.text_layout import fit_text, grapheme_clusters, text_width, wrap_text
+
+
+def test_grapheme_clusters_keep_thai_marks_attached():
+    # "กิ่ง": base + vowel + tone mark + base
+    assert grapheme_clusters("กิ่ง") == ["กิ่", "ง"]
+    # leading vowels travel with the following consonant
+    assert grapheme_clusters("เกม") == ["เก", "ม"]
+    assert grapheme_clusters("ไม้") == ["ไม้"]
+
+
+def test_wrap_breaks_spaceless_text_within_width():
+    font = text_layout.font_chain()[0]
+    text = "สินค้าราคาพิเศษสุดคุ้มสำหรับทุกคนในครอบครัว" * 3
+    lines = wrap_text(text, font, 32, 300)
+    assert len(lines) > 1
+    assert "".join(lines) == text
+    assert all(text_width(font, 32, ln) <= 300 for ln in lines)
+
+
+def test_wrap_never_strands_a_leading_vowel():
+    font = text_layout.font_chain()[0]
+    text = "เกมแพดไร้สายโทรศัพท์ใหม่" * 4
+    for width in range(60, 240, 9):
+        lines = wrap_text(text, font, 32, width)
+        assert "".join(lines) == text
+        assert not any(ln[-1] in "เแโใไ" for ln in lines)
+
+
+def test_fit_text_shrinks_long_titles():
+    short = fit_text("Short", (660, 400), max_size=72, min_size=20)
+    long = fit_text("Very long product name " * 12, (660, 400), max_size=72, min_size=20)
+    assert short.size == 72
+    assert long.size < short.size
+    assert long.height <= 400
+    assert all(text_width(long.font, long.size, ln) <= 660 for ln in long.lines)
+
+
+def test_measurements_are_memoized():
+    text_width.cache_clear()
+    fit_text("memo test title", (400, 200))
+    misses = text_width.cache_info().misses
+    fit_text("memo test title", (400, 200))
+    assert text_width.cache_info().misses == misses
@@ -6,6 +6,18 @@ from unittest.mock import patch, MagicMock
 from src.poster_tiktok_api import exchange_code_for_token, post_video
 
 
+class FakeTransport:
+    """Stands in for TikTokTransport; routes every operation to `fn(url, **kwargs)`."""
+
+    def __init__(self, fn):
+        self.fn = fn
+        self.ops = []
+
+    def post(self, op, url, **kwargs):
+        self.ops.append(op)
+        return self.fn(url, **kwargs)
+
+
 def test_exchange_code_for_token(monkeypatch, tmp_path):
     os.environ['TIKTOK_TOKEN_URL'] = 'https://api.example.com/token'
 
@@ -19,7 +31,7 @@ def test_exchange_code_for_token(monkeypatch, tmp_path):
         assert 'client_key' in data and 'code' in data
         return fake_resp
 
-    monkeypatch.setattr('src.poster_tiktok_api.requests.post', fake_post)
+    monkeypatch.setattr('src.poster_tiktok_api._transport', FakeTransport(fake_post))
 
     res = exchange_code_for_token('cid', 'csecret', 'code123', 'https://app/callback')
     assert res.get('access_token') == 'abc'
@@ -46,3 +58,45 @@ def test_post_video_upload_invokes_requests(monkeypatch, tmp_path):
 
     res = post_video('My Title', str(vid), access_token='token', dry_run=False)
     assert res.get('id') == '123'
+
+
+def test_transport_reuses_pooled_connections(monkeypatch, tmp_path):
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from src import poster_tiktok_api
+    from src.poster_tiktok_api import TikTokTransport, commit_upload
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            out = json.dumps({"status": "ok", "video_id": "v1"}).encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    monkeypatch.setattr(poster_tiktok_api.Config, 'OUTPUT_DIR', str(tmp_path))
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    transport = TikTokTransport(pool_size=2, timeouts={"commit": (1, 2)})
+    poster_tiktok_api.set_transport(transport)
+    os.environ['TIKTOK_COMMIT_UPLOAD_URL'] = f"http://127.0.0.1:{srv.server_address[1]}/commit"
+    try:
+        for i in range(5):
+            assert commit_upload('tok', f'u{i}')['video_id'] == 'v1'
+    finally:
+        poster_tiktok_api.set_transport(None)
+        os.environ.pop('TIKTOK_COMMIT_UPLOAD_URL')
+        srv.shutdown()
+        srv.server_close()
+
+    stats = transport.stats()
+    assert stats["requests"] == {"commit": 5}
+    assert stats["connections_opened"] == 1
+    assert stats["connections_reused"] == 4
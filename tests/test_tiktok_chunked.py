@@ -37,3 +37,96 @@ def test_upload_video_chunked(monkeypatch, tmp_path):
     assert res.get('status') == 'committed'
     # ensure at least 1 chunk uploaded
     assert len(calls) >= 1
+
+
+def test_upload_chunk_streams_multipart_body(monkeypatch):
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from src.poster_tiktok_api import upload_chunk
+
+    received = {}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            n = int(self.headers["Content-Length"])
+            received["body"] = self.rfile.read(n)
+            received["ctype"] = self.headers["Content-Type"]
+            received["md5"] = self.headers["X-Chunk-MD5"]
+            out = b'{"status": "ok"}'
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(out)))
+            self.end_headers()
+            self.wfile.write(out)
+
+        def log_message(self, *args):
+            pass
+
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    try:
+        payload = bytearray(b"abc" * 5000)
+        with memoryview(payload)[10:9010] as part:
+            res = upload_chunk(f"http://127.0.0.1:{srv.server_address[1]}/p", part, 3, headers={"X-Chunk-MD5": "m"})
+    finally:
+        srv.shutdown()
+        srv.server_close()
+
+    assert res == {"status": "ok"}
+    assert received["md5"] == "m"
+    boundary = received["ctype"].split("boundary=")[1]
+    body = received["body"]
+    assert body.startswith(f"--{boundary}\r\n".encode())
+    assert b'name="file"; filename="part-3"' in body
+    head, rest = body.split(b"\r\n\r\n", 1)
+    assert rest == bytes(payload[10:9010]) + f"\r\n--{boundary}--\r\n".encode()
+
+
+def test_chunked_upload_records_throughput_and_part_size_hint(monkeypatch, tmp_path):
+    import json
+
+    monkeypatch.setattr(Config, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setenv('TIKTOK_CHOOSE_PART_SIZE', 'true')
+    f = tmp_path / "video.bin"
+    f.write_bytes(b"v" * 20000)
+    hints = []
+
+    def fake_initiate(access_token, file_size, part_size=None):
+        hints.append(part_size)
+        return {"upload_id": "u2", "part_size": 4096, "upload_url_template": "https://example.com/{part_number}"}
+
+    monkeypatch.setattr('src.poster_tiktok_api.initiate_upload_session', fake_initiate)
+    monkeypatch.setattr('src.poster_tiktok_api.upload_chunk', lambda url, data, n, headers=None: {"ok": True})
+    monkeypatch.setattr('src.poster_tiktok_api.commit_upload', lambda tok, uid: {"status": "committed"})
+
+    upload_video_chunked('T', str(f), 'token', dry_run=False)
+    assert hints and hints[0] > 0
+    summary = json.loads(next((tmp_path / "publish_metrics").rglob("summary_u2_*.json")).read_text())
+    assert summary["throughput"]["bytes"] == 20000
+    assert summary["throughput"]["parts"] == 5
+    assert summary["throughput"]["concurrency_timeline"][0][1] >= 1
+
+
+def test_upload_video_chunked_releases_file_when_begin_fails(monkeypatch, tmp_path):
+    import pytest
+    from src import poster_tiktok_api
+
+    f = tmp_path / "video.bin"
+    f.write_bytes(b"x" * 10000)
+    monkeypatch.setattr(Config, 'OUTPUT_DIR', str(tmp_path))
+    monkeypatch.setattr('src.poster_tiktok_api.initiate_upload_session',
+                        lambda tok, size, **kw: {"upload_id": "u3", "part_size": 4096, "upload_url_template": "https://example.com/{part_number}"})
+    monkeypatch.setattr('src.poster_tiktok_api.upload_hashing.hash_parts', MagicMock(side_effect=OSError("disk gone")))
+    failed, closed = [], []
+    monkeypatch.setattr(poster_tiktok_api.ChunkedUpload, 'mark_failed', lambda self, e: failed.append(self.upload_id))
+    real_close = poster_tiktok_api.ChunkedUpload.close
+
+    def spy_close(self):
+        real_close(self)
+        closed.append((self._mm, self._view, self._journal))
+    monkeypatch.setattr(poster_tiktok_api.ChunkedUpload, 'close', spy_close)
+
+    with pytest.raises(OSError):
+        upload_video_chunked('T', str(f), 'token', dry_run=False)
+    assert failed == ["u3"]
+    assert closed == [(None, None, None)]
@@ -41,6 +41,78 @@ def test_refresh_flow(monkeypatch):
         assert data.get('refresh_token') == 'oldrefresh'
         return fake_resp
 
-    monkeypatch.setattr('src.poster_tiktok_api.requests.post', fake_post)
+    class FakeTransport:
+        def post(self, op, url, **kwargs):
+            assert op == 'refresh'
+            return fake_post(url, **kwargs)
+
+    monkeypatch.setattr('src.poster_tiktok_api._transport', FakeTransport())
     res = refresh_access_token('cid', 'csecret', 'oldrefresh')
     assert res.get('access_token') == 'new'
+
+
+class CountingFernet:
+    instances = 0
+
+    def __init__(self, key):
+        CountingFernet.instances += 1
+
+    def encrypt(self, payload):
+        return payload[::-1]
+
+    def decrypt(self, blob):
+        return blob[::-1]
+
+
+def test_account_token_store_rows_and_expiry_index(monkeypatch, tmp_path):
+    import time
+    import threading
+
+    monkeypatch.setenv('FERNET_KEY', 'testkey')
+    monkeypatch.setattr(ts, 'Fernet', CountingFernet)
+    ts._fernet_for.cache_clear()
+    CountingFernet.instances = 0
+    store = ts.AccountTokenStore(str(tmp_path / 'tokens.db'))
+    now = time.time()
+    for i in range(30):
+        store.save('tiktok', f'acct-{i}', {'access_token': f't{i}', 'expires_at': now + 60 * i})
+    store.save('instagram', 'acct-0', {'access_token': 'ig', 'expires_in': 10})
+
+    assert store.load('tiktok', 'acct-7')['access_token'] == 't7'
+    assert store.load('tiktok', 'missing') == {}
+    assert len(store.accounts('tiktok')) == 30
+    assert [a for _, a, _ in store.expiring(150, platform='tiktok', now=now)] == ['acct-0', 'acct-1', 'acct-2']
+    assert ('instagram', 'acct-0') in [(p, a) for p, a, _ in store.expiring(30, now=now)]
+    plan = store._conn().execute("EXPLAIN QUERY PLAN SELECT platform, account_id FROM tokens WHERE expires_at <= ?", (now,)).fetchall()
+    assert 'idx_tokens_expires_at' in str(plan)
+    assert CountingFernet.instances == 1  # one cached Fernet for all rows
+
+    def bump():
+        for _ in range(20):
+            store.update('tiktok', 'counter', lambda cur: {'n': cur.get('n', 0) + 1})
+
+    threads = [threading.Thread(target=bump) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert store.load('tiktok', 'counter') == {'n': 80}
+
+
+def test_token_manager_refreshes_one_account_row(monkeypatch, tmp_path):
+    import time
+    from src.token_manager import TokenManager
+
+    monkeypatch.setenv('FERNET_KEY', 'testkey')
+    monkeypatch.setattr(ts, 'Fernet', CountingFernet)
+    store = ts.AccountTokenStore(str(tmp_path / 'tokens.db'))
+    store.save('tiktok', 'a', {'access_token': 'old-a', 'refresh_token': 'ra', 'expires_at': time.time() + 5})
+    store.save('tiktok', 'b', {'access_token': 'tok-b', 'expires_at': time.time() + 3600})
+
+    refresh = lambda key, secret, rt: {'access_token': 'new-a', 'expires_in': 3600}
+    a = TokenManager('k', 's', account_id='a', db=store, refresh=refresh)
+    b = TokenManager('k', 's', account_id='b', db=store, refresh=refresh)
+    assert a.access_token() == 'new-a'
+    assert b.access_token() == 'tok-b'
+    assert store.load('tiktok', 'a')['refresh_token'] == 'ra'
+    assert store.expiring(600, platform='tiktok') == []
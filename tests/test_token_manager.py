@@ -0,0 +1,80 @@
+import threading
+import time
+
+import pytest
+
+import src.token_store as ts
+from src.token_manager import TokenManager, TokenExpiredError
+
+
+class CountingFernet:
+    decrypts = 0
+
+    def __init__(self, key):
+        pass
+
+    def encrypt(self, payload):
+        return payload[::-1]
+
+    def decrypt(self, blob):
+        CountingFernet.decrypts += 1
+        return blob[::-1]
+
+
+@pytest.fixture
+def store(monkeypatch, tmp_path):
+    monkeypatch.setenv("FERNET_KEY", "testkey")
+    monkeypatch.setattr(ts, "Fernet", CountingFernet)
+    CountingFernet.decrypts = 0
+    return str(tmp_path / "tokens.enc")
+
+
+def test_decrypts_once_until_store_changes(store):
+    ts.save_tokens({"access_token": "a1", "expires_in": 3600}, path=store)
+    mgr = TokenManager("k", "s", path=store)
+    assert [mgr.access_token() for _ in range(5)] == ["a1"] * 5
+    assert CountingFernet.decrypts == 1
+
+    time.sleep(0.01)
+    ts.save_tokens({"access_token": "a2", "expires_in": 3600, "pad": "x"}, path=store)
+    assert mgr.access_token() == "a2"
+    assert CountingFernet.decrypts == 2
+
+
+def test_concurrent_callers_share_one_refresh(store):
+    ts.save_tokens({"access_token": "old", "refresh_token": "r1", "expires_at": time.time() + 10}, path=store)
+    calls = []
+
+    def fake_refresh(key, secret, refresh_token):
+        calls.append(refresh_token)
+        time.sleep(0.05)
+        return {"access_token": "new", "expires_in": 3600}
+
+    mgr = TokenManager("k", "s", path=store, skew=60, refresh=fake_refresh)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(mgr.access_token())) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert calls == ["r1"]
+    assert results == ["new"] * 8
+    saved = ts.load_tokens(path=store)
+    assert saved["refresh_token"] == "r1"  # kept when the provider omits it
+    assert saved["expires_at"] > time.time() + 3000
+
+
+def test_expired_token_with_failed_refresh_raises(store):
+    ts.save_tokens({"access_token": "old", "refresh_token": "r1", "expires_at": time.time() - 1}, path=store)
+
+    def failing_refresh(key, secret, refresh_token):
+        raise RuntimeError("boom")
+
+    mgr = TokenManager("k", "s", path=store, refresh=failing_refresh)
+    with pytest.raises(TokenExpiredError):
+        mgr.access_token()
+
+    # still valid but inside the skew window: keep serving the current token
+    ts.save_tokens({"access_token": "old", "refresh_token": "r1", "expires_at": time.time() + 30}, path=store)
+    assert TokenManager("k", "s", path=store, skew=60, refresh=failing_refresh).access_token() == "old"
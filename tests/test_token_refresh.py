@@ -0,0 +1,139 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+import src.token_store as ts
+from src import token_refresh
+from src.token_manager import TokenManager
+
+
+class FakeFernet:
+    def __init__(self, key):
+        pass
+
+    def encrypt(self, payload):
+        return payload[::-1]
+
+    def decrypt(self, blob):
+        return blob[::-1]
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    monkeypatch.setenv("FERNET_KEY", "testkey")
+    monkeypatch.setattr(ts, "Fernet", FakeFernet)
+    monkeypatch.setattr(ts, "STORE_PATH", str(tmp_path / "missing.enc"))
+    monkeypatch.setattr(ts, "DB_PATH", str(tmp_path / "tokens.db"))
+    monkeypatch.setattr(ts, "_use_keyring", lambda: False)
+    return ts.AccountTokenStore(str(tmp_path / "tokens.db"))
+
+
+def _scheduler(monkeypatch, db, refresh, **kw):
+    managers = {}
+
+    def get_token_manager(key, secret, path=None, account_id=None):
+        if account_id not in managers:
+            managers[account_id] = TokenManager(key, secret, account_id=account_id, db=db, skew=60, refresh=refresh)
+        return managers[account_id]
+
+    monkeypatch.setattr(token_refresh.token_manager, "get_token_manager", get_token_manager)
+    kw.setdefault("skew", 60)
+    kw.setdefault("jitter", 0)
+    return token_refresh.RefreshScheduler("k", "s", rand=lambda: 1.0, **kw)
+
+
+def test_due_accounts_refresh_concurrently_and_others_wait(monkeypatch, db):
+    now = time.time()
+    for i in range(4):
+        db.save("tiktok", f"a{i}", {"access_token": "old", "refresh_token": f"r{i}", "expires_at": now + 30})
+    db.save("tiktok", "later", {"access_token": "ok", "refresh_token": "rl", "expires_at": now + 7200})
+    db.save("tiktok", "no-refresh", {"access_token": "ok", "expires_at": now + 30})
+
+    lock = threading.Lock()
+    state = {"inflight": 0, "max": 0, "calls": []}
+
+    def refresh(key, secret, refresh_token):
+        with lock:
+            state["inflight"] += 1
+            state["max"] = max(state["max"], state["inflight"])
+            state["calls"].append(refresh_token)
+        time.sleep(0.05)
+        with lock:
+            state["inflight"] -= 1
+        return {"access_token": "new-" + refresh_token, "expires_in": 3600}
+
+    sched = _scheduler(monkeypatch, db, refresh)
+    wait = asyncio.run(sched.run_once())
+
+    assert sorted(state["calls"]) == ["r0", "r1", "r2", "r3"]
+    assert state["max"] > 1
+    assert db.load("tiktok", "a2")["access_token"] == "new-r2"
+    status = sched.status()
+    assert status["no-refresh"]["next_refresh_at"] is None
+    assert status["a0"]["next_refresh_at"] == pytest.approx(now + 3600 - 60, abs=5)
+    assert 0 < wait <= 300
+
+    # nothing is due any more: a second pass makes no provider calls
+    asyncio.run(sched.run_once())
+    assert len(state["calls"]) == 4
+
+
+def test_failed_refresh_backs_off_exponentially(monkeypatch, db):
+    db.save("tiktok", "a", {"access_token": "old", "refresh_token": "r", "expires_at": time.time() + 30})
+    clock = [time.time()]
+
+    def failing(key, secret, refresh_token):
+        raise RuntimeError("provider down")
+
+    sched = _scheduler(monkeypatch, db, failing, backoff_base=10, max_backoff=25)
+    sched.clock = lambda: clock[0]
+    delays = []
+    for _ in range(3):
+        asyncio.run(sched.run_once())
+        t = sched.targets["a"]
+        delays.append(t.retry_at - clock[0])
+        clock[0] = t.retry_at
+    assert delays == [10, 20, 25]
+    assert sched.status()["a"]["failures"] == 3
+    assert "provider down" in sched.status()["a"]["last_error"]
+
+
+def test_health_exposes_refresh_schedule(monkeypatch, db, tmp_path):
+    from fastapi.testclient import TestClient
+    from src import tiktok_oauth_callback as svc
+    from src.config import Config
+
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    db.save("tiktok", "shop-1", {"access_token": "ok", "refresh_token": "r", "expires_at": time.time() + 200})
+    db.save("tiktok", "shop-2", {"access_token": "ok", "refresh_token": "r", "expires_at": time.time() + 7200})
+    sched = _scheduler(monkeypatch, db, lambda *a: {})
+    monkeypatch.setattr(token_refresh.RefreshScheduler, "from_env", classmethod(lambda cls: sched))
+
+    with TestClient(svc.app) as client:
+        for _ in range(100):
+            body = client.get("/health").json()
+            if body["token_refresh"]:
+                break
+            time.sleep(0.01)
+    assert body["status"] == "ok"
+    assert body["token_refresh"]["shop-1"]["next_refresh_at"] == pytest.approx(time.time() + 200 - 60, abs=5)
+    assert "shop-2" not in body["token_refresh"]  # not due before the next pass
+
+
+def test_scan_loads_only_accounts_in_the_refresh_window(monkeypatch, db):
+    now = time.time()
+    for i in range(20):
+        db.save("tiktok", f"far{i}", {"access_token": "ok", "refresh_token": "r", "expires_at": now + 86400})
+    db.save("tiktok", "soon", {"access_token": "ok", "refresh_token": "r", "expires_at": now + 200})
+    loads = []
+    load = db.load
+    monkeypatch.setattr(db, "load", lambda platform, account_id: loads.append(account_id) or load(platform, account_id))
+
+    sched = _scheduler(monkeypatch, db, lambda *a: {})
+    asyncio.run(sched.run_once())
+    asyncio.run(sched.run_once())
+
+    assert loads == ["soon"]  # the unchanged row is not decrypted again on the second pass
+    assert list(sched.status()) == ["soon"]
@@ -0,0 +1,85 @@
+import concurrent.futures
+import time
+
+from src import tracing
+from src.config import Config
+
+
+def _env(monkeypatch, tmp_path):
+    monkeypatch.setenv("TRACING", "1")
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+
+
+def test_spans_nest_across_thread_pools(monkeypatch, tmp_path):
+    _env(monkeypatch, tmp_path)
+
+    @tracing.traced("work.part")
+    def part(n):
+        time.sleep(0.001 * n)
+        return n
+
+    with tracing.item("42", title="t"):
+        with tracing.span("media.make_banner"):
+            pass
+        with concurrent.futures.ThreadPoolExecutor(2) as exe:
+            assert sorted(exe.map(tracing.wrap(part), [1, 2, 3])) == [1, 2, 3]
+    try:
+        with tracing.item("42"):  # the generator and runner passes share a trace
+            raise ValueError("boom")
+    except ValueError:
+        pass
+
+    spans = tracing.load_spans()
+    assert len({s["trace"] for s in spans}) == 1
+    roots = sorted((s for s in spans if s["name"] == "item"), key=lambda r: r["start"])
+    assert [r["status"] for r in roots] == ["ok", "error"]
+    parts = [s for s in spans if s["name"] == "work.part"]
+    assert len(parts) == 3 and {p["parent"] for p in parts} == {roots[0]["span"]}
+    assert {p["thread"] for p in parts} != {"MainThread"}
+
+
+def test_critical_path_and_summary(monkeypatch, tmp_path, capsys):
+    _env(monkeypatch, tmp_path)
+
+    def s(span, parent, name, start, end):
+        return {"trace": "t1", "span": span, "parent": parent, "name": name, "start": start, "end": end,
+                "dur": end - start, "status": "ok", "attrs": {"item_id": "7"} if name == "item" else {}}
+
+    spans = [
+        s("r", None, "item", 0, 10),
+        s("a", "r", "media.make_banner", 0, 2),
+        s("b", "r", "predictor.score", 1, 3),   # overlaps the banner, ends later
+        s("c", "r", "tiktok.upload", 3, 10),
+        s("d", "c", "tiktok.part", 3, 6),
+        s("e", "c", "tiktok.part", 3, 9),
+        s("f", "c", "tiktok.commit", 9, 10),
+    ]
+    path = [x["span"] for x in tracing.critical_path(spans)]
+    assert path == ["r", "b", "c", "e", "f"]
+
+    stats = tracing.stage_stats(spans)
+    assert stats["tiktok.part"]["count"] == 2 and stats["tiktok.part"]["p50"] == 3
+
+    assert tracing.percentile(list(range(1, 101)), 95) == 95
+    with tracing.item("1"):
+        pass
+    assert tracing.main(["summary", "--slowest", "1"]) == 0
+    assert "item" in capsys.readouterr().out
+
+
+def test_writer_batches_flushes_and_resolves_the_dated_dir_once(monkeypatch, tmp_path):
+    _env(monkeypatch, tmp_path)
+    monkeypatch.setattr(tracing._writer, "batch", 1000)
+    monkeypatch.setattr(tracing._writer, "interval", 3600)
+    calls = []
+    dated_dir = tracing.dated_dir
+    monkeypatch.setattr(tracing, "dated_dir", lambda *a: calls.append(a) or dated_dir(*a))
+
+    for _ in range(10):
+        with tracing.span("tiktok.hash_part"):
+            pass
+    [path] = list((tmp_path / "traces").rglob("spans-*.jsonl"))
+    assert len(calls) == 1
+    assert path.read_text() == ""  # still buffered
+    tracing.flush()
+    assert len(path.read_text().splitlines()) == 10
@@ -0,0 +1,113 @@
+import asyncio
+import hashlib
+import json
+import os
+import time
+
+import httpx
+
+from src.config import Config
+from src.upload_async import AsyncUploader
+
+
+class FakeTikTok:
+    """Async handler for httpx.MockTransport: init/part/commit with simulated latency."""
+
+    def __init__(self, part_size=4096, fail_once=()):
+        self.part_size = part_size
+        self.fail_once = set(fail_once)
+        self.parts = {}
+        self.inflight = 0
+        self.max_inflight = 0
+        self.commits = []
+        self.uploads = 0
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        path = request.url.path
+        if path == "/init":
+            self.uploads += 1
+            uid = f"u{self.uploads}"
+            return httpx.Response(200, json={"upload_id": uid, "part_size": self.part_size,
+                                             "upload_url_template": "http://upload.test/{upload_id}/{part_number}"})
+        if path == "/commit":
+            uid = json.loads(request.content)["upload_id"]
+            self.commits.append(uid)
+            return httpx.Response(200, json={"status": "committed", "upload_id": uid, "video_id": "v-" + uid})
+        _, uid, part = path.split("/")
+        self.inflight += 1
+        self.max_inflight = max(self.max_inflight, self.inflight)
+        try:
+            await asyncio.sleep(0.01)
+        finally:
+            self.inflight -= 1
+        if (uid, int(part)) in self.fail_once:
+            self.fail_once.discard((uid, int(part)))
+            return httpx.Response(503)
+        assert int(request.headers["Content-Length"]) == len(request.content)
+        boundary = request.headers["Content-Type"].split("boundary=")[1].encode()
+        data = request.content.split(b"\r\n\r\n", 1)[1].rsplit(b"\r\n--" + boundary + b"--\r\n", 1)[0]
+        md5 = hashlib.md5(data).hexdigest()
+        assert md5 == request.headers["X-Chunk-MD5"]
+        self.parts[(uid, int(part))] = data
+        return httpx.Response(200, json={"md5": md5})
+
+
+def _env(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setenv("TIKTOK_INIT_UPLOAD_URL", "http://api.test/init")
+    monkeypatch.setenv("TIKTOK_COMMIT_UPLOAD_URL", "http://api.test/commit")
+    monkeypatch.setenv("TIKTOK_PART_BACKOFF_BASE", "0")
+
+
+def test_many_videos_on_one_loop(monkeypatch, tmp_path):
+    _env(monkeypatch, tmp_path)
+    videos = []
+    for i in range(5):
+        f = tmp_path / f"v{i}.bin"
+        f.write_bytes(os.urandom(20_000 + i))
+        videos.append(f)
+    fake = FakeTikTok(fail_once=[("u1", 2)])
+
+    async def main():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(fake))
+        async with client, AsyncUploader(client=client, per_session=3, per_host=10, read_block=1000) as up:
+            return await asyncio.gather(*(up.upload(f"t{i}", str(v), "tok") for i, v in enumerate(videos)))
+
+    results = asyncio.run(main())
+    assert sorted(r["upload_id"] for r in results) == ["u1", "u2", "u3", "u4", "u5"]
+    assert 3 < fake.max_inflight <= 10
+    for r, v in zip(results, videos):
+        data = v.read_bytes()
+        got = b"".join(fake.parts[(r["upload_id"], n)] for n in range(1, 6 + 1) if (r["upload_id"], n) in fake.parts)
+        assert got == data
+    assert list((tmp_path / "publish_metrics").rglob("commit_*.json"))
+
+
+def test_service_runs_upload_in_process(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    from src import tiktok_oauth_callback as svc
+
+    _env(monkeypatch, tmp_path)
+    f = tmp_path / "v.bin"
+    f.write_bytes(os.urandom(10_000))
+    fake = FakeTikTok()
+
+    monkeypatch.setenv("SERVICE_API_KEY", "k")
+    with TestClient(svc.app) as client:
+        svc.app.state.uploader = AsyncUploader(client=httpx.AsyncClient(transport=httpx.MockTransport(fake)))
+        body = {"video_path": str(f), "title": "x"}
+        assert client.post("/uploads", json=body).status_code == 401
+        assert client.post("/uploads", json=body, headers={"X-API-Key": "wrong"}).status_code == 401
+        client.headers["X-API-Key"] = "k"
+        assert client.post("/uploads", json={"video_path": "/etc/passwd", "access_token": "t"}).status_code == 400
+        job = client.post("/uploads", json=dict(body, access_token="t")).json()["upload"]
+        for _ in range(200):
+            status = client.get(f"/uploads/{job}").json()
+            if status["status"] != "running":
+                break
+            time.sleep(0.01)
+        monkeypatch.setenv("UPLOAD_STATUS_TTL", "0")  # finished entries are forgotten after the TTL
+        assert client.get(f"/uploads/{job}").status_code == 404
+    assert status["status"] == "committed"
+    assert status["result"]["video_id"] == "v-u1"
+    assert svc.app.state.uploader is None
@@ -0,0 +1,86 @@
+import hashlib
+import os
+
+from src import upload_hashing
+from src.poster_tiktok_api import ChunkedUpload, Config
+
+
+def test_hash_parts_matches_hashlib_and_digest_is_order_stable():
+    data = os.urandom(10_000)
+    parts = [(1, 0, 4096), (2, 4096, 4096), (3, 8192, 1808)]
+    md5s = upload_hashing.hash_parts(data, parts, workers=3)
+    assert md5s == {str(n): hashlib.md5(data[o:o + l]).hexdigest() for n, o, l in parts}
+    assert upload_hashing.hash_parts(data, parts, workers=1) == md5s
+
+    shuffled = {k: md5s[k] for k in ("3", "1", "2")}
+    assert upload_hashing.file_digest(4096, shuffled) == upload_hashing.file_digest(4096, md5s)
+    assert upload_hashing.file_digest(2048, md5s) != upload_hashing.file_digest(4096, md5s)
+
+
+def _fake_session(monkeypatch, tmp_path, sent, failing):
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setattr("src.poster_tiktok_api.initiate_upload_session",
+                        lambda token, size: {"upload_id": "u-hash", "part_size": 4096,
+                                             "upload_url_template": "https://x/{upload_id}/{part_number}"})
+
+    def fake_chunk(url, chunk, part_number, headers=None):
+        sent.append(part_number)
+        if part_number in failing:
+            raise RuntimeError("drop")
+        return {"md5": headers["X-Chunk-MD5"]}
+
+    monkeypatch.setattr("src.poster_tiktok_api.upload_chunk", fake_chunk)
+    monkeypatch.setenv("TIKTOK_PART_MAX_RETRIES", "1")
+    monkeypatch.setenv("TIKTOK_PART_BACKOFF_BASE", "0")
+
+
+def _attempt(path):
+    upload = ChunkedUpload("t", str(path), "tok").start()
+    try:
+        for part in upload.pending_parts:
+            try:
+                upload.upload_part(part)
+            except RuntimeError:
+                pass
+        return upload, sorted(upload.pending_parts)
+    finally:
+        upload.close()
+
+
+def test_resume_trusts_manifest_when_file_unchanged(monkeypatch, tmp_path):
+    f = tmp_path / "v.bin"
+    f.write_bytes(os.urandom(10_000))
+    sent, failing = [], {2}
+    _fake_session(monkeypatch, tmp_path, sent, failing)
+
+    first, pending = _attempt(f)
+    assert [p[0] for p in pending] == [2]
+
+    failing.clear()
+    calls = []
+    monkeypatch.setattr(upload_hashing, "hash_parts", lambda *a, **k: calls.append(a) or {})
+    second, pending = _attempt(f)
+    assert calls == []  # nothing re-read on resume
+    assert pending == []
+    assert second.file_digest == first.file_digest
+    assert sent[-1] == 2
+
+
+def test_resume_resends_parts_changed_on_disk(monkeypatch, tmp_path):
+    f = tmp_path / "v.bin"
+    data = bytearray(os.urandom(10_000))
+    f.write_bytes(bytes(data))
+    sent, failing = [], {2}
+    _fake_session(monkeypatch, tmp_path, sent, failing)
+    first, _ = _attempt(f)
+
+    data[0] ^= 0xFF  # part 1 changes, part 3 does not
+    f.write_bytes(bytes(data))
+    st = os.stat(f)
+    os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    del sent[:]
+    failing.clear()
+    second, pending = _attempt(f)
+    assert sorted(sent) == [1, 2]
+    assert second.file_digest != first.file_digest
+    assert pending == []
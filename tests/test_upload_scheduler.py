@@ -0,0 +1,106 @@
+import time
+import threading
+
+from src.config import Config
+from src.upload_scheduler import UploadScheduler
+
+
+def _setup(monkeypatch, tmp_path, fail_upload_id=None):
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    monkeypatch.setenv("TIKTOK_PART_BACKOFF_BASE", "0")
+    monkeypatch.setenv("TIKTOK_PART_MAX_RETRIES", "1")
+    counter = iter(range(1000))
+    lock = threading.Lock()
+    events = []
+
+    def fake_initiate(access_token, file_size):
+        with lock:
+            return {"upload_id": f"u{next(counter)}", "part_size": 1000, "upload_url_template": "http://x/{upload_id}/{part_number}"}
+
+    def fake_upload_chunk(url, data, part_number, headers=None):
+        uid = url.split("/")[-2]
+        if uid == fail_upload_id:
+            raise RuntimeError("boom")
+        time.sleep(0.005)
+        with lock:
+            events.append(("part", uid, part_number))
+        return {"ok": True}
+
+    def fake_commit(access_token, upload_id):
+        with lock:
+            events.append(("commit", upload_id, None))
+        return {"status": "committed", "upload_id": upload_id}
+
+    monkeypatch.setattr("src.poster_tiktok_api.initiate_upload_session", fake_initiate)
+    monkeypatch.setattr("src.poster_tiktok_api.upload_chunk", fake_upload_chunk)
+    monkeypatch.setattr("src.poster_tiktok_api.commit_upload", fake_commit)
+    videos = []
+    for i in range(5):
+        v = tmp_path / f"v{i}.bin"
+        v.write_bytes(bytes([i]) * 4500)
+        videos.append(str(v))
+    return videos, events
+
+
+def test_scheduler_interleaves_and_commits_each_video(monkeypatch, tmp_path):
+    videos, events = _setup(monkeypatch, tmp_path)
+    sched = UploadScheduler(workers=4, max_sessions=2)
+    futs = [sched.submit("t", v, "tok", priority=i) for i, v in enumerate(videos)]
+    results = [f.result(timeout=10) for f in futs]
+    sched.shutdown()
+
+    assert sorted(r["upload_id"] for r in results) == [f"u{i}" for i in range(5)]
+    for uid in (r["upload_id"] for r in results):
+        parts = [i for i, e in enumerate(events) if e[:2] == ("part", uid)]
+        commit = events.index(("commit", uid, None))
+        assert len(parts) == 5 and max(parts) < commit
+
+
+def test_scheduler_enforces_bandwidth_budget(monkeypatch, tmp_path):
+    videos, _ = _setup(monkeypatch, tmp_path)
+    sched = UploadScheduler(workers=8, max_sessions=5, bytes_per_sec=100000)
+    t0 = time.monotonic()
+    for f in [sched.submit("t", v, "tok") for v in videos]:
+        f.result(timeout=10)
+    sched.shutdown()
+    # 5 x 4500 bytes at 100 kB/s cannot finish faster than ~0.2s
+    assert time.monotonic() - t0 >= 0.2
+
+
+def test_failed_job_does_not_block_others(monkeypatch, tmp_path):
+    videos, events = _setup(monkeypatch, tmp_path, fail_upload_id="u0")
+    sched = UploadScheduler(workers=4, max_sessions=1)
+    futs = [sched.submit("t", v, "tok") for v in videos[:3]]
+    try:
+        futs[0].result(timeout=10)
+        assert False, "expected failure"
+    except RuntimeError:
+        pass
+    assert futs[1].result(timeout=10)["status"] == "committed"
+    assert futs[2].result(timeout=10)["status"] == "committed"
+    sched.shutdown()
+    assert ("commit", "u0", None) not in events
+
+
+def test_failed_part_is_never_committed_even_if_its_callback_is_late(monkeypatch, tmp_path):
+    videos, events = _setup(monkeypatch, tmp_path, fail_upload_id="u0")
+    with open(videos[0], "wb") as f:
+        f.write(b"x" * 500)  # one part, so u0 is drained as soon as it fails
+    sched = UploadScheduler(workers=2, max_sessions=2)
+    done = sched._done
+
+    def late_done(job, fut):
+        if fut.exception() is not None:
+            time.sleep(0.2)  # other jobs' callbacks pump in the meantime
+        done(job, fut)
+
+    monkeypatch.setattr(sched, "_done", late_done)
+    futs = [sched.submit("t", v, "tok", priority=-i) for i, v in enumerate(videos[:2])]
+    try:
+        futs[0].result(timeout=10)
+        assert False, "expected failure"
+    except RuntimeError:
+        pass
+    assert futs[1].result(timeout=10)["status"] == "committed"
+    sched.shutdown()
+    assert ("commit", "u0", None) not in events
@@ -0,0 +1,87 @@
+import os
+import itertools
+
+from src.poster_tiktok_api import ChunkedUpload, Config
+from src.upload_sessions import SessionIndex
+
+
+def _setup(monkeypatch, tmp_path):
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    ids = itertools.count(1)
+    inits, sent, failing = [], [], {3}
+
+    def fake_init(token, size):
+        inits.append(size)  # every call hands out a new upload_id, like the real API
+        return {"upload_id": f"u{next(ids)}", "part_size": 4096, "upload_url_template": "https://x/{upload_id}/{part_number}"}
+
+    def fake_chunk(url, chunk, part_number, headers=None):
+        sent.append((url.split("/")[-2], part_number))
+        if part_number in failing:
+            raise RuntimeError("drop")
+        return {"md5": headers["X-Chunk-MD5"]}
+
+    monkeypatch.setattr("src.poster_tiktok_api.initiate_upload_session", fake_init)
+    monkeypatch.setattr("src.poster_tiktok_api.upload_chunk", fake_chunk)
+    monkeypatch.setattr("src.poster_tiktok_api.commit_upload", lambda tok, uid: {"status": "committed", "upload_id": uid})
+    monkeypatch.setenv("TIKTOK_PART_MAX_RETRIES", "1")
+    monkeypatch.setenv("TIKTOK_PART_BACKOFF_BASE", "0")
+    return inits, sent, failing
+
+
+def _run(path, finish=False):
+    upload = ChunkedUpload("t", str(path), "tok").start()
+    try:
+        for part in upload.pending_parts:
+            try:
+                upload.upload_part(part)
+            except RuntimeError:
+                pass
+        return upload.finish() if finish else upload.upload_id
+    finally:
+        upload.close()
+
+
+def test_restart_reuses_live_session_and_sends_only_missing_parts(monkeypatch, tmp_path):
+    f = tmp_path / "v.bin"
+    f.write_bytes(os.urandom(10_000))
+    inits, sent, failing = _setup(monkeypatch, tmp_path)
+
+    assert _run(f) == "u1"
+    failing.clear()
+    del sent[:]
+    # same content, different mtime: confirmed by hashing, not by fingerprint
+    st = os.stat(f)
+    os.utime(f, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+    assert _run(f, finish=True) == {"status": "committed", "upload_id": "u1"}
+    assert inits == [10_000]
+    assert sent == [("u1", 3)]
+    assert SessionIndex().candidates("default", 10_000) == []  # forgotten on commit
+
+
+def test_expired_or_changed_content_gets_a_fresh_session(monkeypatch, tmp_path):
+    f = tmp_path / "v.bin"
+    f.write_bytes(os.urandom(10_000))
+    inits, sent, failing = _setup(monkeypatch, tmp_path)
+
+    monkeypatch.setenv("TIKTOK_UPLOAD_SESSION_TTL", "-1")
+    assert _run(f) == "u1"
+    assert _run(f) == "u2"
+
+    monkeypatch.setenv("TIKTOK_UPLOAD_SESSION_TTL", "3600")
+    assert _run(f) == "u3"
+    f.write_bytes(os.urandom(10_000))
+    assert _run(f) == "u4"
+    assert len(inits) == 4
+
+
+def test_concurrent_writers_keep_each_others_entries(tmp_path):
+    path = tmp_path / "upload_sessions.db"
+    # separate connections, as the runner, job workers and service have
+    a, b = SessionIndex(path), SessionIndex(path)
+    a.record("default", 7, "da", {"upload_id": "ua", "part_size": 4096})
+    b.record("default", 7, "db", {"upload_id": "ub", "part_size": 4096}, fingerprint=[7, 2])
+    ids = [e["upload_id"] for e in SessionIndex(path).candidates("default", 7)]
+    assert sorted(ids) == ["ua", "ub"]
+    b.forget("ua")
+    assert [e["fingerprint"] for e in a.candidates("default", 7) if e["upload_id"] == "ub"] == [[7, 2]]
+    assert "ua" not in [e["upload_id"] for e in a.candidates("default", 7)]
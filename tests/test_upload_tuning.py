@@ -0,0 +1,48 @@
+from src.upload_tuning import MB, AdaptiveConcurrency, choose_part_size
+
+
+def _fake_clock(monkeypatch):
+    # one tick per round evaluation keeps per-round throughput deterministic
+    ticks = iter(range(10 ** 6))
+    monkeypatch.setattr("src.upload_tuning.time.monotonic", lambda: float(next(ticks)))
+
+
+def test_additive_increase_and_bounds(monkeypatch):
+    _fake_clock(monkeypatch)
+    c = AdaptiveConcurrency(min_limit=1, max_limit=4, initial=2)
+    for _ in range(40):
+        c.record_success(1000)
+    assert c.limit == 4
+    assert [lim for _, lim in c.timeline] == [2, 3, 4]
+
+
+def test_throughput_drop_backs_off(monkeypatch):
+    _fake_clock(monkeypatch)
+    c = AdaptiveConcurrency(min_limit=1, max_limit=16, initial=4)
+    for _ in range(4):
+        c.record_success(100000)
+    assert c.limit == 5
+    for _ in range(5):
+        c.record_success(1000)
+    assert c.limit == 3
+
+
+def test_errors_halve_concurrency(monkeypatch):
+    _fake_clock(monkeypatch)
+    c = AdaptiveConcurrency(min_limit=1, max_limit=16, initial=8)
+    for _ in range(7):
+        c.record_success(1000)
+    c.record_failure()
+    assert c.limit == 4
+    stats = c.stats()
+    assert stats["retries"] == 1
+    assert stats["parts"] == 7
+    assert stats["concurrency_timeline"][-1][1] == 4
+
+
+def test_choose_part_size_clamps(monkeypatch):
+    monkeypatch.delenv("TIKTOK_PART_SIZE_MIN", raising=False)
+    monkeypatch.delenv("TIKTOK_PART_SIZE_MAX", raising=False)
+    assert choose_part_size(1 * MB, 4) == 5 * MB
+    assert choose_part_size(10 * 1024 * MB, 4) == 64 * MB
+    assert choose_part_size(320 * MB, 4) == 20 * MB
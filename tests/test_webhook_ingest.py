@@ -0,0 +1,63 @@
+import asyncio
+import json
+
+from src.config import Config
+from src import webhook_ingest
+
+
+def test_extract_ids_reads_nested_content():
+    payload = {"event": "post.publish.complete", "content": json.dumps({"publish_id": "p1", "post_id": "v9"})}
+    assert webhook_ingest.extract_ids(payload) == ("post.publish.complete", "p1", "v9")
+    assert webhook_ingest.extract_ids({"upload_id": "u1", "video_id": "v1"}) == (None, "u1", "v1")
+    assert webhook_ingest.extract_ids(["not", "a", "dict"]) == (None, None, None)
+
+
+def test_bounded_queue_rejects_then_flushes_everything_on_stop(tmp_path):
+    db = str(tmp_path / "publish.db")
+
+    async def main():
+        ing = webhook_ingest.WebhookIngestor(db_path=db, max_queue=5, batch_size=2)
+        accepted = [ing.offer({"upload_id": f"u{i}"}) for i in range(8)]  # writer hasn't run yet
+        await ing.stop()
+        return accepted, ing
+
+    accepted, ing = asyncio.run(main())
+    assert accepted == [True] * 5 + [False] * 3
+    assert ing.written == 5 and ing.rejected == 3
+    assert [e["upload_id"] for e in webhook_ingest.events_for(db_path=db)] == ["u0", "u1", "u2", "u3", "u4"]
+
+
+def test_service_acknowledges_and_persists_every_callback(monkeypatch, tmp_path):
+    from fastapi.testclient import TestClient
+    from src import tiktok_oauth_callback as svc
+
+    monkeypatch.setattr(Config, "OUTPUT_DIR", str(tmp_path))
+    with TestClient(svc.app) as client:
+        for i in range(300):
+            r = client.post("/tiktok/webhook", json={"publish_id": f"p{i % 3}", "video_id": f"v{i}", "n": i})
+            assert r.status_code == 200
+        assert client.post("/tiktok/webhook", content=b"{nope").status_code == 400
+    # shutdown flushed the queue
+    events = webhook_ingest.events_for(upload_id="p1", db_path=str(tmp_path / "publish.db"))
+    assert len(events) == 100
+    assert [e["payload"]["n"] for e in events] == list(range(1, 300, 3))
+
+
+def test_unwritable_batches_go_to_the_fallback_file_and_stop_returns(monkeypatch, tmp_path):
+    monkeypatch.setenv("WEBHOOK_WRITE_RETRIES", "2")
+
+    def broken(self, batch):
+        raise OSError("disk full")
+
+    monkeypatch.setattr(webhook_ingest.WebhookIngestor, "_write", broken)
+
+    async def main():
+        ing = webhook_ingest.WebhookIngestor(db_path=str(tmp_path / "publish.db"), max_queue=3, batch_size=2)
+        assert all(ing.offer({"upload_id": f"u{i}"}) for i in range(3))  # queue full
+        await asyncio.wait_for(ing.stop(), timeout=5)
+        return ing
+
+    ing = asyncio.run(main())
+    assert ing.written == 0 and ing.fallback == 3
+    lines = [json.loads(l) for l in (tmp_path / "webhook_failed.jsonl").read_text().splitlines()]
+    assert [l["payload"]["upload_id"] for l in lines] == ["u0", "u1", "u2"]
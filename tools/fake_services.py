@@ -0,0 +1,439 @@
+"""Stand-in Shopee, OpenAI and TikTok endpoints for local load testing.
+
+One process serves everything the runner talks to, so a full `--run` needs no
+partner credentials:
+
+    /shopee/items/popular | search | get           ShopeeClient (GET)
+    /shopee/items/generate_affiliate                ShopeeClient (POST)
+    /img/<image>                                    product images (ETag / 304)
+    /openai/v1/chat/completions                     OpenAIClient (openai SDK)
+    /tiktok/oauth/token/                            code exchange and refresh
+    /tiktok/upload/init                             -> upload_id, part_size, upload_url_template
+    /tiktok/upload/<upload_id>/part/<n>             MD5 checked against X-Chunk-MD5
+    /tiktok/upload/commit                           400 until every part is acknowledged
+    /tiktok/upload/video                            single-request upload (post_video)
+    /_stats                                         request counts per endpoint and outcome
+
+Every endpoint has a name (shopee.popular, openai.chat, tiktok.part, ...).
+Latency, error (500) and throttling (429 with Retry-After) are configured per
+name or name prefix, the most specific rule winning:
+
+    python tools/fake_services.py --port 8900 \\
+        --latency shopee=lognormal:0.08,0.5 --latency openai=uniform:0.3,1.2 \\
+        --latency tiktok.part=normal:0.05,0.02 --error-rate tiktok.part=0.01 \\
+        --throttle-rate shopee=0.02
+
+Latency specs: `0.05` / `fixed:S`, `uniform:LO,HI`, `normal:MEAN,SD`,
+`lognormal:MEDIAN,SIGMA`, `exp:MEAN` (seconds). `env_for(base_url)` returns
+the environment that points the app at a running instance.
+"""
+import io
+import re
+import sys
+import json
+import math
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+from urllib.parse import parse_qs, urlparse
+
+from PIL import Image
+
+_IMAGE_SIZE = 96
+
+
+def parse_latency(spec: str):
+    """Return a sampler `rng -> seconds` for a latency spec."""
+    kind, _, args = spec.partition(":")
+    if not args:
+        kind, args = "fixed", kind
+    try:
+        vals = [float(v) for v in args.split(",")]
+        if kind == "fixed":
+            (s,) = vals
+            return lambda rng: s
+        if kind == "uniform":
+            lo, hi = vals
+            return lambda rng: rng.uniform(lo, hi)
+        if kind == "normal":
+            mean, sd = vals
+            return lambda rng: max(0.0, rng.gauss(mean, sd))
+        if kind == "lognormal":
+            median, sigma = vals
+            mu = math.log(median)
+            return lambda rng: rng.lognormvariate(mu, sigma)
+        if kind == "exp":
+            (mean,) = vals
+            return lambda rng: rng.expovariate(1.0 / mean)
+    except ValueError:
+        pass
+    raise ValueError(f"bad latency spec {spec!r}")
+
+
+def _rules(pairs, convert) -> Dict[str, object]:
+    out = {}
+    for pair in pairs or ():
+        name, sep, value = pair.partition("=")
+        if not sep:
+            raise ValueError(f"expected NAME=VALUE, got {pair!r}")
+        out[name.strip() or "*"] = convert(value.strip())
+    return out
+
+
+class Faults:
+    """Per-endpoint latency, error and throttle rules, matched by longest name prefix."""
+
+    def __init__(self, latency=None, error_rate=None, throttle_rate=None, seed: Optional[int] = None):
+        self.latency = _rules(latency, parse_latency)
+        self.error_rate = _rules(error_rate, float)
+        self.throttle_rate = _rules(throttle_rate, float)
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _lookup(rules: dict, name: str, default=None):
+        parts = name.split(".")
+        for i in range(len(parts), 0, -1):
+            key = ".".join(parts[:i])
+            if key in rules:
+                return rules[key]
+        return rules.get("*", default)
+
+    def decide(self, name: str):
+        """(delay seconds, injected status or None) for one request."""
+        with self._lock:
+            sampler = self._lookup(self.latency, name)
+            delay = sampler(self._rng) if sampler else 0.0
+            roll = self._rng.random()
+        throttle = self._lookup(self.throttle_rate, name, 0.0)
+        if roll < throttle:
+            return delay, 429
+        if roll < throttle + self._lookup(self.error_rate, name, 0.0):
+            return delay, 500
+        return delay, None
+
+
+def _seed(text: str) -> int:
+    return int(hashlib.md5(text.encode("utf-8")).hexdigest()[:8], 16)
+
+
+def _catalogue_item(n: int) -> dict:
+    rng = random.Random(n)
+    return {
+        "itemid": n,
+        "shopid": 1000 + n % 97,
+        "name": f"Load test product {n}",
+        "price": rng.randrange(10, 5000) * 100000,
+        "images": [f"img-{n}"],
+        "sold": rng.randrange(0, 10000),
+    }
+
+
+def _image(name: str) -> bytes:
+    # seeded noise: a distinct photo per item, as real listings have
+    rng = random.Random(name)
+    im = Image.frombytes("RGB", (_IMAGE_SIZE, _IMAGE_SIZE), rng.randbytes(_IMAGE_SIZE * _IMAGE_SIZE * 3))
+    buf = io.BytesIO()
+    im.save(buf, "JPEG", quality=80)
+    return buf.getvalue()
+
+
+def _multipart_payload(body: bytes, content_type: str) -> bytes:
+    """File bytes of a single-field multipart/form-data body (what upload_chunk sends)."""
+    m = re.search(r"boundary=([^;]+)", content_type or "")
+    if not m:
+        return body
+    boundary = m.group(1).strip('"').encode("ascii")
+    start = body.find(b"\r\n\r\n")
+    end = body.rfind(b"\r\n--" + boundary + b"--")
+    if start < 0 or end < start:
+        raise ValueError("malformed multipart body")
+    return body[start + 4:end]
+
+
+class FakeServices:
+    """State of the fake providers; `serve()` runs them on a ThreadingHTTPServer."""
+
+    def __init__(self, faults: Optional[Faults] = None, part_size: int = 5 * 1024 * 1024, catalogue: int = 100000):
+        self.faults = faults or Faults()
+        self.part_size = part_size
+        self.catalogue = catalogue
+        self.stats = Counter()  # (endpoint, status) -> requests
+        self.uploads = {}  # upload_id -> {"parts": n, "acked": {part: md5}, "committed": bool}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    # -- lifecycle --
+
+    def serve(self, host: str = "127.0.0.1", port: int = 0, background: bool = True) -> str:
+        services = self
+
+        class Handler(_Handler):
+            app = services
+
+        self._server = _Server((host, port), Handler)
+        if background:
+            self._thread = threading.Thread(target=self._server.serve_forever, name="fake-services", daemon=True)
+            self._thread.start()
+        return self.base_url
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def shutdown(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {f"{name} {status}": n for (name, status), n in sorted(self.stats.items())}
+
+    def record(self, name: str, status: int):
+        with self._lock:
+            self.stats[(name, status)] += 1
+
+    # -- endpoints: each returns (status, json body) --
+
+    def shopee_popular(self, query, body, headers):
+        limit = min(int((query.get("limit") or ["20"])[0]), self.catalogue)
+        return 200, {"items": [_catalogue_item(n) for n in range(1, limit + 1)]}
+
+    def shopee_search(self, query, body, headers):
+        limit = min(int((query.get("limit") or ["20"])[0]), self.catalogue)
+        seed = _seed((query.get("q") or [""])[0])
+        return 200, {"items": [_catalogue_item((seed + n) % self.catalogue + 1) for n in range(limit)]}
+
+    def shopee_get(self, query, body, headers):
+        ids = [i for i in (query.get("item_ids") or [""])[0].split(",") if i.isdigit()]
+        return 200, {"items": [_catalogue_item(int(i)) for i in ids]}
+
+    def shopee_affiliate(self, query, body, headers):
+        j = json.loads(body or b"{}")
+        return 200, {"affiliate_link": f"https://s.shopee.test/{j.get('shopid')}/{j.get('item_id')}?af={j.get('partner_id')}"}
+
+    def openai_chat(self, query, body, headers):
+        j = json.loads(body or b"{}")
+        prompt = (j.get("messages") or [{}])[-1].get("content", "")
+        text = f"Deal of the day! {prompt[:40].strip()} Shop now #sale #deal"
+        tokens = len(prompt.split())
+        return 200, {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": j.get("model", "fake"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": tokens, "completion_tokens": 12, "total_tokens": tokens + 12},
+        }
+
+    def tiktok_token(self, query, body, headers):
+        form = {k: v[0] for k, v in parse_qs(body.decode("utf-8")).items()}
+        if form.get("grant_type") not in ("authorization_code", "refresh_token"):
+            return 400, {"error": "unsupported_grant_type"}
+        return 200, {"access_token": f"act.{uuid.uuid4().hex}", "refresh_token": f"rft.{uuid.uuid4().hex}",
+                     "expires_in": 86400, "refresh_expires_in": 31536000, "open_id": "fake-open-id",
+                     "scope": "user.info.basic,video.upload", "token_type": "Bearer"}
+
+    def tiktok_init(self, query, body, headers):
+        j = json.loads(body or b"{}")
+        file_size = int(j.get("file_size") or 0)
+        part_size = int(j.get("part_size") or self.part_size)
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self.uploads[upload_id] = {"parts": max(1, math.ceil(file_size / part_size)), "acked": {}, "committed": False}
+        return 200, {"upload_id": upload_id, "part_size": part_size,
+                     "upload_url_template": f"{self.base_url}/tiktok/upload/{{upload_id}}/part/{{part_number}}"}
+
+    def tiktok_part(self, query, body, headers, upload_id, part_number):
+        data = _multipart_payload(body, headers.get("Content-Type"))
+        md5 = hashlib.md5(data).hexdigest()
+        expected = headers.get("X-Chunk-MD5")
+        if expected and expected != md5:
+            return 400, {"error": "checksum_mismatch", "part": part_number, "md5": md5}
+        with self._lock:
+            upload = self.uploads.get(upload_id)
+            if upload is None:
+                return 404, {"error": "unknown_upload_id"}
+            upload["acked"][part_number] = md5
+        return 200, {"part": part_number, "md5": md5, "size": len(data)}
+
+    def tiktok_commit(self, query, body, headers):
+        upload_id = json.loads(body or b"{}").get("upload_id")
+        with self._lock:
+            upload = self.uploads.get(upload_id)
+            if upload is None:
+                return 404, {"error": "unknown_upload_id"}
+            missing = [n for n in range(1, upload["parts"] + 1) if n not in upload["acked"]]
+            if missing:
+                return 400, {"status": "error", "message": f"missing parts {missing[:20]}"}
+            upload["committed"] = True
+        return 200, {"status": "ok", "video_id": f"v{upload_id[:16]}", "upload_id": upload_id}
+
+    def tiktok_video(self, query, body, headers):
+        return 200, {"status": "ok", "video_id": f"v{uuid.uuid4().hex[:16]}"}
+
+    # -- routing --
+
+    _ROUTES = [
+        ("GET", re.compile(r"/shopee/items/popular$"), "shopee.popular", "shopee_popular"),
+        ("GET", re.compile(r"/shopee/items/search$"), "shopee.search", "shopee_search"),
+        ("GET", re.compile(r"/shopee/items/get$"), "shopee.get", "shopee_get"),
+        ("POST", re.compile(r"/shopee/items/generate_affiliate$"), "shopee.affiliate", "shopee_affiliate"),
+        ("POST", re.compile(r"/openai/v1/chat/completions$"), "openai.chat", "openai_chat"),
+        ("POST", re.compile(r"/tiktok/oauth/token/?$"), "tiktok.token", "tiktok_token"),
+        ("POST", re.compile(r"/tiktok/upload/init$"), "tiktok.init", "tiktok_init"),
+        ("POST", re.compile(r"/tiktok/upload/(?P<upload_id>\w+)/part/(?P<part_number>\d+)$"), "tiktok.part", "tiktok_part"),
+        ("POST", re.compile(r"/tiktok/upload/commit$"), "tiktok.commit", "tiktok_commit"),
+        ("POST", re.compile(r"/tiktok/upload/video$"), "tiktok.video", "tiktok_video"),
+    ]
+
+    def route(self, method: str, path: str):
+        for m, pattern, name, handler in self._ROUTES:
+            match = pattern.match(path)
+            if m == method and match:
+                kwargs = match.groupdict()
+                if "part_number" in kwargs:
+                    kwargs["part_number"] = int(kwargs["part_number"])
+                return name, getattr(self, handler), kwargs
+        return None, None, None
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 256  # load runs open many pooled connections at once
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive for the clients' pooled sessions
+    app: FakeServices = None
+
+    def log_message(self, fmt, *args):
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str = "application/json", headers: Optional[dict] = None):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if self.command != "HEAD":
+            self.wfile.write(body)
+
+    def _json(self, status: int, obj, headers: Optional[dict] = None):
+        self._send(status, json.dumps(obj).encode("utf-8"), headers=headers)
+
+    def _handle(self):
+        url = urlparse(self.path)
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+
+        if url.path == "/_stats":
+            return self._json(200, self.app.snapshot())
+        if url.path.startswith("/img/") and self.command in ("GET", "HEAD"):
+            return self._image(url.path[len("/img/"):])
+
+        name, handler, kwargs = self.app.route(self.command, url.path)
+        if handler is None:
+            return self._json(404, {"error": "not_found", "path": url.path})
+        delay, injected = self.app.faults.decide(name)
+        if delay:
+            time.sleep(delay)
+        if injected == 429:
+            self.app.record(name, 429)
+            return self._json(429, {"error": "rate_limited"}, headers={"Retry-After": "1"})
+        if injected:
+            self.app.record(name, injected)
+            return self._json(injected, {"error": "injected_failure"})
+        try:
+            status, payload = handler(parse_qs(url.query), body, self.headers, **kwargs)
+        except (ValueError, KeyError) as e:
+            status, payload = 400, {"error": str(e)}
+        self.app.record(name, status)
+        self._json(status, payload)
+
+    def _image(self, name: str):
+        delay, injected = self.app.faults.decide("image")
+        if delay:
+            time.sleep(delay)
+        if injected:
+            self.app.record("image", injected)
+            return self._json(injected, {"error": "injected_failure"})
+        etag = f'"{_seed(name):08x}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.app.record("image", 304)
+            return self._send(304, b"", headers={"ETag": etag})
+        self.app.record("image", 200)
+        self._send(200, _image(name), content_type="image/jpeg", headers={"ETag": etag, "Cache-Control": "max-age=3600"})
+
+    do_GET = do_POST = do_PUT = do_HEAD = _handle
+
+
+def env_for(base_url: str) -> Dict[str, str]:
+    """Environment pointing ShopeeClient, the openai SDK and the TikTok poster at `base_url`."""
+    return {
+        "SHOPEE_API_BASE": f"{base_url}/shopee",
+        "SHOPEE_PARTNER_ID": "fake-partner",
+        "SHOPEE_PARTNER_KEY": "fake-partner-key",
+        "SHOPEE_IMAGE_URL_TEMPLATE": f"{base_url}/img/{{image}}",
+        "OPENAI_API_KEY": "sk-fake",
+        "OPENAI_CAPTIONS": "1",
+        "OPENAI_BASE_URL": f"{base_url}/openai/v1",
+        "TIKTOK_CLIENT_KEY": "fake-client-key",
+        "TIKTOK_CLIENT_SECRET": "fake-client-secret",
+        "TIKTOK_TOKEN_URL": f"{base_url}/tiktok/oauth/token/",
+        "TIKTOK_REFRESH_URL": f"{base_url}/tiktok/oauth/token/",
+        "TIKTOK_INIT_UPLOAD_URL": f"{base_url}/tiktok/upload/init",
+        "TIKTOK_COMMIT_UPLOAD_URL": f"{base_url}/tiktok/upload/commit",
+        "TIKTOK_UPLOAD_URL": f"{base_url}/tiktok/upload/video",
+    }
+
+
+def add_fault_arguments(p: argparse.ArgumentParser):
+    p.add_argument("--latency", action="append", default=[], metavar="NAME=SPEC",
+                   help="latency for an endpoint name or prefix (shopee, tiktok.part, *), e.g. openai=uniform:0.3,1.2")
+    p.add_argument("--error-rate", action="append", default=[], metavar="NAME=P", help="fraction of requests answered 500")
+    p.add_argument("--throttle-rate", action="append", default=[], metavar="NAME=P", help="fraction of requests answered 429")
+    p.add_argument("--seed", type=int, default=None)
+    p.add_argument("--part-size", type=int, default=5 * 1024 * 1024, help="part size returned by upload init when the client sends no hint")
+
+
+def faults_from_args(args) -> Faults:
+    return Faults(args.latency, args.error_rate, args.throttle_rate, seed=args.seed)
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python tools/fake_services.py")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, default=8900)
+    add_fault_arguments(p)
+    args = p.parse_args(argv)
+
+    services = FakeServices(faults_from_args(args), part_size=args.part_size)
+    base = services.serve(args.host, args.port, background=False)
+    print(f"fake services on {base}; point the app at them with:")
+    for k, v in env_for(base).items():
+        print(f"  {k}={v}")
+    try:
+        services.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        services.shutdown()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
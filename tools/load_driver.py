@@ -0,0 +1,117 @@
+"""Run the full runner pipeline against tools/fake_services and report throughput.
+
+Starts the fake Shopee/OpenAI/TikTok server in this process, runs
+`python -m src.runner --run` (or `--dry-run`) as a child process pointed at
+it, with MAX_PRODUCTS items and every output (database, token store, traces,
+artifacts) inside a scratch work directory, then prints:
+
+  - wall time and items/s by final item status,
+  - per-stage p50/p95/p99 and the slowest items' critical paths (src.tracing),
+  - requests per fake endpoint and status.
+
+    python tools/load_driver.py --items 10000
+    python tools/load_driver.py --items 500 --dry-run --latency openai=uniform:0.3,1.2 --throttle-rate shopee=0.02
+
+Latency and fault flags are the same as tools/fake_services.py. The report is
+also written to <workdir>/load_report.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from collections import Counter
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from src import tracing  # noqa: E402
+from tools import fake_services  # noqa: E402
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+
+def run_env(base_url: str, workdir: str, items: int, run_id: str) -> dict:
+    env = dict(os.environ)
+    env.update(fake_services.env_for(base_url))
+    env.update({
+        "MAX_PRODUCTS": str(items),
+        "OUTPUT_DIR": os.path.join(workdir, "output"),
+        "DB_PATH": os.path.join(workdir, "data.db"),
+        "TOKEN_STORE_PATH": os.path.join(workdir, ".tokens.enc"),
+        "TOKEN_DB_PATH": os.path.join(workdir, ".tokens.db"),
+        "TRACING": "1",
+        "TRACE_DIR": os.path.join(workdir, "traces"),
+        "TRACE_RUN_ID": run_id,
+        "LOG_LEVEL": env.get("LOG_LEVEL", "WARNING"),
+    })
+    return env
+
+
+def item_outcomes(spans) -> Counter:
+    """Final status of every item's runner pass."""
+    return Counter(s["attrs"].get("status", s["status"]) for s in spans
+                   if s["name"] == "item" and s["attrs"].get("stage") == "post")
+
+
+def report(spans, elapsed: float, stats: dict, items: int, slowest: int) -> dict:
+    outcomes = item_outcomes(spans)
+    done = sum(outcomes.values())
+    return {
+        "items_requested": items,
+        "items_processed": done,
+        "elapsed_s": round(elapsed, 3),
+        "items_per_s": round(done / elapsed, 3) if elapsed else 0.0,
+        "outcomes": dict(outcomes),
+        "stages": tracing.stage_stats(spans),
+        "fake_requests": stats,
+        "summary": tracing.summarize(spans, slowest=slowest) if spans else "",
+    }
+
+
+def main(argv=None):
+    p = argparse.ArgumentParser(prog="python tools/load_driver.py")
+    p.add_argument("--items", type=int, default=10000)
+    p.add_argument("--dry-run", action="store_true", help="stop at the dry-run post instead of uploading")
+    p.add_argument("--workdir", default=None, help="scratch directory (default: a new temp dir, kept for inspection)")
+    p.add_argument("--slowest", type=int, default=5, help="critical paths to print")
+    p.add_argument("--timeout", type=float, default=None, help="seconds before the runner is killed")
+    fake_services.add_fault_arguments(p)
+    args = p.parse_args(argv)
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="load-")
+    os.makedirs(workdir, exist_ok=True)
+    run_id = f"load{int(time.time())}"
+
+    services = fake_services.FakeServices(fake_services.faults_from_args(args), part_size=args.part_size,
+                                          catalogue=max(args.items, 1))
+    base = services.serve()
+    cmd = [sys.executable, "-m", "src.runner", "--dry-run" if args.dry_run else "--run"]
+    print(f"fake services on {base}; running {' '.join(cmd[1:])} for {args.items} items in {workdir}")
+    started, t0 = time.time(), time.perf_counter()
+    try:
+        proc = subprocess.run(cmd, cwd=ROOT, env=run_env(base, workdir, args.items, run_id), timeout=args.timeout)
+    finally:
+        elapsed = time.perf_counter() - t0
+        services.shutdown()
+
+    # a reused workdir keeps older runs' spans; only this run's count
+    spans = tracing.load_spans(os.path.join(workdir, "traces"), since=started)
+    result = report(spans, elapsed, services.snapshot(), args.items, args.slowest)
+    result["runner_exit"] = proc.returncode
+    with open(os.path.join(workdir, "load_report.json"), "w", encoding="utf-8") as fh:
+        json.dump(result, fh, ensure_ascii=False, indent=2)
+
+    print(f"\nrunner exit={proc.returncode} elapsed={result['elapsed_s']}s "
+          f"items={result['items_processed']}/{args.items} throughput={result['items_per_s']} items/s")
+    print("outcomes: " + ", ".join(f"{k}={v}" for k, v in sorted(result["outcomes"].items())))
+    print("\n" + (result["summary"] or "no spans recorded"))
+    print("\nfake endpoint requests:")
+    for key, n in result["fake_requests"].items():
+        print(f"  {key:<28}{n:>8}")
+    return proc.returncode
+
+
+if __name__ == "__main__":
+    sys.exit(main())
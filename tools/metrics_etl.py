@@ -1,90 +1,233 @@
 """Simple ETL to aggregate publish and upload metrics into a CSV for ML training.
 
-Reads JSON files under OUTPUT_DIR/publish_metrics and upload_metrics_*.json and
-produces a single CSV with fields: upload_id, video_id, status, parts_uploaded, part, attempts, avg_duration, timestamp
+Reads JSON files under OUTPUT_DIR/publish_metrics (date-sharded), per-part upload
+events from the append-only journals in OUTPUT_DIR/upload_journals (plus legacy
+upload_metrics_*.json files) and produces a single CSV with fields:
+upload_id, video_id, status, parts_uploaded, part, attempts, avg_duration, timestamp
+
+Runs are incremental against a small SQLite state file next to the CSV
+(`<csv name>.etl.db`): it records every input file's (mtime, size) watermark
+and what was parsed from it. Each run lists the inputs, parses only files that
+are new or whose watermark moved (journals grow and are compacted in place),
+drops files that retention GC removed, and rewrites the CSV from the state.
+Per-file watermarks rather than one "last mtime" are needed because several
+files land within one mtime tick and journals change after they are first seen.
+
+A full rebuild (`--full`) clears the state and parses everything; the CSV is
+built from the state the same way in both modes, so they agree by
+construction. `--verify` checks that against a fresh rebuild in a temp dir.
 """
 import os
+import sys
 import json
 import csv
+import sqlite3
+import tempfile
+import contextlib
 from pathlib import Path
 
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
 
-def aggregate(output_dir: str, out_csv: str = None):
-    out_csv = out_csv or os.path.join(output_dir, "metrics_aggregated.csv")
-    pm_dir = Path(output_dir) / "publish_metrics"
-    rows = []
-    if not pm_dir.exists():
-        print("No publish_metrics found at", pm_dir)
-        return out_csv
+from src.upload_journal import replay  # noqa: E402
 
-    # collect commit envelopes and upload metrics
-    commit_files = list(pm_dir.glob("commit_*.json"))
-    summary_files = list(pm_dir.glob("summary_*.json"))
-    upload_metrics_files = list(pm_dir.glob("upload_metrics_*.json"))
-
-    # map upload_id -> commit envelope
-    commits = {}
-    for cf in commit_files:
-        try:
-            j = json.loads(cf.read_text(encoding="utf-8"))
-            commits[j.get("upload_id")] = j
-        except Exception:
-            continue
+KEYS = ["upload_id", "video_id", "status", "parts_uploaded", "part", "attempts", "avg_duration", "timestamp"]
 
-    summaries = {}
-    for sf in summary_files:
-        try:
-            j = json.loads(sf.read_text(encoding="utf-8"))
-            summaries[j.get("upload_id")] = j
-        except Exception:
-            continue
+# directory under OUTPUT_DIR -> [(kind, name prefix, suffix)]; for upload metrics later kinds win
+SOURCES = {
+    "publish_metrics": [("commit", "commit_", ".json"), ("summary", "summary_", ".json"),
+                        ("metrics", "upload_metrics_", ".json")],
+    # legacy per-upload metrics files (written next to upload state before journals existed)
+    "": [("metrics_root", "upload_metrics_", ".json")],
+    "upload_journals": [("journal", "", ".jsonl")],
+}
+_METRICS_RANK = {"metrics": 0, "metrics_root": 1, "journal": 2}
+# bump when the parsed `data` format changes; older state is discarded
+STATE_VERSION = 1
+
+
+def state_path_for(out_csv: str) -> str:
+    return os.path.splitext(out_csv)[0] + ".etl.db"
+
+
+def _open_state(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != STATE_VERSION:
+        conn.execute("DROP TABLE IF EXISTS files")
+        conn.execute(f"PRAGMA user_version = {STATE_VERSION}")
+    conn.execute("""
+    CREATE TABLE IF NOT EXISTS files (
+        path TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        upload_id TEXT,
+        data TEXT
+    )
+    """)
+    conn.execute("CREATE INDEX IF NOT EXISTS idx_files_kind ON files (kind, path)")
+    conn.commit()
+    return conn
+
+
+def _scan(output_dir: str):
+    """Yield (relative path, kind, mtime_ns, size) for every input file."""
+    for sub, kinds in SOURCES.items():
+        # subdirectories are sharded (publish_metrics by date, journals by id hash); the top level is not
+        pending = [sub]
+        while pending:
+            rel_dir = pending.pop()
+            try:
+                entries = os.scandir(os.path.join(output_dir, rel_dir))
+            except FileNotFoundError:
+                continue
+            with entries:
+                for entry in entries:
+                    name = entry.name
+                    rel = os.path.join(rel_dir, name) if rel_dir else name
+                    if sub and entry.is_dir():
+                        pending.append(rel)
+                        continue
+                    kind = next((k for k, prefix, suffix in kinds if name.startswith(prefix) and name.endswith(suffix)), None)
+                    if kind is None or not entry.is_file():
+                        continue
+                    try:
+                        st = entry.stat()
+                    except FileNotFoundError:
+                        continue  # removed by GC mid-scan
+                    yield rel, kind, st.st_mtime_ns, st.st_size
+
+
+def _part_stats(parts: dict) -> list:
+    """[[part, attempts, avg_duration]] from {part: [attempt dicts]}."""
+    out = []
+    for part, attempts in parts.items():
+        durations = [a.get("duration", 0) for a in attempts]
+        out.append([part, len(attempts), sum(durations) / len(durations) if durations else None])
+    return out
 
-    uploads = {}
-    for uf in upload_metrics_files:
-        try:
-            j = json.loads(uf.read_text(encoding="utf-8"))
-            # filename upload_metrics_{upload_id}.json
-            uid = uf.stem.split("upload_metrics_")[-1]
-            uploads[uid] = j
-        except Exception:
+
+def _parse(kind: str, path: Path):
+    """(upload_id, the fields the CSV needs) for one input file; (None, None) if unreadable."""
+    try:
+        if kind == "journal":
+            return path.stem, _part_stats(replay(path)["metrics"])
+        j = json.loads(path.read_text(encoding="utf-8"))
+        if kind == "commit":
+            return j.get("upload_id"), {k: j.get(k) for k in ("video_id", "status", "timestamp")}
+        if kind == "summary":
+            return j.get("upload_id"), {k: j.get(k) for k in ("parts_uploaded", "timestamp")}
+        # filename upload_metrics_{upload_id}.json
+        return path.stem.split("upload_metrics_")[-1], _part_stats(j)
+    except Exception:
+        return None, None
+
+
+def sync(conn: sqlite3.Connection, output_dir: str, full: bool = False) -> dict:
+    """Bring the state up to date with the files on disk; returns counts of parsed/removed files."""
+    if full:
+        conn.execute("DELETE FROM files")
+    known = {path: (mtime, size) for path, mtime, size in conn.execute("SELECT path, mtime_ns, size FROM files")}
+    seen = set()
+    changed = []
+    for rel, kind, mtime, size in _scan(output_dir):
+        seen.add(rel)
+        if known.get(rel) == (mtime, size):
             continue
+        uid, data = _parse(kind, Path(output_dir) / rel)
+        changed.append((rel, kind, mtime, size, None if uid is None else str(uid),
+                        None if data is None else json.dumps(data, ensure_ascii=False)))
+    removed = [(p,) for p in known if p not in seen]
+    with conn:
+        conn.executemany("INSERT OR REPLACE INTO files (path, kind, mtime_ns, size, upload_id, data) VALUES (?, ?, ?, ?, ?, ?)", changed)
+        conn.executemany("DELETE FROM files WHERE path = ?", removed)
+    return {"parsed": len(changed), "removed": len(removed), "files": len(seen)}
+
 
-    # build rows per upload part
-    for uid, parts in uploads.items():
+def build_rows(conn: sqlite3.Connection) -> list:
+    """CSV rows from the state: one per upload part, ordered by upload id."""
+    commits, summaries, uploads = {}, {}, {}
+    rows = conn.execute("SELECT kind, path, upload_id, data FROM files WHERE data IS NOT NULL AND upload_id IS NOT NULL")
+    ordered = sorted(rows, key=lambda r: (_METRICS_RANK.get(r[0], -1), r[1]))
+    for kind, _, uid, data in ordered:
+        # later files (by name; commit/summary names end in the write time) replace earlier ones
+        target = commits if kind == "commit" else summaries if kind == "summary" else uploads
+        target[uid] = json.loads(data)
+
+    out = []
+    for uid in sorted(uploads):
         commit = commits.get(uid, {})
         summary = summaries.get(uid, {})
-        video_id = commit.get("video_id") if isinstance(commit, dict) else None
-        status = commit.get("status") if isinstance(commit, dict) else None
-        for part, attempts in parts.items():
-            durations = [a.get("duration", 0) for a in attempts]
-            avg_duration = sum(durations) / len(durations) if durations else None
-            rows.append({
+        for part, attempts, avg_duration in uploads[uid]:
+            out.append({
                 "upload_id": uid,
-                "video_id": video_id,
-                "status": status,
+                "video_id": commit.get("video_id"),
+                "status": commit.get("status"),
                 "parts_uploaded": summary.get("parts_uploaded"),
                 "part": part,
-                "attempts": len(attempts),
+                "attempts": attempts,
                 "avg_duration": avg_duration,
                 "timestamp": summary.get("timestamp") or commit.get("timestamp"),
             })
+    return out
+
+
+def _write_csv(out_csv: str, rows: list):
+    fd, tmp = tempfile.mkstemp(prefix=".tmp-", dir=os.path.dirname(os.path.abspath(out_csv)))
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as cf:
+            w = csv.DictWriter(cf, fieldnames=KEYS)
+            w.writeheader()
+            for r in rows:
+                w.writerow(r)
+        os.replace(tmp, out_csv)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
 
-    # write CSV
-    keys = ["upload_id", "video_id", "status", "parts_uploaded", "part", "attempts", "avg_duration", "timestamp"]
-    with open(out_csv, "w", encoding="utf-8", newline="") as cf:
-        w = csv.DictWriter(cf, fieldnames=keys)
-        w.writeheader()
-        for r in rows:
-            w.writerow(r)
+def aggregate(output_dir: str, out_csv: str = None, full: bool = False, state_path: str = None):
+    out_csv = out_csv or os.path.join(output_dir, "metrics_aggregated.csv")
+    pm_dir = Path(output_dir) / "publish_metrics"
+    if not pm_dir.exists():
+        print("No publish_metrics found at", pm_dir)
+        return out_csv
+
+    conn = _open_state(state_path or state_path_for(out_csv))
+    try:
+        counts = sync(conn, output_dir, full=full)
+        if full or counts["parsed"] or counts["removed"] or not os.path.exists(out_csv):
+            _write_csv(out_csv, build_rows(conn))
+    finally:
+        conn.close()
 
-    print("Wrote aggregated metrics to", out_csv)
+    print(f"Wrote aggregated metrics to {out_csv} ({'full rebuild, ' if full else ''}"
+          f"{counts['parsed']} files parsed, {counts['removed']} removed, {counts['files']} total)")
     return out_csv
 
 
+def verify(output_dir: str, out_csv: str = None, state_path: str = None) -> bool:
+    """Run incrementally, then check the CSV against a from-scratch rebuild."""
+    out_csv = aggregate(output_dir, out_csv, state_path=state_path)
+    with tempfile.TemporaryDirectory(prefix="etl-verify-") as tmp:
+        with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+            rebuilt = aggregate(output_dir, os.path.join(tmp, "full.csv"), full=True)
+        if not os.path.exists(out_csv):
+            return not os.path.exists(rebuilt)
+        with open(out_csv, "rb") as a, open(rebuilt, "rb") as b:
+            return a.read() == b.read()
+
+
 if __name__ == '__main__':
     import argparse
     p = argparse.ArgumentParser()
     p.add_argument("--output-dir", default=os.getenv("OUTPUT_DIR", "./output"))
     p.add_argument("--out-csv", default=None)
+    p.add_argument("--state", default=None, help="incremental state file (default: <csv name>.etl.db next to the CSV)")
+    p.add_argument("--full", action="store_true", help="ignore the state and re-parse every file")
+    p.add_argument("--verify", action="store_true", help="after an incremental run, compare the CSV with a full rebuild")
     args = p.parse_args()
-    aggregate(args.output_dir, args.out_csv)
+    if args.verify:
+        ok = verify(args.output_dir, args.out_csv, args.state)
+        print("incremental CSV matches a full rebuild" if ok else "MISMATCH: incremental CSV differs from a full rebuild; rerun with --full")
+        sys.exit(0 if ok else 1)
+    aggregate(args.output_dir, args.out_csv, full=args.full, state_path=args.state)